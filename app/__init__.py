@@ -17,12 +17,75 @@ def create_app():
     app = Flask(__name__, static_folder='static', template_folder='templates')
     app.config.from_object(Config)
 
+    # structured logs through a queue, written by one background thread
+    from app.logs import configure_logging
+    configure_logging(app.config)
+
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     login_manager.login_view = 'login'
     login_manager.login_message_category = 'info'
 
+    # per-endpoint timings, SQL counts / N+1 warnings, upstream API latency
+    from app import instrumentation
+    instrumentation.init_app(app)
+
+    # opt-in sampling profiler for single requests (/admin/profiles)
+    from app import profiling
+    profiling.init_app(app)
+
+    # password hashing in a bounded process pool; sign-in attempt throttling
+    from app import passwords
+    from app.throttle import login_throttle
+    passwords.init_app(app)
+    login_throttle.init_app(app)
+
+    # per-process cache of logged-in users for load_user()
+    from app.user_cache import user_cache
+    user_cache.init_app(app)
+
+    # process-wide AI clients (pooled connections, timeouts, retries)
+    from app.ai_service import configure_providers
+    configure_providers(app.config)
+
+    # background job queue for practice generation
+    from app import jobs
+    jobs.init_app(app)
+
+    # `flask inventory warm` pre-generates practices ahead of the peaks
+    from app.inventory import inventory_cli
+    app.cli.add_command(inventory_cli)
+
+    # audio storage shared by all nodes (local directory or S3/MinIO bucket)
+    from app.storage import configure_storage
+    configure_storage(app.config)
+
+    # content-addressed audio store (also registers the ref-count listeners)
+    from app.audio_store import audio_cli, audio_url
+    app.cli.add_command(audio_cli)
+    app.add_template_global(audio_url)
+
+    # Opus/AAC variants + duration after rendering (`flask audio transcode` backfills)
+    from app import transcode
+    transcode.init_app(app)
+
+    # `flask stats backfill` rebuilds the dashboard rollup
+    from app.daily_stats import stats_cli
+    app.cli.add_command(stats_cli)
+
+    # `flask export user` writes a user's history for support requests
+    from app.export import export_cli
+    app.cli.add_command(export_cli)
+
+    # fingerprinted, precompressed CSS/JS bundles (`flask assets build`)
+    from app import asset_pipeline
+    asset_pipeline.init_app(app)
+
+    # practice page ETags / 304s, fragment cache, Jinja bytecode cache
+    from app import page_cache
+    page_cache.init_app(app)
+
     # imports my routes
     with app.app_context():
         from app import mindfulness_tracker_app
@@ -32,8 +95,9 @@ def create_app():
 
 @login_manager.user_loader
 def load_user(user_id):
-    from app.models import User
-    return User.query.get(int(user_id))
+    # Served from the per-process user cache; only a miss queries the user table
+    from app.user_cache import user_cache
+    return user_cache.get(int(user_id))
 
 login_manager.login_view = 'login'
 login_manager.login_message = None   # suppress the default flash
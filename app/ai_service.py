@@ -1,11 +1,576 @@
 import os
+import re
 import json
-from pathlib import Path
+import logging
+import time
+import random
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import openai
 from openai import OpenAI
 from elevenlabs.client import ElevenLabs
-from elevenlabs import save
+from app.audio_store import audio_key, audio_exists, stream_audio
+from app import metrics
+from app.instrumentation import record_upstream, timed_upstream
+from app.prompts import PRACTICE_TYPES, PROMPT_VERSION, compile_prompt, build_user_message
+from app.tts_pipeline import JsonStringExtractor, Segmenter, SegmentedRender
+
+logger = logging.getLogger(__name__)
+
+# API endpoints; unset means the real services. Point these at
+# benchmarks/fake_providers.py to load-test without calling (or paying) them
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')  # e.g. http://127.0.0.1:8900/v1
+ELEVENLABS_BASE_URL = os.getenv('ELEVENLABS_BASE_URL')  # e.g. http://127.0.0.1:8900
+
+# Use single meditative voice for all moods
+# Lily: Velvety Actress - calm, soothing, perfect for meditation
+VOICE_ID = 'pFZP5JQG7iQjIQuC4Bku'  # Lily
+VOICE_NAME = 'Lily'
+TTS_MODEL_ID = "eleven_multilingual_v2"  # High-quality model with natural prosody
+# Using higher stability, lower similarity, and slower speed for meditative voice
+VOICE_SETTINGS = {
+    "stability": 0.75,  # Higher stability = more consistent, calmer delivery
+    "similarity_boost": 0.5,  # Lower boost = softer, less harsh voice
+    "speed": 0.85  # Slower speed for more meditative pacing
+}
+
+MOODS = ['Happy', 'Calm', 'Anxious', 'Sad']
+TIMES_OF_DAY = ['Morning', 'Night']
+
+# Words that don't change what the practice should focus on
+_BODY_STOPWORDS = {
+    'a', 'an', 'and', 'am', 'are', 'bit', 'but', 'feel', 'feeling', 'feels', 'i', "i'm",
+    'im', 'in', 'is', 'it', 'kind', 'kinda', 'little', 'my', 'of', 'pretty', 'quite',
+    'really', 'so', 'some', 'somewhat', 'the', 'very', 'with',
+}
+
+# Common ways of describing the same body sensation, folded to one word
+_BODY_SYNONYMS = {
+    'tight': 'tense', 'tightness': 'tense', 'stiff': 'tense', 'clenched': 'tense',
+    'knotted': 'tense', 'tension': 'tense', 'tensed': 'tense',
+    'exhausted': 'tired', 'drained': 'tired', 'fatigued': 'tired', 'sleepy': 'tired',
+    'worn': 'tired', 'weary': 'tired', 'tiredness': 'tired',
+    'heaviness': 'heavy', 'sluggish': 'heavy', 'weighed': 'heavy',
+    'restless': 'jittery', 'fidgety': 'jittery', 'shaky': 'jittery', 'wired': 'jittery',
+    'relaxed': 'loose', 'light': 'loose', 'rested': 'loose',
+    'achy': 'sore', 'aching': 'sore', 'aches': 'sore', 'ache': 'sore', 'pain': 'sore',
+    'painful': 'sore', 'hurts': 'sore', 'hurting': 'sore',
+    'energized': 'energetic', 'energised': 'energetic', 'awake': 'energetic',
+    'shoulder': 'shoulders', 'neck': 'shoulders',
+    'stomach': 'belly', 'tummy': 'belly', 'gut': 'belly',
+    'headache': 'head', 'forehead': 'head', 'temples': 'head',
+    'heart': 'chest',
+}
+
+_TIME_OF_DAY_SYNONYMS = {'evening': 'night', 'bedtime': 'night', 'am': 'morning'}
+
+
+def normalize_practice_inputs(mood, body_feeling=None, time_of_day=None):
+    """
+    Normalize check-in inputs into a cache key.
+
+    Casefolds and strips every field, drops filler words from the body feeling
+    and folds common synonyms, so "Tight shoulders" and "my neck feels stiff"
+    share a key.
+
+    Args:
+        mood (str): User's current mood
+        body_feeling (str, optional): User's body sensations
+        time_of_day (str, optional): Morning or Night
+
+    Returns:
+        tuple: (mood, time_of_day, body_feeling) normalized
+    """
+    mood_key = (mood or '').strip().casefold()
+
+    time_key = (time_of_day or '').strip().casefold()
+    time_key = _TIME_OF_DAY_SYNONYMS.get(time_key, time_key)
+
+    words = re.findall(r"[a-z']+", (body_feeling or '').casefold())
+    folded = {_BODY_SYNONYMS.get(word, word) for word in words if word not in _BODY_STOPWORDS}
+    body_key = ' '.join(sorted(folded))
+
+    return mood_key, time_key, body_key
+
+
+class PracticeCache:
+    """
+    In-memory cache of generated practices keyed by normalized check-in inputs.
+
+    Each key holds up to `max_variants` practices. A variant is served at most
+    `max_serves` times (the variation budget) and never to a user who has seen
+    its title recently; when no variant qualifies the lookup is a miss and a
+    fresh practice gets generated and added. Keys are evicted least recently
+    used first, and expire `ttl` seconds after they were created.
+    """
+
+    def __init__(self, max_keys=256, ttl=7 * 24 * 3600, max_variants=5, max_serves=20):
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self.max_variants = max_variants
+        self.max_serves = max_serves
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> {'created': float, 'variants': [..]}
+        self._lock = threading.Lock()
+
+    def get(self, mood, body_feeling=None, time_of_day=None, exclude_titles=()):
+        """
+        Look up a cached practice the user hasn't seen recently.
+
+        Args:
+            mood (str): User's current mood
+            body_feeling (str, optional): User's body sensations
+            time_of_day (str, optional): Morning or Night
+            exclude_titles (iterable): Practice titles this user has had recently
+
+        Returns:
+            dict: Practice payload (same shape as generate_practice_and_prompt,
+                plus 'audio_file'), or None on a miss
+        """
+        key = normalize_practice_inputs(mood, body_feeling, time_of_day)
+        exclude_titles = set(exclude_titles)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry['created'] > self.ttl:
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+
+            candidates = [
+                variant for variant in (entry['variants'] if entry else [])
+                if variant['serves'] < self.max_serves
+                and variant['payload']['practice']['title'] not in exclude_titles
+            ]
+            if not candidates:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            variant = random.choice(candidates)
+            variant['serves'] += 1
+            self.hits += 1
+
+            payload = json.loads(json.dumps(variant['payload']))
+            payload['audio_file'] = variant['audio_file']
+            return payload
+
+    def put(self, mood, body_feeling, time_of_day, result, audio_file=None):
+        """
+        Add a freshly generated practice as a variant for its key.
+
+        Args:
+            mood (str): User's current mood
+            body_feeling (str): User's body sensations
+            time_of_day (str): Morning or Night
+            result (dict): Validated payload from generate_practice_and_prompt
+            audio_file (str, optional): Rendered audio for the practice description
+        """
+        key = normalize_practice_inputs(mood, body_feeling, time_of_day)
+        variant = {
+            'payload': {'practice': dict(result['practice']), 'journal_prompt': result['journal_prompt']},
+            'audio_file': audio_file,
+            'serves': 1,  # the user it was generated for
+        }
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry['created'] > self.ttl:
+                entry = {'created': time.monotonic(), 'variants': []}
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+
+            # Retire used-up variants first, then the oldest, to stay within max_variants
+            entry['variants'] = [v for v in entry['variants'] if v['serves'] < self.max_serves]
+            entry['variants'].append(variant)
+            del entry['variants'][:-self.max_variants]
+
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict: hits, misses, evictions, hit_rate and current number of keys
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'keys': len(self._entries),
+            }
+
+
+# Process-wide practice cache, sized from the environment
+practice_cache = PracticeCache(
+    max_keys=int(os.getenv('PRACTICE_CACHE_SIZE', '256')),
+    ttl=int(os.getenv('PRACTICE_CACHE_TTL', str(7 * 24 * 3600))),
+    max_variants=int(os.getenv('PRACTICE_CACHE_VARIANTS', '5')),
+    max_serves=int(os.getenv('PRACTICE_CACHE_MAX_SERVES', '20')),
+)
 
-def generate_practice_and_prompt(mood, body_feeling=None, time_of_day=None):
+
+class ProviderError(Exception):
+    """An AI backend call failed after all retries."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a backend that keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    are skipped (callers use fallback content straight away) for `reset_timeout`
+    seconds. Then one trial call is let through: success closes the circuit,
+    failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Returns:
+            bool: True if the caller may try the backend now
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._trial_running or time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning('Circuit opened', extra={'backend': self.name, 'failures': self.failures})
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self.opened_at is not None
+
+
+text_breaker = CircuitBreaker('text')
+speech_breaker = CircuitBreaker('speech')
+
+metrics.gauge('ai_circuit_open', '1 while calls to the AI backend are being skipped',
+              lambda: {(breaker.name,): int(breaker.is_open) for breaker in (text_breaker, speech_breaker)},
+              labels=('backend',))
+
+
+def _is_transient(exc):
+    """Connection problems, timeouts, rate limits and 5xx are worth retrying; 4xx aren't."""
+    if isinstance(exc, (openai.APIConnectionError, httpx.TransportError)):
+        return True
+    status = getattr(exc, 'status_code', None)
+    return status is not None and (status in (408, 409, 429) or status >= 500)
+
+
+def _with_retries(call, max_retries, base_delay=0.25, max_delay=4.0):
+    """
+    Run call(), retrying transient failures with exponential backoff and full jitter.
+
+    Jitter spreads retries out so a blip upstream doesn't turn into every
+    worker retrying at the same instant.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return call()
+        except Exception as e:
+            if attempt >= max_retries or not _is_transient(e):
+                raise ProviderError(str(e)) from e
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+
+# Per-call outcome of a text generation; usage comes from the provider's response
+Completion = namedtuple('Completion', ['content', 'prompt_tokens', 'completion_tokens', 'cached_tokens'])
+
+generation_seconds = metrics.histogram(
+    'ai_generation_seconds', 'Time to generate a practice, by prompt version', labels=('prompt_version',))
+generations = metrics.counter(
+    'ai_generations_total', 'Practice generations by prompt version and result (ok, parse_error, invalid, error)',
+    labels=('prompt_version', 'result'))
+prompt_tokens = metrics.counter(
+    'ai_prompt_tokens_total', 'Prompt tokens sent, by prompt version', labels=('prompt_version',))
+cached_prompt_tokens = metrics.counter(
+    'ai_cached_prompt_tokens_total',
+    'Prompt tokens served from the provider prompt cache (0 while prompts stay under 1024 tokens)',
+    labels=('prompt_version',))
+completion_tokens = metrics.counter(
+    'ai_completion_tokens_total', 'Completion tokens received, by prompt version', labels=('prompt_version',))
+
+
+def _http_client(connect_timeout, read_timeout, pool_size):
+    """Keep-alive connection pool shared by every call to one backend."""
+    return httpx.Client(
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+    )
+
+
+class OpenAIProvider:
+    """Chat completions through one long-lived OpenAI client."""
+
+    def __init__(self, api_key, base_url=None, connect_timeout=5.0, read_timeout=30.0,
+                 max_retries=2, pool_size=10, model='gpt-4o-mini'):
+        self.model = model
+        self.max_retries = max_retries
+        # The SDK's own retries are off; _with_retries adds jitter
+        self.client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0,
+                             http_client=_http_client(connect_timeout, read_timeout, pool_size))
+
+    def complete(self, system_prompt, user_message, max_tokens, temperature,
+                 response_format=None, on_delta=None):
+        """
+        Args:
+            response_format (dict, optional): Structured output schema (json_schema mode)
+            on_delta (callable, optional): Stream the completion, calling this with each piece of text
+
+        Returns:
+            Completion: Message content and token usage
+        """
+        options = {}
+        if response_format:
+            options['response_format'] = response_format
+        if on_delta:
+            options['stream'] = True
+            options['stream_options'] = {'include_usage': True}
+
+        def call():
+            return self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_message}
+                ],
+                max_tokens=max_tokens,
+                temperature=temperature,
+                **options
+            )
+        start = time.perf_counter()
+        # Each attempt is timed; a stream is timed to its first byte here, then in full
+        response = _with_retries(timed_upstream('openai', 'chat_first_byte' if on_delta else 'chat', call),
+                                 self.max_retries)
+        if on_delta:
+            try:
+                completion = self._read_stream(response, on_delta)
+            except Exception:
+                record_upstream('openai', 'chat_stream', time.perf_counter() - start, outcome='error')
+                raise
+            record_upstream('openai', 'chat_stream', time.perf_counter() - start)
+            return completion
+
+        usage = response.usage
+        details = getattr(usage, 'prompt_tokens_details', None) if usage else None
+        return Completion(
+            content=response.choices[0].message.content or '',
+            prompt_tokens=usage.prompt_tokens if usage else 0,
+            completion_tokens=usage.completion_tokens if usage else 0,
+            cached_tokens=(getattr(details, 'cached_tokens', 0) or 0) if details else 0,
+        )
+
+    def _read_stream(self, stream, on_delta):
+        """Collect a streamed completion; usage arrives in the last event."""
+        parts = []
+        usage = None
+        for event in stream:
+            if event.usage:
+                usage = event.usage
+            for choice in event.choices:
+                if choice.delta and choice.delta.content:
+                    parts.append(choice.delta.content)
+                    on_delta(choice.delta.content)
+        details = getattr(usage, 'prompt_tokens_details', None) if usage else None
+        return Completion(
+            content=''.join(parts),
+            prompt_tokens=usage.prompt_tokens if usage else 0,
+            completion_tokens=usage.completion_tokens if usage else 0,
+            cached_tokens=(getattr(details, 'cached_tokens', 0) or 0) if details else 0,
+        )
+
+
+class ElevenLabsProvider:
+    """Text-to-speech through one long-lived ElevenLabs client."""
+
+    def __init__(self, api_key, base_url=None, connect_timeout=5.0, read_timeout=30.0,
+                 max_retries=2, pool_size=10):
+        self.max_retries = max_retries
+        self.client = ElevenLabs(api_key=api_key, base_url=base_url, timeout=read_timeout,
+                                 httpx_client=_http_client(connect_timeout, read_timeout, pool_size))
+
+    def synthesize(self, text, previous_text=None):
+        """
+        Start a render and stream it. Only the request up to the first chunk is
+        retried; once audio is flowing a failure ends the stream.
+
+        Args:
+            text (str): What to say
+            previous_text (str, optional): The text spoken just before, so a
+                segment's intonation continues from the one before it
+
+        Yields:
+            bytes: MP3 chunks
+        """
+        options = {'previous_text': previous_text} if previous_text else {}
+
+        def start():
+            chunks = iter(self.client.text_to_speech.convert(
+                voice_id=VOICE_ID,
+                text=text,
+                model_id=TTS_MODEL_ID,
+                voice_settings=VOICE_SETTINGS,
+                **options
+            ))
+            return chunks, next(chunks, b'')
+
+        started = time.perf_counter()
+        chunks, first = _with_retries(timed_upstream('elevenlabs', 'tts_first_byte', start), self.max_retries)
+        outcome = 'error'
+        try:
+            if first:
+                yield first
+            yield from chunks
+            outcome = 'ok'
+        finally:
+            # Whole render, including a listener hanging up early (counted as an error)
+            record_upstream('elevenlabs', 'tts_stream', time.perf_counter() - started, outcome=outcome)
+
+
+class StubTextProvider:
+    """Local backend: answers with the mood's fallback practice, no network."""
+
+    def complete(self, system_prompt, user_message, max_tokens, temperature,
+                 response_format=None, on_delta=None):
+        match = re.search(r"Mood: (\w+)", user_message)
+        content = json.dumps(get_fallback_content(match.group(1) if match else 'Calm'))
+        if on_delta:
+            for i in range(0, len(content), 40):
+                on_delta(content[i:i + 40])
+        return Completion(content, 0, 0, 0)
+
+
+class StubSpeechProvider:
+    """Local backend: a few hundred milliseconds of silent MP3 frames."""
+
+    FRAME = b'\xff\xfb\x90\x00' + bytes(413)  # 128 kbps / 44.1 kHz MPEG-1 Layer III frame
+
+    def synthesize(self, text, previous_text=None):
+        for _ in range(20):
+            yield self.FRAME * 4
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+# Renders the segments of pipelined practices (see generate_practice_with_audio)
+_segment_executor = None
+
+
+def configure_providers(settings):
+    """
+    Create the process-wide text and speech backends. Called once by
+    create_app(); scripts that never create the app get them from the
+    environment on first use.
+
+    Settings (app.config or os.environ):
+        AI_TEXT_BACKEND: openai (default) or stub
+        AI_TEXT_MODEL: chat model; must support json_schema structured output
+        AI_SPEECH_BACKEND: elevenlabs (default) or stub
+        AI_CONNECT_TIMEOUT, AI_READ_TIMEOUT: seconds
+        AI_MAX_RETRIES: retries of transient failures per call
+        AI_POOL_SIZE: keep-alive connections per backend
+        AI_BREAKER_FAILURES: consecutive failures that open the circuit
+        AI_BREAKER_RESET: seconds before a trial call is let through again
+        AI_PIPELINE_TTS: start rendering audio while the text is still streaming (default on)
+        AI_TTS_PARALLELISM: segments rendered at the same time
+
+    A real backend without its API key is left unset, and callers fall back
+    the same way they do when the API is down.
+    """
+    options = {
+        'connect_timeout': float(settings.get('AI_CONNECT_TIMEOUT', 5)),
+        'read_timeout': float(settings.get('AI_READ_TIMEOUT', 30)),
+        'max_retries': int(settings.get('AI_MAX_RETRIES', 2)),
+        'pool_size': int(settings.get('AI_POOL_SIZE', 10)),
+    }
+
+    text = None
+    text_backend = settings.get('AI_TEXT_BACKEND', 'openai')
+    if text_backend == 'stub':
+        text = StubTextProvider()
+    elif text_backend == 'openai' and os.getenv('OPENAI_API_KEY'):
+        text = OpenAIProvider(os.getenv('OPENAI_API_KEY'), OPENAI_BASE_URL,
+                              model=settings.get('AI_TEXT_MODEL', 'gpt-4o-mini'), **options)
+
+    speech = None
+    speech_backend = settings.get('AI_SPEECH_BACKEND', 'elevenlabs')
+    if speech_backend == 'stub':
+        speech = StubSpeechProvider()
+    elif speech_backend == 'elevenlabs' and os.getenv('ELEVENLABS_API_KEY'):
+        speech = ElevenLabsProvider(os.getenv('ELEVENLABS_API_KEY'), ELEVENLABS_BASE_URL, **options)
+
+    for breaker in (text_breaker, speech_breaker):
+        breaker.failure_threshold = int(settings.get('AI_BREAKER_FAILURES', 5))
+        breaker.reset_timeout = float(settings.get('AI_BREAKER_RESET', 30))
+
+    global _segment_executor
+    pipeline = str(settings.get('AI_PIPELINE_TTS', 'true')).lower() in ('1', 'true', 'yes', 'on')
+    if pipeline and speech is not None and _segment_executor is None:
+        _segment_executor = ThreadPoolExecutor(max_workers=int(settings.get('AI_TTS_PARALLELISM', 3)),
+                                               thread_name_prefix='tts-segment')
+
+    with _providers_lock:
+        _providers.update(text=text, speech=speech, pipeline=pipeline)
+
+
+def _provider(kind):
+    with _providers_lock:
+        if kind in _providers:
+            return _providers[kind]
+    configure_providers(os.environ)
+    return _providers[kind]
+
+
+def text_provider():
+    """The configured text backend, or None if it isn't available."""
+    return _provider('text')
+
+
+def speech_provider():
+    """The configured speech backend, or None if it isn't available."""
+    return _provider('speech')
+
+
+def generate_practice_and_prompt(mood, body_feeling=None, time_of_day=None, practice_type=None, on_delta=None):
     """
     Generate personalized mindfulness practice and journal prompt using OpenAI.
 
@@ -13,113 +578,140 @@ def generate_practice_and_prompt(mood, body_feeling=None, time_of_day=None):
         mood (str): User's current mood (Happy, Calm, Anxious, Sad)
         body_feeling (str, optional): User's body sensations
         time_of_day (str, optional): When checking in (Morning or Night)
+        practice_type (str, optional): Ask for a specific practice type (used by the inventory warmer)
+        on_delta (callable, optional): Stream the response, passing each piece of JSON text as it arrives
 
     Returns:
         dict: Contains 'practice' (dict with title, description, type) and 'journal_prompt' (str)
         None: If API call fails
     """
 
-    # Initialize OpenAI client
-    api_key = os.getenv('OPENAI_API_KEY')
-    if not api_key:
-        print("ERROR: OPENAI_API_KEY not found in environment variables")
+    # Shared text backend (OpenAI or the local stub)
+    provider = text_provider()
+    if provider is None:
+        logger.error('OPENAI_API_KEY not found in environment variables')
         return None
 
-    client = OpenAI(api_key=api_key)
-
-    # Build the user message with mood, body feeling, and time of day
-    user_message = f"User's mood: {mood}"
-    if body_feeling:
-        user_message += f"\nBody feeling: {body_feeling}"
-    if time_of_day:
-        user_message += f"\nTime of day: {time_of_day}"
-
-    # System prompt for the AI
-    system_prompt = """You are a compassionate mindfulness meditation teacher. Based on the user's mood, body sensations, and time of day, create:
-1. A guided mindfulness practice (2-4 minutes) with clear, spoken-style instructions
-2. A thoughtful journal prompt for reflection
-
-IMPORTANT: Write the practice description as if you're speaking directly to the user in a calm, guiding voice. Use "you" language and present tense. Make it sound like guided meditation audio that will be read aloud with natural pauses.
-
-NOTE: The user will also receive additional structured questions based on time of day:
-- Morning: "What is your intention for the day?"
-- Night: "What is one thing you did for yourself today?" and "What is one thing you'd like to accomplish tomorrow?"
-So your journal prompt should complement (not duplicate) these questions. Focus on emotional reflection or deeper insights related to their mood and body sensations.
-
-TIME OF DAY GUIDANCE:
-- MORNING practices: Create energizing, grounding practices to start the day with intention. Focus on awakening the body gently, setting intentions, energizing breath work, or morning gratitude. Help them transition into their day with clarity and purpose.
-- NIGHT practices: Create calming, reflective practices to wind down. Focus on releasing the day's tension, restorative breathing, body relaxation, or gentle self-compassion. Help them prepare for restful sleep and let go of the day.
-- If no time specified, create a balanced practice suitable for any time.
-
-CRITICAL PAUSE INSTRUCTIONS - VERY IMPORTANT:
-- Use THREE ellipses (...) for long 3-5 second meditative pauses for breathing (e.g., "Close your eyes... ... ... Take a deep breath")
-- Use TWO ellipses (... ...) for medium 2-3 second pauses (e.g., "Notice your breath... ... Feel the rise and fall")
-- Use ONE ellipsis (...) for brief 1-2 second pauses (e.g., "Breathe in... and breathe out")
-- Use commas ONLY within the same sentence, not for pauses between instructions
-- Add MANY pauses - meditation should feel spacious, not rushed
-- Example: "Find a comfortable position... ... ... When you're ready... ... gently close your eyes... ... ... Take a deep, slow breath in... ... ... and exhale fully... ... ... Notice the sensation of your breath... ... ... Continue breathing naturally... ... ..."
-
-Respond ONLY with valid JSON in this exact format:
-{
-  "practice": {
-    "title": "Practice name (concise, under 50 characters)",
-    "description": "Voice-guided instructions with natural pauses using ellipses and punctuation (150-250 words, very slow meditative pacing)",
-    "type": "breathing|meditation|movement|grounding"
-  },
-  "journal_prompt": "A thoughtful question or reflection prompt (1-2 sentences)"
-}
+    # Backend keeps failing: don't wait on it, the caller uses fallback content
+    if not text_breaker.allow():
+        logger.warning('Skipping OpenAI call, circuit is open')
+        return None
 
-CRITICAL: The "type" field MUST be EXACTLY one of these four words: breathing, meditation, movement, grounding
-DO NOT use any other values like "mindfulness", "reflection", etc.
-
-Guidelines:
-- ALWAYS incorporate their body feelings into the practice if provided
-- Use calm, soothing language with strategic pauses throughout
-- Example: "Gently close your eyes... Notice the sensation of..." NOT "1. Close eyes 2. Notice..."
-- For anxious moods + tense body: Focus on releasing tension, progressive relaxation with longer pauses
-- For sad moods + heavy/tired body: Focus on gentle compassion, soft breathing with nurturing pauses
-- For happy moods: Enhance and savor positive sensations with appreciative pauses
-- For calm moods: Deepen present-moment awareness with spacious pauses
-- Practices should be STRICTLY mindfulness-based (breathing, body scans, awareness, meditation)
-- NO exercise, yoga poses, or physical activities - only gentle awareness practices
-- Keep it simple and accessible (seated or lying down)
-- Use ellipses generously to create meditative breathing space"""
+    # Compact versioned system prompt + structured output schema; only the user
+    # message varies. Both prompts are below the provider's 1024-token minimum
+    # for prompt caching, so no cache key is sent
+    prompt = compile_prompt(PROMPT_VERSION)
+    user_message = build_user_message(mood, body_feeling, time_of_day, practice_type)
 
+    start = time.perf_counter()
+    ai_response = ''
+    result_label = 'error'
     try:
-        # Call OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ],
-            max_tokens=400,
-            temperature=0.7
-        )
-
-        # Parse the response
-        ai_response = response.choices[0].message.content.strip()
+        # Call the text backend (timeouts and retries are handled by the provider)
+        try:
+            completion = provider.complete(prompt.system, user_message,
+                                           max_tokens=prompt.max_tokens, temperature=0.7,
+                                           response_format=prompt.response_format,
+                                           on_delta=on_delta)
+        except Exception:
+            text_breaker.record_failure()
+            raise
+        text_breaker.record_success()
+
+        prompt_tokens.inc(completion.prompt_tokens, prompt_version=prompt.version)
+        cached_prompt_tokens.inc(completion.cached_tokens, prompt_version=prompt.version)
+        completion_tokens.inc(completion.completion_tokens, prompt_version=prompt.version)
 
         # Parse JSON response
-        result = json.loads(ai_response)
+        ai_response = completion.content.strip()
+        result_label = 'parse_error'
+        result = _repair_response(json.loads(ai_response))
 
         # Validate response structure
         if not _validate_response(result):
-            print("ERROR: AI response validation failed")
-            print(f"Response: {ai_response}")
+            result_label = 'invalid'
+            logger.error('AI response validation failed', extra={'response': ai_response})
             return None
 
+        result_label = 'ok'
         return result
 
     except json.JSONDecodeError as e:
-        print(f"ERROR: Failed to parse AI response as JSON: {e}")
-        print(f"Response: {ai_response}")
+        logger.error('Failed to parse AI response as JSON: %s', e, extra={'response': ai_response})
         return None
 
     except Exception as e:
-        print(f"ERROR: OpenAI API call failed: {e}")
+        logger.error('OpenAI API call failed: %s', e)
         return None
 
+    finally:
+        generation_seconds.observe(time.perf_counter() - start, prompt_version=prompt.version)
+        generations.inc(prompt_version=prompt.version, result=result_label)
+
+
+def _repair_response(result):
+    """Fix harmless formatting slips (e.g. "Breathing " for the type) instead of discarding the practice."""
+    practice = result.get('practice') if isinstance(result, dict) else None
+    if isinstance(practice, dict) and isinstance(practice.get('type'), str):
+        practice['type'] = practice['type'].strip().lower()
+    return result
+
+
+def _render_segment(provider, text, previous_text):
+    return b''.join(_tts_render(text, provider, previous_text)())
+
+
+def generate_practice_with_audio(mood, body_feeling=None, time_of_day=None, practice_type=None):
+    """
+    Generate a practice and start rendering its narration while the text is
+    still streaming in.
+
+    The description is pulled out of the streamed JSON as it arrives, cut at
+    the pause markers into segments, and the segments are rendered
+    concurrently. Once the text is complete and valid, the stitched segments
+    are registered with the audio store under the practice's audio key, so
+    generate_audio() and the stream route pick up the audio that is already
+    rendered instead of starting from scratch. Time to audio is then about
+    max(LLM, TTS) rather than LLM + TTS.
+
+    Args:
+        Same as generate_practice_and_prompt()
+
+    Returns:
+        dict: Same as generate_practice_and_prompt(), or None if it failed
+    """
+    speech = speech_provider()
+    if speech is None or not _providers.get('pipeline') or _segment_executor is None:
+        return generate_practice_and_prompt(mood, body_feeling, time_of_day, practice_type)
+
+    extractor = JsonStringExtractor('description')
+    segmenter = Segmenter()
+    segments = SegmentedRender(_segment_executor, lambda text, previous: _render_segment(speech, text, previous))
+
+    def on_delta(delta):
+        for segment in segmenter.feed(extractor.feed(delta)):
+            segments.add(segment)
+
+    result = generate_practice_and_prompt(mood, body_feeling, time_of_day, practice_type, on_delta=on_delta)
+    if not result:
+        segments.cancel()
+        return None
+
+    for segment in segmenter.flush():
+        segments.add(segment)
+    segments.close()
+
+    description = result['practice']['description']
+    key = audio_key(description, VOICE_ID, TTS_MODEL_ID, VOICE_SETTINGS)
+    if audio_exists(key) or segments.failed() or segments.text().split() != description.split():
+        # Already rendered, a segment failed, or the segments don't match the
+        # final text: generate_audio() renders it in one piece as before
+        segments.cancel()
+        return result
+
+    stream_audio(key, segments.chunks)
+    return result
+
 
 def _validate_response(result):
     """
@@ -151,8 +743,7 @@ def _validate_response(result):
             return False
 
         # Check practice type is valid
-        valid_types = ['breathing', 'meditation', 'movement', 'grounding']
-        if practice['type'] not in valid_types:
+        if practice['type'] not in PRACTICE_TYPES:
             return False
 
         return True
@@ -211,60 +802,84 @@ def get_fallback_content(mood):
     return fallback_map.get(mood, fallback_map['Calm'])
 
 
-def generate_audio(practice_text, practice_id, mood):
+def _tts_render(practice_text, provider, previous_text=None):
+    """Return a callable that starts the render on the speech backend and yields its chunks."""
+    def render():
+        if not speech_breaker.allow():
+            raise ProviderError("speech circuit is open")
+        chunks = provider.synthesize(practice_text, previous_text=previous_text)
+        try:
+            first = next(chunks, b'')
+        except Exception:
+            speech_breaker.record_failure()
+            raise
+        speech_breaker.record_success()
+        if first:
+            yield first
+        yield from chunks
+    return render
+
+
+def stream_practice_audio(practice_text):
+    """
+    Stream a practice's narration while ElevenLabs is still rendering it.
+
+    Chunks are relayed as they arrive and teed to the content-addressed store,
+    so the first bytes reach the player after roughly one chunk instead of
+    after the full render.
+
+    Args:
+        practice_text (str): The practice description text
+
+    Returns:
+        iterator: Audio bytes chunks, or None if the audio isn't stored and
+            ElevenLabs isn't configured
+    """
+    audio_key_ = audio_key(practice_text, VOICE_ID, TTS_MODEL_ID, VOICE_SETTINGS)
+    provider = speech_provider()
+    if provider is None and not audio_exists(audio_key_):
+        logger.error('ELEVENLABS_API_KEY not found')
+        return None
+
+    return stream_audio(audio_key_, _tts_render(practice_text, provider))
+
+
+def generate_audio(practice_text, practice_id=None, mood=None):
     """
     Generate natural-sounding audio for a practice using ElevenLabs TTS.
     Uses a single calm, meditative voice for all moods.
 
+    Audio is stored by a hash of the text and voice settings, so narration
+    that was rendered before (fallbacks, cached practices) is reused without
+    calling ElevenLabs again. If the same narration is already being streamed
+    to a listener, this waits for that render instead of starting another.
+
     Args:
         practice_text (str): The practice description text
-        practice_id (int): The practice ID for filename
-        mood (str): User's mood (not used for voice selection, kept for compatibility)
+        practice_id (int, optional): The practice ID, for logging only
+        mood (str, optional): User's mood (not used for voice selection, kept for compatibility)
 
     Returns:
-        str: Filename of the generated audio, or None if failed
+        str: Storage key of the audio (see app/storage.py), or None if failed
     """
-    api_key = os.getenv('ELEVENLABS_API_KEY')
-    if not api_key:
-        print("ERROR: ELEVENLABS_API_KEY not found")
+    audio_key_ = audio_key(practice_text, VOICE_ID, TTS_MODEL_ID, VOICE_SETTINGS)
+    if audio_exists(audio_key_):
+        logger.info('Audio reused', extra={'audio_key': audio_key_, 'practice_id': practice_id})
+        return audio_key_
+
+    provider = speech_provider()
+    if provider is None:
+        logger.error('ELEVENLABS_API_KEY not found')
         return None
 
-    # Use single meditative voice for all moods
-    # Lily: Velvety Actress - calm, soothing, perfect for meditation
-    voice_id = 'pFZP5JQG7iQjIQuC4Bku'  # Lily
-    voice_name = 'Lily'
-
     try:
-        # Create audio directory if it doesn't exist
-        audio_dir = Path("app/static/audio")
-        audio_dir.mkdir(parents=True, exist_ok=True)
-
-        # Generate audio filename
-        audio_filename = f"practice_{practice_id}.mp3"
-        audio_path = audio_dir / audio_filename
-
-        # Initialize ElevenLabs client
-        client = ElevenLabs(api_key=api_key)
-
-        # Generate audio with ElevenLabs TTS (returns a generator)
-        # Using higher stability, lower similarity, and slower speed for meditative voice
-        audio_generator = client.text_to_speech.convert(
-            voice_id=voice_id,
-            text=practice_text,
-            model_id="eleven_multilingual_v2",  # High-quality model with natural prosody
-            voice_settings={
-                "stability": 0.75,  # Higher stability = more consistent, calmer delivery
-                "similarity_boost": 0.5,  # Lower boost = softer, less harsh voice
-                "speed": 0.85  # Slower speed for more meditative pacing
-            }
-        )
-
-        # Save the audio file (save() handles the generator)
-        save(audio_generator, str(audio_path))
+        # Drain the (possibly shared) render; it is saved under its content hash
+        for _ in stream_audio(audio_key_, _tts_render(practice_text, provider)):
+            pass
 
-        print(f"✓ Audio generated: {audio_filename} (Voice: {voice_name} - calm meditative voice)")
-        return audio_filename
+        logger.info('Audio generated', extra={'audio_key': audio_key_, 'practice_id': practice_id, 'voice': VOICE_NAME})
+        return audio_key_
 
     except Exception as e:
-        print(f"ERROR: Failed to generate audio with ElevenLabs: {e}")
+        logger.error('Failed to generate audio with ElevenLabs: %s', e)
         return None
@@ -0,0 +1,281 @@
+# By Frances Belleza
+# Function: static asset pipeline
+#              bundles the CSS/JS in app/assets (Bootstrap plus each page's
+#              styles and scripts), minifies them, names them by content hash
+#              and precompresses them (gzip + brotli) into app/static/dist,
+#              so pages link cacheable files instead of inlining them
+#
+#   flask assets build   (deploy step; also done on startup when sources change)
+#   flask assets clean   (drop bundles the current manifest no longer uses)
+#
+# Behind nginx, /assets/ can be served straight from app/static/dist with
+# gzip_static / brotli_static and "expires max".
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from pathlib import Path
+import click
+from flask import current_app, url_for
+from flask.cli import AppGroup
+
+try:
+    import brotli
+except ImportError:  # optional: without it only .gz files are written
+    brotli = None
+
+ASSETS_DIR = Path(__file__).resolve().parent / 'assets'
+DIST_DIR = Path(__file__).resolve().parent / 'static' / 'dist'
+MANIFEST = DIST_DIR / 'manifest.json'
+
+# Bundles shared by every page (base.html); every other file in css/ and js/
+# becomes a bundle of its own, linked by the page it came from
+BUNDLES = {
+    'base.css': ['vendor/bootstrap.min.css', 'css/styles.css'],
+    'base.js': ['vendor/bootstrap.min.js'],
+}
+
+_FINGERPRINTED = re.compile(r'^[A-Za-z0-9_-]+\.[0-9a-f]{12}\.(css|js)$')
+MIMETYPES = {'.css': 'text/css', '.js': 'text/javascript'}
+
+_manifest = {}
+_manifest_lock = threading.Lock()
+
+
+# ---------- minification ----------
+
+# Quoted strings are matched first so comment markers, colons and braces
+# inside them are left alone
+_CSS_STRING_OR_COMMENT = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*(?!!).*?\*/', re.S)
+_CSS_PLACEHOLDER = re.compile(r'\x00(\d+)\x00')
+
+
+def minify_css(text):
+    """
+    Drop comments and the whitespace CSS doesn't need. Quoted strings are
+    kept verbatim, and `:` is only tightened in declarations (`color: red`),
+    never in selectors, where `div :first-child` differs from `div:first-child`.
+    """
+    strings = []
+
+    def protect(match):
+        if match.group(1) is None:
+            return ' '  # a comment (/*! license */ comments don't match)
+        strings.append(match.group(1))
+        return f'\x00{len(strings) - 1}\x00'
+
+    text = _CSS_STRING_OR_COMMENT.sub(protect, text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    # A declaration (or media feature) starts right after {, ; or ( with a name
+    text = re.sub(r'([{;(])([-\w]+):\s+', r'\1\2:', text)
+    text = text.replace(';}', '}').strip()
+    return _CSS_PLACEHOLDER.sub(lambda match: strings[int(match.group(1))], text)
+
+
+def minify_js(text):
+    """
+    Conservative: drop indentation, blank lines, // comment lines and /* */
+    comments that open a line, but keep every line break, so automatic
+    semicolon insertion behaves exactly as before. Code after a comment's
+    closing */ is kept.
+    """
+    lines = []
+    in_comment = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if in_comment:
+            end = stripped.find('*/')
+            if end < 0:
+                continue
+            stripped = stripped[end + 2:].strip()
+            in_comment = False
+        while stripped.startswith('/*') and not stripped.startswith('/*!'):
+            end = stripped.find('*/', 2)
+            if end < 0:
+                in_comment = True
+                stripped = ''
+                break
+            stripped = stripped[end + 2:].strip()
+        if not stripped or stripped.startswith('//'):
+            continue
+        lines.append(stripped)
+    return '\n'.join(lines)
+
+
+# Source maps aren't shipped, so don't point browsers at them
+_SOURCE_MAP = re.compile(r'^\s*(?://# sourceMappingURL=.*|/\*# sourceMappingURL=.*?\*/)\s*$', re.M)
+
+
+def _minify(path, text):
+    text = _SOURCE_MAP.sub('', text)
+    if '.min.' in path.name:
+        return text.strip()
+    return minify_css(text) if path.suffix == '.css' else minify_js(text)
+
+
+# ---------- build ----------
+
+def bundle_sources():
+    """
+    Returns:
+        dict: Bundle name -> list of source paths under ASSETS_DIR
+    """
+    bundles = {name: [ASSETS_DIR / source for source in sources] for name, sources in BUNDLES.items()}
+    used = {path for paths in bundles.values() for path in paths}
+    for folder in ('css', 'js'):
+        for path in sorted((ASSETS_DIR / folder).glob(f'*.{folder}')):
+            if path not in used:
+                bundles[path.name] = [path]
+    return bundles
+
+
+def source_hash():
+    """Hash of every source file, to tell whether the built bundles are current."""
+    digest = hashlib.sha256()
+    for path in sorted(ASSETS_DIR.rglob('*')):
+        if path.is_file():
+            digest.update(str(path.relative_to(ASSETS_DIR)).encode())
+            digest.update(path.read_bytes())
+    digest.update(b'brotli' if brotli else b'')
+    return digest.hexdigest()
+
+
+def _write_atomic(path, data):
+    """Several workers may build at once; each file appears complete or not at all."""
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.part")
+    try:
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def build_assets():
+    """
+    Build every bundle into DIST_DIR and write the manifest.
+
+    Returns:
+        dict: The manifest: source_hash and files (bundle name -> fingerprinted file name)
+    """
+    DIST_DIR.mkdir(parents=True, exist_ok=True)
+    files = {}
+    for name, sources in bundle_sources().items():
+        text = '\n'.join(_minify(path, path.read_text(encoding='utf-8')) for path in sources)
+        data = text.encode('utf-8')
+        stem, extension = os.path.splitext(name)
+        filename = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}"
+        target = DIST_DIR / filename
+        if not target.is_file():
+            _write_atomic(target, data)
+            _write_atomic(DIST_DIR / f"{filename}.gz", gzip.compress(data, 9, mtime=0))
+            if brotli:
+                _write_atomic(DIST_DIR / f"{filename}.br", brotli.compress(data, quality=11))
+        files[name] = filename
+
+    manifest = {'source_hash': source_hash(), 'files': files}
+    _write_atomic(MANIFEST, json.dumps(manifest, indent=2, sort_keys=True).encode())
+    with _manifest_lock:
+        _manifest.clear()
+        _manifest.update(manifest)
+    return manifest
+
+
+def load_manifest(auto_build=True):
+    """Read the manifest, (re)building first if it's missing or older than the sources."""
+    try:
+        manifest = json.loads(MANIFEST.read_text())
+    except (OSError, ValueError):
+        manifest = None
+    if auto_build and (manifest is None or manifest.get('source_hash') != source_hash()):
+        return build_assets()
+    with _manifest_lock:
+        _manifest.clear()
+        _manifest.update(manifest or {})
+    return manifest
+
+
+# ---------- runtime ----------
+
+def asset_url(name):
+    """
+    url_for() for bundles: asset_url('practice.css') -> /assets/practice.3f2a1b9c0d12.css
+
+    Raises:
+        KeyError: If there's no bundle of that name
+    """
+    if current_app.debug:
+        # Pick up CSS/JS edits without a restart while developing
+        load_manifest(auto_build=True)
+    with _manifest_lock:
+        filename = _manifest.get('files', {})[name]
+    return url_for('asset', filename=filename)
+
+
+def asset_version():
+    """Hash of the sources the current bundles were built from ('' before the first build)."""
+    with _manifest_lock:
+        return _manifest.get('source_hash', '')
+
+
+def asset_path(filename, accept_encodings):
+    """
+    Pick the file to send for a fingerprinted bundle: brotli or gzip if the
+    client accepts it and it was built, the plain file otherwise.
+
+    Returns:
+        tuple: (file name in DIST_DIR, content encoding or None), or None if unknown
+    """
+    if not _FINGERPRINTED.match(filename) or not (DIST_DIR / filename).is_file():
+        return None
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accept_encodings[encoding] and (DIST_DIR / f"{filename}{suffix}").is_file():
+            return f"{filename}{suffix}", encoding
+    return filename, None
+
+
+def init_app(app):
+    """
+    Load (or build) the bundles and make asset_url() available to templates.
+
+    Args:
+        app (Flask): The application being created
+    """
+    load_manifest(auto_build=app.config.get('ASSETS_AUTO_BUILD', True))
+    app.add_template_global(asset_url)
+    app.cli.add_command(assets_cli)
+
+
+assets_cli = AppGroup('assets', help='Fingerprinted CSS/JS bundles.')
+
+
+@assets_cli.command('build')
+def build_command():
+    """Minify, fingerprint and precompress app/assets into app/static/dist."""
+    manifest = build_assets()
+    for name, filename in sorted(manifest['files'].items()):
+        size = (DIST_DIR / filename).stat().st_size
+        gz = (DIST_DIR / f"{filename}.gz").stat().st_size
+        br = (DIST_DIR / f"{filename}.br").stat().st_size if brotli else None
+        click.echo(f"{filename:<40} {size:>8} B  gzip {gz:>7} B" + (f"  br {br:>7} B" if br else ''))
+    if not brotli:
+        click.echo("brotli not installed: only gzip variants written")
+
+
+@assets_cli.command('clean')
+def clean_command():
+    """Delete built bundles the current manifest doesn't reference."""
+    manifest = load_manifest()
+    keep = set(manifest['files'].values())
+    removed = 0
+    for path in DIST_DIR.iterdir():
+        base = re.sub(r'\.(gz|br)$', '', path.name)
+        if _FINGERPRINTED.match(base) and base not in keep:
+            path.unlink()
+            removed += 1
+    click.echo(f"Removed {removed} file(s)")
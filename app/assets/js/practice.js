@@ -0,0 +1,88 @@
+// Poll generation status while the practice is being prepared
+const pollEl = document.querySelector('[data-poll-status]');
+
+if (pollEl) {
+  function checkStatus() {
+    fetch(pollEl.dataset.pollStatus, { credentials: 'same-origin' })
+      .then(response => response.json())
+      .then(data => {
+        if (data.practice_ready || data.status === 'failed') {
+          window.location.reload();
+        } else {
+          setTimeout(checkStatus, 2000);
+        }
+      })
+      .catch(() => setTimeout(checkStatus, 5000));
+  }
+
+  setTimeout(checkStatus, 1500);
+}
+
+// Audio Player Controls
+const audio = document.getElementById('audioPlayer');
+const playPauseBtn = document.getElementById('playPauseBtn');
+const playIcon = document.getElementById('playIcon');
+const progressFill = document.getElementById('progressFill');
+const currentTimeEl = document.getElementById('currentTime');
+const durationEl = document.getElementById('duration');
+const progressBar = document.querySelector('.progress-bar');
+
+if (audio) {
+  // Format time helper
+  function formatTime(seconds) {
+    // A stream that is still rendering has no known duration yet
+    if (!isFinite(seconds)) {
+      return '--:--';
+    }
+    const mins = Math.floor(seconds / 60);
+    const secs = Math.floor(seconds % 60);
+    return `${mins}:${secs.toString().padStart(2, '0')}`;
+  }
+
+  // Set duration when metadata is loaded
+  audio.addEventListener('loadedmetadata', function() {
+    durationEl.textContent = formatTime(audio.duration);
+  });
+
+  // Play/Pause toggle
+  playPauseBtn.addEventListener('click', function() {
+    if (audio.paused) {
+      audio.play();
+      playIcon.textContent = '⏸️';
+    } else {
+      audio.pause();
+      playIcon.textContent = '▶️';
+    }
+  });
+
+  // Update progress bar and time
+  audio.addEventListener('durationchange', function() {
+    durationEl.textContent = formatTime(audio.duration);
+  });
+
+  audio.addEventListener('timeupdate', function() {
+    if (!isFinite(audio.duration)) {
+      currentTimeEl.textContent = formatTime(audio.currentTime);
+      return;
+    }
+    const progress = (audio.currentTime / audio.duration) * 100;
+    progressFill.style.width = progress + '%';
+    currentTimeEl.textContent = formatTime(audio.currentTime);
+  });
+
+  // Click on progress bar to seek
+  progressBar.addEventListener('click', function(e) {
+    const rect = progressBar.getBoundingClientRect();
+    const percent = (e.clientX - rect.left) / rect.width;
+    if (!isFinite(audio.duration)) {
+      return;
+    }
+    audio.currentTime = percent * audio.duration;
+  });
+
+  // Reset icon when audio ends
+  audio.addEventListener('ended', function() {
+    playIcon.textContent = '▶️';
+    progressFill.style.width = '0%';
+  });
+}
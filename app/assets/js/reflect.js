@@ -0,0 +1,117 @@
+// Web Speech API Integration
+const speakBtn = document.getElementById('speakBtn');
+const journalEntry = document.getElementById('journalEntry');
+const recordingStatus = document.getElementById('recordingStatus');
+const stopBtn = document.getElementById('stopBtn');
+const charCount = document.getElementById('charCount');
+
+// Initialize character count
+function updateCharCount() {
+  charCount.textContent = journalEntry.value.length;
+}
+updateCharCount();
+journalEntry.addEventListener('input', updateCharCount);
+
+// Check if browser supports Web Speech API
+const SpeechRecognition = window.SpeechRecognition || window.webkitSpeechRecognition;
+let recognition;
+let isRecording = false;
+
+if (SpeechRecognition) {
+  recognition = new SpeechRecognition();
+  recognition.continuous = true;
+  recognition.interimResults = true;
+  recognition.lang = 'en-US';
+
+  let finalTranscript = '';
+  let interimTranscript = '';
+
+  recognition.onstart = function() {
+    isRecording = true;
+    recordingStatus.style.display = 'flex';
+    speakBtn.textContent = '🔴 Recording...';
+    speakBtn.classList.add('active');
+  };
+
+  recognition.onresult = function(event) {
+    interimTranscript = '';
+
+    for (let i = event.resultIndex; i < event.results.length; i++) {
+      const transcript = event.results[i][0].transcript;
+
+      if (event.results[i].isFinal) {
+        finalTranscript += transcript + ' ';
+      } else {
+        interimTranscript += transcript;
+      }
+    }
+
+    // Update textarea with final + interim results
+    journalEntry.value = finalTranscript + interimTranscript;
+    updateCharCount();
+  };
+
+  recognition.onerror = function(event) {
+    console.error('Speech recognition error:', event.error);
+    stopRecording();
+
+    if (event.error === 'not-allowed') {
+      alert('Microphone access denied. Please enable microphone permissions in your browser settings.');
+    } else if (event.error === 'no-speech') {
+      alert('No speech detected. Please try again.');
+    }
+  };
+
+  recognition.onend = function() {
+    if (isRecording) {
+      // Auto-restart if still in recording mode
+      recognition.start();
+    } else {
+      stopRecording();
+    }
+  };
+
+  // Speak button click
+  speakBtn.addEventListener('click', function() {
+    if (!isRecording) {
+      startRecording();
+    } else {
+      stopRecording();
+    }
+  });
+
+  // Stop button click
+  stopBtn.addEventListener('click', function() {
+    stopRecording();
+  });
+
+  function startRecording() {
+    try {
+      // Store current text before starting
+      finalTranscript = journalEntry.value;
+      recognition.start();
+    } catch (error) {
+      console.error('Failed to start recording:', error);
+      alert('Failed to start recording. Please try again.');
+    }
+  }
+
+  function stopRecording() {
+    isRecording = false;
+    recognition.stop();
+    recordingStatus.style.display = 'none';
+    speakBtn.textContent = '🎤 Speak';
+    speakBtn.classList.remove('active');
+  }
+} else {
+  // Disable speak button if Web Speech API not supported
+  speakBtn.disabled = true;
+  speakBtn.textContent = '🎤 Not Supported';
+}
+
+// Make sure we stop recording when leaving the page
+window.addEventListener('beforeunload', function() {
+  if (isRecording && recognition) {
+    stopRecording();
+  }
+});
@@ -0,0 +1,401 @@
+# By Frances Belleza
+# Function: content-addressed storage for practice audio
+#              identical narration is rendered and stored once, and
+#              audio_blobs counts how many practices point at each file
+
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+import click
+from flask import url_for
+from flask.cli import AppGroup
+from sqlalchemy import event
+from app import db
+from app.models import AudioBlob, Practice, PracticeInventory
+from app.storage import LocalStorage, audio_storage, copy_between
+
+_CONTENT_KEY = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.(mp3|opus|m4a)$')
+
+# Container / MIME type by file extension: the ElevenLabs MP3 and its transcoded variants
+AUDIO_MIMETYPES = {
+    '.mp3': 'audio/mpeg',
+    '.opus': 'audio/ogg',
+    '.m4a': 'audio/mp4',
+}
+
+
+def audio_key(text, voice_id, model_id, voice_settings):
+    """
+    Build the storage key for a rendered narration.
+
+    The key is the sha256 of everything that affects the audio, laid out in
+    two levels of 256 shards so no directory grows too large:
+    ab/cd/abcd....mp3
+
+    Args:
+        text (str): Narration text
+        voice_id (str): ElevenLabs voice
+        model_id (str): ElevenLabs model
+        voice_settings (dict): Stability, similarity, speed...
+
+    Returns:
+        str: Storage key, stored in Practice.audio_file
+    """
+    canonical = json.dumps({
+        'text': text,
+        'voice_id': voice_id,
+        'model_id': model_id,
+        'voice_settings': voice_settings,
+    }, sort_keys=True, separators=(',', ':'))
+    digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.mp3"
+
+
+def variant_key(key, extension):
+    """Key of a transcoded variant stored next to the original, e.g. ab/cd/<hash>.opus"""
+    return str(Path(key).with_suffix(extension))
+
+
+def audio_mimetype(key):
+    return AUDIO_MIMETYPES.get(Path(key).suffix, 'application/octet-stream')
+
+
+def content_hash(key):
+    """
+    Returns:
+        str: The sha256 of a content-addressed key, or None for legacy
+            practice_{id}.mp3 filenames
+    """
+    match = _CONTENT_KEY.match(key)
+    return match.group(1) if match else None
+
+
+def audio_etag(key):
+    """Strong ETag for a content-addressed key: the hash, plus the format for transcoded variants."""
+    match = _CONTENT_KEY.match(key)
+    if not match:
+        return None
+    return match.group(1) if match.group(2) == 'mp3' else f"{match.group(1)}-{match.group(2)}"
+
+
+def audio_exists(key):
+    return audio_storage().exists(key)
+
+
+def audio_size(key):
+    """Returns: int: Bytes stored under `key`, or None if it isn't stored"""
+    return audio_storage().size(key)
+
+
+def audio_url(key):
+    """
+    URL the browser should fetch a stored audio file from: the bucket's
+    pre-signed or CDN URL, or the /audio route for local storage.
+    """
+    return audio_storage().url(key) or url_for('practice_audio', key=key)
+
+
+# Sizes of files this process just wrote, for the audio_blobs row created when a
+# practice first references them (so the flush doesn't ask storage, an S3 HEAD)
+_written_sizes = OrderedDict()
+_written_sizes_lock = threading.Lock()
+
+
+def _counted(chunks, counter):
+    for chunk in chunks:
+        if chunk:
+            counter[0] += len(chunk)
+            yield chunk
+
+
+def write_audio(key, chunks):
+    """
+    Store rendered audio chunks under `key` (atomically: readers never see a
+    half-written file).
+
+    Args:
+        key (str): Storage key from audio_key()
+        chunks (iterable): Bytes chunks (e.g. the ElevenLabs generator)
+
+    Returns:
+        int: Bytes written
+    """
+    counter = [0]
+    audio_storage().write(key, _counted(chunks, counter), content_type=audio_mimetype(key))
+    with _written_sizes_lock:
+        _written_sizes[key] = counter[0]
+        while len(_written_sizes) > 1024:
+            _written_sizes.popitem(last=False)
+    return counter[0]
+
+
+def _written_size(key):
+    """Returns: int: Bytes this process wrote under `key`, or None if it didn't write it"""
+    with _written_sizes_lock:
+        return _written_sizes.pop(key, None)
+
+
+def read_audio(key, chunk_size=64 * 1024):
+    """Yield a stored audio file in chunks."""
+    return audio_storage().read(key, chunk_size)
+
+
+def delete_audio(key):
+    """Delete a stored audio file and its transcoded variants."""
+    storage = audio_storage()
+    storage.delete(key)
+    for extension in AUDIO_MIMETYPES:
+        if variant_key(key, extension) != key:
+            storage.delete(variant_key(key, extension))
+
+
+# ---------- in-flight renders ----------
+
+class _InflightRender:
+    """
+    Chunks of a render that is still running, shared by everyone waiting on it.
+
+    The render runs on its own thread, so a listener closing the page doesn't
+    abort it for the job (or other listeners) waiting on the same key.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def append(self, chunk):
+        with self.cond:
+            self.chunks.append(chunk)
+            self.cond.notify_all()
+
+    def finish(self, error=None):
+        with self.cond:
+            self.done = True
+            self.error = error
+            self.cond.notify_all()
+
+    def follow(self):
+        sent = 0
+        while True:
+            with self.cond:
+                while sent >= len(self.chunks) and not self.done:
+                    self.cond.wait()
+                new_chunks = self.chunks[sent:]
+                finished, error = self.done, self.error
+            for chunk in new_chunks:
+                yield chunk
+            sent += len(new_chunks)
+            if finished and sent >= len(self.chunks):
+                if error:
+                    raise error
+                return
+
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _tee(chunks, inflight):
+    for chunk in chunks:
+        if chunk:
+            inflight.append(chunk)
+            yield chunk
+
+
+def _render_to_storage(key, render, inflight):
+    try:
+        write_audio(key, _tee(render(), inflight))
+        inflight.finish()
+    except Exception as e:
+        inflight.finish(error=e)
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def stream_audio(key, render):
+    """
+    Return the audio for `key` as chunks, as soon as bytes are available.
+
+    A stored file is read from storage. Otherwise the render for this key is
+    started (or joined, if another request or job already started it) and its
+    chunks are relayed as they arrive while being written to storage, so later
+    requests are served from the finished file.
+
+    Args:
+        key (str): Storage key from audio_key()
+        render (callable): Returns an iterable of audio bytes (the TTS stream)
+
+    Returns:
+        iterator: Audio bytes chunks; raises the render's error if it fails
+    """
+    with _inflight_lock:
+        inflight = _inflight.get(key)
+        if inflight is None:
+            if audio_exists(key):
+                return read_audio(key)
+            inflight = _inflight[key] = _InflightRender()
+            threading.Thread(target=_render_to_storage, args=(key, render, inflight),
+                             name='audio-render', daemon=True).start()
+    return inflight.follow()
+
+
+# ---------- reference counting ----------
+
+def _adjust_refs(connection, key, delta):
+    """
+    Add delta to a blob's ref_count, creating the blob row on first reference.
+
+    Runs inside the flush, so it never calls storage: the size comes from
+    write_audio() in this process, or is left for `flask audio recount`.
+    """
+    if not key:
+        return
+
+    blobs = AudioBlob.__table__
+    now = datetime.now()
+    result = connection.execute(
+        blobs.update().where(blobs.c.key == key).values(
+            ref_count=blobs.c.ref_count + delta,
+            # Stamp the drop to 0 (keeping an earlier stamp), clear it when referenced again
+            released_at=db.case((blobs.c.ref_count + delta <= 0, db.func.coalesce(blobs.c.released_at, now)),
+                                else_=None),
+        )
+    )
+    if result.rowcount == 0 and delta > 0:
+        connection.execute(blobs.insert().values(
+            key=key,
+            ref_count=delta,
+            size_bytes=_written_size(key),
+            created_at=now
+        ))
+
+
+def release_audio(connection, key):
+    """Drop one reference for rows removed without the ORM (e.g. bulk deletes)."""
+    _adjust_refs(connection, key, -1)
+
+
+def _after_insert(mapper, connection, target):
+    _adjust_refs(connection, target.audio_file, 1)
+
+
+def _after_update(mapper, connection, target):
+    history = db.inspect(target).attrs.audio_file.history
+    for key in history.deleted or ():
+        _adjust_refs(connection, key, -1)
+    for key in history.added or ():
+        _adjust_refs(connection, key, 1)
+
+
+def _after_delete(mapper, connection, target):
+    _adjust_refs(connection, target.audio_file, -1)
+
+
+for _model in (Practice, PracticeInventory):
+    event.listen(_model, 'after_insert', _after_insert)
+    event.listen(_model, 'after_update', _after_update)
+    event.listen(_model, 'after_delete', _after_delete)
+
+
+def recount_references():
+    """
+    Rebuild audio_blobs.ref_count from practices and practice_inventory.
+
+    Used to backfill existing data and to repair counts after manual edits;
+    also fills in sizes the flush didn't know.
+
+    Returns:
+        int: Number of distinct audio files referenced
+    """
+    counts = {}
+    for model in (Practice, PracticeInventory):
+        rows = (db.session.query(model.audio_file, db.func.count(model.id))
+                .filter(model.audio_file.isnot(None))
+                .group_by(model.audio_file)
+                .all())
+        for key, count in rows:
+            counts[key] = counts.get(key, 0) + count
+
+    now = datetime.now()
+    for blob in AudioBlob.query.all():
+        blob.ref_count = counts.pop(blob.key, 0)
+        if blob.ref_count > 0:
+            blob.released_at = None
+        elif blob.released_at is None:
+            blob.released_at = now
+        if blob.size_bytes is None:
+            blob.size_bytes = audio_size(blob.key)
+    for key, count in counts.items():
+        db.session.add(AudioBlob(key=key, ref_count=count, size_bytes=audio_size(key)))
+    db.session.commit()
+    return AudioBlob.query.filter(AudioBlob.ref_count > 0).count()
+
+
+audio_cli = AppGroup('audio', help='Content-addressed practice audio store.')
+
+
+@audio_cli.command('recount')
+def recount_command():
+    """Recompute reference counts from practices and inventory."""
+    referenced = recount_references()
+    click.echo(f"{referenced} audio file(s) referenced")
+
+
+@audio_cli.command('gc')
+@click.option('--grace', default=24, show_default=True,
+              help='Only delete blobs unreferenced for at least this many hours.')
+@click.option('--dry-run', is_flag=True, help='List what would be deleted.')
+def gc_command(grace, dry_run):
+    """Delete audio files no practice or inventory item references."""
+    cutoff = datetime.now() - timedelta(hours=grace)
+    blobs = AudioBlob.query.filter(AudioBlob.ref_count <= 0, AudioBlob.released_at < cutoff).all()
+    freed = 0
+    for blob in blobs:
+        freed += blob.size_bytes or 0
+        click.echo(f"{'would delete' if dry_run else 'deleting'} {blob.key}")
+        if not dry_run:
+            # Transcoded variants go with their original
+            delete_audio(blob.key)
+            db.session.delete(blob)
+    db.session.commit()
+    click.echo(f"{len(blobs)} file(s), {freed / 1024 / 1024:.1f} MB")
+
+
+@audio_cli.command('stats')
+def stats_command():
+    """Show stored files, references and the disk space deduplication saves."""
+    files, refs, stored, logical = db.session.query(
+        db.func.count(AudioBlob.key),
+        db.func.coalesce(db.func.sum(AudioBlob.ref_count), 0),
+        db.func.coalesce(db.func.sum(AudioBlob.size_bytes), 0),
+        db.func.coalesce(db.func.sum(AudioBlob.size_bytes * AudioBlob.ref_count), 0),
+    ).one()
+    click.echo(f"{files} file(s), {refs} reference(s)")
+    click.echo(f"{stored / 1024 / 1024:.1f} MB stored, "
+               f"{(logical - stored) / 1024 / 1024:.1f} MB saved by deduplication")
+
+
+@audio_cli.command('push')
+@click.option('--from-dir', 'from_dir', type=click.Path(exists=True, file_okay=False), default=None,
+              help='Local audio directory to copy from (default app/static/audio).')
+def push_command(from_dir):
+    """Copy referenced audio (and its variants) from a local directory into the configured storage."""
+    source = LocalStorage(from_dir)
+    target = audio_storage()
+    keys = [key for (key,) in db.session.query(AudioBlob.key).filter(AudioBlob.ref_count > 0)]
+    copied = missing = 0
+    for key in keys:
+        if not source.exists(key):
+            missing += 1
+            continue
+        for variant in dict.fromkeys(variant_key(key, extension) for extension in AUDIO_MIMETYPES):
+            if source.exists(variant) and copy_between(source, target, variant, audio_mimetype(variant)):
+                copied += 1
+    click.echo(f"{copied} file(s) copied, {missing} referenced file(s) not found in {source.root}")
@@ -3,6 +3,7 @@
 
 import os
 from dotenv import load_dotenv
+from app.db_pool import engine_options
 
 load_dotenv()
 
@@ -10,5 +11,126 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY")
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Pool size/overflow, pre-ping, recycle, timeouts, PgBouncer mode: see engine_options()
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI, os.environ)
+
+    # /metrics requires "Authorization: Bearer <token>"; without a token it's off (404)
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+    # Users with these emails can see the admin pages (comma-separated)
+    ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+    # Request profiling: requests with "X-Profile: <PROFILE_TOKEN>", ?profile=1 from an
+    # admin, or this fraction of all requests are sampled every PROFILE_INTERVAL seconds
+    # and saved to PROFILE_DIR (default instance/profiles), keeping the last PROFILE_KEEP
+    PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+    PROFILE_DIR = os.getenv("PROFILE_DIR")
+    PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+
+    # Logs go through a queue to one writer thread: json lines (default) or text
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+    # Requests slower than this are logged with their SQL and upstream time
+    SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+    # Warn when one request runs the same SQL statement this many times (N+1 queries)
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+
+    # Logged-in user snapshots kept per process; password/profile changes in
+    # another process show up after at most USER_CACHE_TTL seconds (0 disables)
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "60"))
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+
+    # Background practice generation: thread (in-process pool), database (separate
+    # `flask jobs work` process) or sync (inline, for debugging)
+    JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "thread")
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    # A process bumps its queued / running jobs' updated_at this often; with the
+    # thread backend, a job whose heartbeat stopped for JOB_STALE_SECONDS was lost
+    # in a restart and is resubmitted the next time its practice page or status is polled
+    JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+    JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "120"))
+
+    # AI backends: openai / elevenlabs, or stub to run locally without API keys.
+    # One pooled keep-alive client per backend per process (see configure_providers())
+    AI_TEXT_BACKEND = os.getenv("AI_TEXT_BACKEND", "openai")
+    AI_SPEECH_BACKEND = os.getenv("AI_SPEECH_BACKEND", "elevenlabs")
+    # Needs json_schema structured output; the prompt itself is picked by PROMPT_VERSION (app/prompts.py)
+    AI_TEXT_MODEL = os.getenv("AI_TEXT_MODEL", "gpt-4o-mini")
+    AI_CONNECT_TIMEOUT = float(os.getenv("AI_CONNECT_TIMEOUT", "5"))
+    AI_READ_TIMEOUT = float(os.getenv("AI_READ_TIMEOUT", "30"))
+    AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "2"))
+    AI_POOL_SIZE = int(os.getenv("AI_POOL_SIZE", "10"))
+    # Stop calling a backend after this many failures in a row, retry after AI_BREAKER_RESET seconds
+    AI_BREAKER_FAILURES = int(os.getenv("AI_BREAKER_FAILURES", "5"))
+    AI_BREAKER_RESET = float(os.getenv("AI_BREAKER_RESET", "30"))
+    # Render the narration in segments while the text is still streaming
+    AI_PIPELINE_TTS = os.getenv("AI_PIPELINE_TTS", "true").lower() == "true"
+    AI_TTS_PARALLELISM = int(os.getenv("AI_TTS_PARALLELISM", "3"))
+
+    # Seconds a check-in waits for OpenAI before getting fallback content; the
+    # live practice replaces it in the background if it arrives later (0 = wait)
+    PRACTICE_LATENCY_BUDGET = float(os.getenv("PRACTICE_LATENCY_BUDGET", "8"))
+
+    # Don't serve a user a cached practice they've had in the last N days
+    PRACTICE_REPEAT_DAYS = int(os.getenv("PRACTICE_REPEAT_DAYS", "14"))
+
+    # Pre-generated practices per (mood, time_of_day, practice_type) for `flask inventory warm`
+    PRACTICE_INVENTORY_TARGET = int(os.getenv("PRACTICE_INVENTORY_TARGET", "3"))
+    PRACTICE_INVENTORY_PARALLELISM = int(os.getenv("PRACTICE_INVENTORY_PARALLELISM", "4"))
+
+    # Where practice audio is stored: local (AUDIO_STORAGE_PATH, default
+    # app/static/audio; a shared mount if several nodes serve it) or s3 (any
+    # S3-compatible bucket; for MinIO set AUDIO_S3_ENDPOINT_URL=http://minio:9000).
+    # S3 credentials come from AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY
+    AUDIO_STORAGE_BACKEND = os.getenv("AUDIO_STORAGE_BACKEND", "local")
+    AUDIO_STORAGE_PATH = os.getenv("AUDIO_STORAGE_PATH")
+    AUDIO_S3_BUCKET = os.getenv("AUDIO_S3_BUCKET")
+    AUDIO_S3_PREFIX = os.getenv("AUDIO_S3_PREFIX", "audio")
+    AUDIO_S3_ENDPOINT_URL = os.getenv("AUDIO_S3_ENDPOINT_URL")
+    AUDIO_S3_REGION = os.getenv("AUDIO_S3_REGION")
+    # Browsers get pre-signed bucket URLs valid this long, or CDN URLs if a CDN fronts the bucket
+    AUDIO_URL_EXPIRY = int(os.getenv("AUDIO_URL_EXPIRY", "3600"))
+    AUDIO_PUBLIC_BASE_URL = os.getenv("AUDIO_PUBLIC_BASE_URL")
+
+    # CSS/JS bundles are rebuilt on startup when app/assets changed; turn off
+    # when `flask assets build` runs at deploy time instead
+    ASSETS_AUTO_BUILD = os.getenv("ASSETS_AUTO_BUILD", "true").lower() == "true"
+    # Bundle names carry their content hash, so they never change either
+    ASSETS_CACHE_MAX_AGE = int(os.getenv("ASSETS_CACHE_MAX_AGE", str(365 * 24 * 3600)))
+
+    # Password hashing runs in this many processes per app worker, with at most
+    # PASSWORD_HASH_QUEUE more waiting; beyond that sign-ins get a fast 503.
+    # Changing PASSWORD_HASH_METHOD (werkzeug format, e.g. scrypt:65536:8:1 or
+    # pbkdf2:sha256:1000000) upgrades each user's hash at their next sign-in
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "16"))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+    # Sign-in / sign-up attempts per client IP, and failed sign-ins per account,
+    # allowed in a sliding window (seconds) before a 429; 0 disables a limit
+    LOGIN_IP_LIMIT = int(os.getenv("LOGIN_IP_LIMIT", "30"))
+    LOGIN_IP_WINDOW = int(os.getenv("LOGIN_IP_WINDOW", "60"))
+    LOGIN_ACCOUNT_LIMIT = int(os.getenv("LOGIN_ACCOUNT_LIMIT", "5"))
+    LOGIN_ACCOUNT_WINDOW = int(os.getenv("LOGIN_ACCOUNT_WINDOW", str(15 * 60)))
+
+    # Rendered practice cards kept per process (LRU, bounded by total size)
+    FRAGMENT_CACHE_MAX_BYTES = int(os.getenv("FRAGMENT_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+    # Compiled templates are written here (default instance/jinja_cache) and
+    # loaded by the next cold worker instead of being compiled again
+    JINJA_BYTECODE_CACHE = os.getenv("JINJA_BYTECODE_CACHE", "true").lower() == "true"
+    JINJA_BYTECODE_CACHE_DIR = os.getenv("JINJA_BYTECODE_CACHE_DIR")
+
+    # Audio files never change once written, so browsers may cache them for a year
+    AUDIO_CACHE_MAX_AGE = int(os.getenv("AUDIO_CACHE_MAX_AGE", str(365 * 24 * 3600)))
+    # Local storage behind nginx: internal location that maps to the audio directory (e.g. /_audio/),
+    # the app then answers with X-Accel-Redirect and nginx sends the bytes
+    AUDIO_ACCEL_REDIRECT_PREFIX = os.getenv("AUDIO_ACCEL_REDIRECT_PREFIX")
+    # Behind Apache/lighttpd: let the server send files via X-Sendfile
+    USE_X_SENDFILE = os.getenv("USE_X_SENDFILE", "false").lower() == "true"
+    # ffmpeg processes transcoding new audio to Opus/AAC in the background
+    # (ffmpeg is found on PATH or via FFMPEG_PATH; without it practices keep the MP3)
+    AUDIO_TRANSCODE_WORKERS = int(os.getenv("AUDIO_TRANSCODE_WORKERS", "2"))
 
 
@@ -0,0 +1,172 @@
+# By Frances Belleza
+# Function: per-user daily rollup for the Sprint 5 dashboard
+#              updated on every check-in / journal / feedback write so the
+#              dashboard reads precomputed rows instead of the raw history
+
+from datetime import date, datetime, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import CheckIn, Practice, JournalEntry, PracticeFeedback, UserDailyStats
+
+
+def _prefix(time_of_day):
+    return 'morning' if time_of_day == 'Morning' else 'night'
+
+
+def _new_stats_values(user_id, day, streak):
+    return dict(
+        user_id=user_id, day=day, streak=streak,
+        morning_practice_done=False, night_practice_done=False,
+        morning_journal_done=False, night_journal_done=False,
+        morning_feedback_done=False, night_feedback_done=False
+    )
+
+
+def _new_stats(user_id, day, streak):
+    return UserDailyStats(**_new_stats_values(user_id, day, streak))
+
+
+def _insert_unless_exists(values):
+    """
+    Insert a rollup row unless (user_id, day) already has one, e.g. from a
+    double-submitted check-in or a second tab writing at the same moment.
+    """
+    dialect = db.engine.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        db.session.execute(insert(UserDailyStats).values(**values)
+                           .on_conflict_do_nothing(index_elements=['user_id', 'day']))
+        return
+    # No ON CONFLICT: let the unique constraint decide, inside a savepoint
+    try:
+        with db.session.begin_nested():
+            db.session.execute(db.insert(UserDailyStats).values(**values))
+    except IntegrityError:
+        pass
+
+
+def _stats_for(checkin):
+    """Get (or create, continuing yesterday's streak) the rollup row for a check-in's day."""
+    day = (checkin.created_at or datetime.now()).date()
+    stats = UserDailyStats.query.filter_by(user_id=checkin.user_id, day=day).first()
+    if stats is None:
+        yesterday = UserDailyStats.query.filter_by(user_id=checkin.user_id,
+                                                   day=day - timedelta(days=1)).first()
+        _insert_unless_exists(_new_stats_values(checkin.user_id, day, yesterday.streak + 1 if yesterday else 1))
+        stats = UserDailyStats.query.filter_by(user_id=checkin.user_id, day=day).one()
+    return stats
+
+
+def record_checkin(checkin):
+    """Record a new check-in's mood. Call before committing the check-in."""
+    stats = _stats_for(checkin)
+    setattr(stats, f'{_prefix(checkin.time_of_day)}_mood', checkin.mood)
+
+
+def record_journal(checkin):
+    """Mark the practice and journal for this check-in as done."""
+    stats = _stats_for(checkin)
+    prefix = _prefix(checkin.time_of_day)
+    setattr(stats, f'{prefix}_practice_done', True)
+    setattr(stats, f'{prefix}_journal_done', True)
+
+
+def record_feedback(checkin, rating):
+    """Mark the practice as done and store the feedback rating."""
+    stats = _stats_for(checkin)
+    prefix = _prefix(checkin.time_of_day)
+    setattr(stats, f'{prefix}_practice_done', True)
+    setattr(stats, f'{prefix}_feedback_done', True)
+    setattr(stats, f'{prefix}_rating', rating)
+
+
+def daily_stats(user_id, since):
+    """
+    Args:
+        user_id (int): The user
+        since (date): First day to include
+
+    Returns:
+        list: UserDailyStats rows from `since` onwards, oldest first (one per active day)
+    """
+    return (UserDailyStats.query
+            .filter(UserDailyStats.user_id == user_id, UserDailyStats.day >= since)
+            .order_by(UserDailyStats.day)
+            .all())
+
+
+def current_streak(user_id):
+    """
+    Returns:
+        int: Consecutive days with a check-in, still alive if the last one was today or yesterday
+    """
+    latest = (UserDailyStats.query
+              .filter_by(user_id=user_id)
+              .order_by(UserDailyStats.day.desc())
+              .first())
+    if latest and latest.day >= date.today() - timedelta(days=1):
+        return latest.streak
+    return 0
+
+
+def backfill_user(user_id):
+    """
+    Rebuild a user's rollup rows from their raw check-in history.
+
+    Returns:
+        int: Number of days written
+    """
+    UserDailyStats.query.filter_by(user_id=user_id).delete()
+
+    rows = (db.session.query(CheckIn.created_at, CheckIn.time_of_day, CheckIn.mood,
+                             JournalEntry.id, PracticeFeedback.rating)
+            .outerjoin(Practice, Practice.checkin_id == CheckIn.id)
+            .outerjoin(JournalEntry, JournalEntry.checkin_id == CheckIn.id)
+            .outerjoin(PracticeFeedback, PracticeFeedback.practice_id == Practice.id)
+            .filter(CheckIn.user_id == user_id)
+            .order_by(CheckIn.created_at)
+            .yield_per(1000))
+
+    days = {}
+    previous = None
+    for created_at, time_of_day, mood, journal_id, rating in rows:
+        day = created_at.date()
+        stats = days.get(day)
+        if stats is None:
+            streak = previous.streak + 1 if previous and previous.day == day - timedelta(days=1) else 1
+            stats = days[day] = previous = _new_stats(user_id, day, streak)
+
+        prefix = _prefix(time_of_day)
+        setattr(stats, f'{prefix}_mood', mood)
+        if journal_id is not None:
+            setattr(stats, f'{prefix}_practice_done', True)
+            setattr(stats, f'{prefix}_journal_done', True)
+        if rating is not None:
+            setattr(stats, f'{prefix}_practice_done', True)
+            setattr(stats, f'{prefix}_feedback_done', True)
+            setattr(stats, f'{prefix}_rating', rating)
+
+    db.session.add_all(days.values())
+    db.session.commit()
+    return len(days)
+
+
+stats_cli = AppGroup('stats', help='Per-user daily rollup (user_daily_stats).')
+
+
+@stats_cli.command('backfill')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user.')
+def backfill_command(user_id):
+    """Rebuild user_daily_stats from existing check-ins, journals and feedback."""
+    if user_id is not None:
+        user_ids = [user_id]
+    else:
+        user_ids = [uid for (uid,) in db.session.query(CheckIn.user_id).distinct().order_by(CheckIn.user_id)]
+
+    total = 0
+    for uid in user_ids:
+        total += backfill_user(uid)
+    click.echo(f"Backfilled {total} day(s) for {len(user_ids)} user(s)")
@@ -0,0 +1,133 @@
+# By Frances Belleza
+# Function: database connection pool settings and metrics
+#              builds SQLALCHEMY_ENGINE_OPTIONS from the environment and
+#              times how long requests wait to check out a connection
+
+import time
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from app import metrics
+
+pool_checkout_wait = metrics.histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting to check out a pooled connection',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+pool_checkout_timeouts = metrics.counter(
+    'db_pool_checkout_timeouts_total', 'Checkouts that gave up after pool_timeout')
+
+_pools = []
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records checkout wait time (the time a request is blocked on the pool)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _pools.append(self)
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_checkout_timeouts.inc()
+            raise
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        if self in _pools:
+            _pools.remove(self)
+        return pool
+
+
+def _pool_gauges():
+    values = {}
+    for pool in _pools:
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        checked_out = pool.checkedout()
+        values[('size',)] = values.get(('size',), 0) + pool.size()
+        values[('checked_out',)] = values.get(('checked_out',), 0) + checked_out
+        values[('idle',)] = values.get(('idle',), 0) + pool.checkedin()
+        values[('capacity',)] = values.get(('capacity',), 0) + capacity
+    return values
+
+
+def _pool_saturation():
+    capacity = sum(pool.size() + max(pool._max_overflow, 0) for pool in _pools)
+    checked_out = sum(pool.checkedout() for pool in _pools)
+    return {(): checked_out / capacity if capacity else 0.0}
+
+
+metrics.gauge('db_pool_connections', 'Pooled connections by state', _pool_gauges, labels=('state',))
+metrics.gauge('db_pool_saturation', 'Checked-out connections / (pool_size + max_overflow)', _pool_saturation)
+
+
+def _env_bool(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def engine_options(database_uri, env):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS for the configured database.
+
+    Settings (all optional):
+        DB_POOL_SIZE, DB_MAX_OVERFLOW: persistent / burst connections per process
+        DB_POOL_TIMEOUT: seconds to wait for a free connection before failing
+        DB_POOL_RECYCLE: replace connections older than this many seconds
+        DB_POOL_PRE_PING: test connections on checkout (avoids stale-connection errors after idle periods)
+        DB_CONNECT_TIMEOUT: seconds to wait for the TCP/TLS connect
+        DB_STATEMENT_TIMEOUT_MS: server-side statement timeout (off by default so
+            long migrations aren't cut off; e.g. 15000 for the web processes)
+        DB_PGBOUNCER: connecting through PgBouncer in transaction pooling mode
+            (e.g. Supabase's port 6543): no startup parameters and no
+            prepared statements, set statement_timeout on the database role instead
+
+    Args:
+        database_uri (str): SQLALCHEMY_DATABASE_URI
+        env (Mapping): Where to read the settings from (os.environ)
+
+    Returns:
+        dict: Keyword arguments for create_engine()
+    """
+    if not database_uri:
+        return {}
+
+    url = make_url(database_uri)
+    if url.get_backend_name() == 'sqlite':
+        # SQLite has no server to pool connections to; keep SQLAlchemy's defaults
+        return {}
+
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': int(env.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(env.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(env.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(env.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': _env_bool(env.get('DB_POOL_PRE_PING', 'true')),
+    }
+
+    connect_args = {}
+    if url.get_backend_name() == 'postgresql':
+        connect_args['connect_timeout'] = int(env.get('DB_CONNECT_TIMEOUT', 5))
+
+        statement_timeout = env.get('DB_STATEMENT_TIMEOUT_MS', '0')
+        if _env_bool(env.get('DB_PGBOUNCER', 'false')):
+            # Transaction pooling hands each transaction a different server
+            # connection, so session state (startup parameters such as
+            # application_name and options, prepared statements) can't be used;
+            # PgBouncer also refuses startup parameters it doesn't track
+            if url.get_driver_name() == 'psycopg':
+                connect_args['prepare_threshold'] = None
+            elif url.get_driver_name() == 'asyncpg':
+                connect_args['statement_cache_size'] = 0
+            # psycopg2 never uses server-side prepared statements
+        else:
+            connect_args['application_name'] = env.get('DB_APPLICATION_NAME', 'mindfulness-tracker')
+            if statement_timeout and int(statement_timeout) > 0:
+                connect_args['options'] = f'-c statement_timeout={int(statement_timeout)}'
+
+    if connect_args:
+        options['connect_args'] = connect_args
+    return options
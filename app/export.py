@@ -0,0 +1,154 @@
+# By Frances Belleza
+# Function: export a user's full history (check-ins, practices, journal
+#              entries, feedback) as NDJSON or CSV
+#              rows are streamed from a server-side cursor and written out in
+#              chunks, so memory stays flat however long the history is
+
+import csv
+import gzip
+import io
+import json
+import click
+from flask.cli import AppGroup
+from app import db
+from app.models import CheckIn, Practice, JournalEntry, PracticeFeedback
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+BATCH_SIZE = 500  # rows fetched per round trip
+CHUNK_SIZE = 64 * 1024  # characters per written / sent chunk
+
+# (section, column) in export order; CSV headers are "<section>_<name>"
+EXPORT_COLUMNS = [
+    ('checkin', CheckIn.id),
+    ('checkin', CheckIn.created_at),
+    ('checkin', CheckIn.time_of_day),
+    ('checkin', CheckIn.mood),
+    ('checkin', CheckIn.body_feeling),
+    ('practice', Practice.id),
+    ('practice', Practice.created_at),
+    ('practice', Practice.practice_type),
+    ('practice', Practice.title),
+    ('practice', Practice.description),
+    ('practice', Practice.journal_prompt),
+    ('journal', JournalEntry.id),
+    ('journal', JournalEntry.created_at),
+    ('journal', JournalEntry.entry_text),
+    ('journal', JournalEntry.intention_for_day),
+    ('journal', JournalEntry.self_care_today),
+    ('journal', JournalEntry.goal_for_tomorrow),
+    ('feedback', PracticeFeedback.id),
+    ('feedback', PracticeFeedback.created_at),
+    ('feedback', PracticeFeedback.rating),
+    ('feedback', PracticeFeedback.helped),
+    ('feedback', PracticeFeedback.pacing),
+]
+CSV_HEADER = [f'{section}_{column.key}' for section, column in EXPORT_COLUMNS]
+
+
+def _value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def export_rows(user_id):
+    """
+    Stream one row per check-in with its practice, journal entry and feedback.
+
+    Selects plain columns (no ORM objects, no relationship loading) and uses
+    yield_per, which fetches through a server-side cursor on Postgres, so only
+    BATCH_SIZE rows are held in memory at a time.
+
+    Args:
+        user_id (int): Whose history to export
+
+    Yields:
+        tuple: Values in EXPORT_COLUMNS order, oldest check-in first
+    """
+    query = (db.select(*[column for _, column in EXPORT_COLUMNS])
+             .select_from(CheckIn)
+             .outerjoin(Practice, Practice.checkin_id == CheckIn.id)
+             .outerjoin(JournalEntry, JournalEntry.checkin_id == CheckIn.id)
+             .outerjoin(PracticeFeedback, PracticeFeedback.practice_id == Practice.id)
+             .where(CheckIn.user_id == user_id)
+             .order_by(CheckIn.created_at, CheckIn.id)
+             .execution_options(yield_per=BATCH_SIZE))
+
+    result = db.session.execute(query)
+    try:
+        for row in result:
+            yield tuple(row)
+    finally:
+        result.close()
+
+
+def _ndjson_record(row):
+    """Nest a flat row as {checkin: {...}, practice: {...} or null, ...}."""
+    record = {}
+    for (section, column), value in zip(EXPORT_COLUMNS, row):
+        record.setdefault(section, {})[column.key] = _value(value)
+    for section in ('practice', 'journal', 'feedback'):
+        if record[section]['id'] is None:
+            record[section] = None
+    return record
+
+
+def ndjson_lines(user_id):
+    for row in export_rows(user_id):
+        yield json.dumps(_ndjson_record(row), ensure_ascii=False) + '\n'
+
+
+def csv_lines(user_id):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for row in export_rows(user_id):
+        writer.writerow([_value(value) for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_chunks(user_id, fmt):
+    """
+    Args:
+        user_id (int): Whose history to export
+        fmt (str): 'ndjson' or 'csv'
+
+    Yields:
+        str: Export text in chunks of about CHUNK_SIZE characters
+    """
+    lines = ndjson_lines(user_id) if fmt == 'ndjson' else csv_lines(user_id)
+    pending = []
+    size = 0
+    for line in lines:
+        pending.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(pending)
+            pending = []
+            size = 0
+    if pending:
+        yield ''.join(pending)
+
+
+def export_filename(user_id, fmt):
+    return f'recalibrate-history-{user_id}.{fmt}'
+
+
+export_cli = AppGroup('export', help="Export a user's history.")
+
+
+@export_cli.command('user')
+@click.option('--user-id', type=int, required=True, help='User to export.')
+@click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default='ndjson', show_default=True)
+@click.option('--output', default=None, help='Output path (gzip). Defaults to recalibrate-history-<id>.<format>.gz')
+def export_user_command(user_id, fmt, output):
+    """Write a user's full history to a gzip file."""
+    output = output or export_filename(user_id, fmt) + '.gz'
+    with gzip.open(output, 'wt', encoding='utf-8', newline='') as f:
+        for chunk in export_chunks(user_id, fmt):
+            f.write(chunk)
+    click.echo(f"Exported user {user_id} to {output}")
@@ -0,0 +1,56 @@
+# By Frances Belleza
+# Function: password hashing worker process
+#              app.passwords starts this file by path (python hash_worker.py),
+#              so a worker imports werkzeug's hashing and nothing else: not the
+#              app package and not whatever script started the app. Reads one
+#              JSON request per line on stdin, answers one JSON line on stdout.
+
+import json
+import os
+import sys
+
+# Started by path, so app/ is first on sys.path; its modules aren't top-level ones
+if sys.path and sys.path[0] == os.path.dirname(os.path.abspath(__file__)):
+    del sys.path[0]
+
+from werkzeug.security import check_password_hash, generate_password_hash  # noqa: E402
+
+
+def hash_password(password, method):
+    return generate_password_hash(password, method)
+
+
+def verify_password(pwhash, password, method, current_method):
+    """
+    Returns:
+        tuple: (matches, new hash if it matched but was made with other parameters)
+    """
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if pwhash.split('$', 1)[0] == current_method:
+        return True, None
+    return True, generate_password_hash(password, method)
+
+
+OPERATIONS = {
+    'hash': hash_password,
+    'verify': verify_password,
+}
+
+
+def main():
+    # Tells the app the process is up and its imports worked
+    sys.stdout.write('ready\n')
+    sys.stdout.flush()
+    for line in sys.stdin:
+        request = json.loads(line)
+        try:
+            reply = {'result': OPERATIONS[request['operation']](*request['args'])}
+        except Exception as e:
+            reply = {'error': f'{type(e).__name__}: {e}'}
+        sys.stdout.write(json.dumps(reply) + '\n')
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+# By Frances Belleza
+# Function: request-level performance instrumentation
+#              wall time per endpoint, SQL statements (count and time) per
+#              request via SQLAlchemy cursor events with N+1 warnings, and the
+#              time spent waiting on OpenAI / ElevenLabs; exported on /metrics,
+#              in the Server-Timing header and in the structured logs
+
+import logging
+import time
+from collections import Counter as StatementCounter
+from contextvars import ContextVar
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+request_seconds = metrics.histogram(
+    'http_request_duration_seconds', 'Wall time per request, by endpoint', labels=('endpoint', 'method', 'status'))
+request_queries = metrics.histogram(
+    'http_request_sql_queries', 'SQL statements run per request, by endpoint', labels=('endpoint',),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89))
+request_sql_seconds = metrics.histogram(
+    'http_request_sql_seconds', 'Time in SQL statements per request, by endpoint', labels=('endpoint',))
+request_upstream_seconds = metrics.histogram(
+    'http_request_upstream_seconds', 'Time waiting on OpenAI / ElevenLabs per request, by endpoint',
+    labels=('endpoint',))
+n_plus_one = metrics.counter(
+    'sql_n_plus_one_total', 'Requests that ran the same SQL statement N+1 style, by endpoint', labels=('endpoint',))
+sql_seconds = metrics.histogram(
+    'sql_statement_seconds', 'Time per SQL statement (requests and background work)')
+upstream_seconds = metrics.histogram(
+    'upstream_request_seconds',
+    'Time per call to an upstream API, by provider, operation and outcome; '
+    'streams are timed to the first byte, then in full',
+    labels=('provider', 'operation', 'outcome'))
+
+
+class RequestStats:
+    """What one request spent its time on."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.statements = StatementCounter()
+        self.upstream_seconds = 0.0
+
+
+_current = ContextVar('request_stats', default=None)
+
+
+def current_stats():
+    """Returns: RequestStats: The running request's, or None outside a request"""
+    return _current.get()
+
+
+def record_upstream(provider, operation, seconds, outcome='ok'):
+    """
+    Record one call to an upstream API (one attempt, when it's retried).
+
+    Args:
+        provider (str): openai, elevenlabs...
+        operation (str): e.g. chat, chat_stream, tts_first_byte, tts_stream
+        seconds (float): How long it took
+        outcome (str): ok or error
+    """
+    upstream_seconds.observe(seconds, provider=provider, operation=operation, outcome=outcome)
+    stats = _current.get()
+    if stats is not None:
+        stats.upstream_seconds += seconds
+
+
+def timed_upstream(provider, operation, call):
+    """Wrap call() so each invocation is recorded with record_upstream()."""
+    def timed():
+        start = time.perf_counter()
+        try:
+            result = call()
+        except Exception:
+            record_upstream(provider, operation, time.perf_counter() - start, outcome='error')
+            raise
+        record_upstream(provider, operation, time.perf_counter() - start)
+        return result
+    return timed
+
+
+# ---------- SQL ----------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    sql_seconds.observe(elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_seconds += elapsed
+        # Same SQL text with different parameters = the same query shape
+        stats.statements[statement] += 1
+
+
+def _handle_error(exception_context):
+    starts = exception_context.connection.info.get('query_start') if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+event.listen(Engine, 'handle_error', _handle_error)
+
+
+# ---------- requests ----------
+
+def _start_request():
+    g.request_stats = RequestStats()
+    _current.set(g.request_stats)
+
+
+def _finish_request(response):
+    stats = g.pop('request_stats', None)
+    if stats is None:
+        return response
+
+    endpoint = request.endpoint or 'unmatched'  # 404s don't get a label each
+    elapsed = time.perf_counter() - stats.start
+
+    request_seconds.observe(elapsed, endpoint=endpoint, method=request.method, status=response.status_code)
+    request_queries.observe(stats.sql_count, endpoint=endpoint)
+    request_sql_seconds.observe(stats.sql_seconds, endpoint=endpoint)
+    if stats.upstream_seconds:
+        request_upstream_seconds.observe(stats.upstream_seconds, endpoint=endpoint)
+
+    threshold = current_app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 5)
+    repeated = [(statement, count) for statement, count in stats.statements.items() if count >= threshold]
+    if repeated:
+        n_plus_one.inc(endpoint=endpoint)
+        for statement, count in repeated:
+            logger.warning('Possible N+1 query', extra={
+                'endpoint': endpoint, 'path': request.path, 'executions': count,
+                'statement': ' '.join(statement.split())[:300]})
+
+    fields = {
+        'endpoint': endpoint, 'method': request.method, 'path': request.path,
+        'status': response.status_code, 'duration_ms': round(elapsed * 1000, 1),
+        'sql_queries': stats.sql_count, 'sql_ms': round(stats.sql_seconds * 1000, 1),
+        'upstream_ms': round(stats.upstream_seconds * 1000, 1),
+    }
+    if elapsed >= current_app.config.get('SLOW_REQUEST_SECONDS', 1.0):
+        logger.warning('Slow request', extra=fields)
+    else:
+        logger.debug('Request', extra=fields)
+
+    # Shows up in the browser's network panel
+    response.headers.add('Server-Timing', f'db;dur={stats.sql_seconds * 1000:.1f};desc="{stats.sql_count} queries"')
+    if stats.upstream_seconds:
+        response.headers.add('Server-Timing', f'upstream;dur={stats.upstream_seconds * 1000:.1f}')
+    response.headers.add('Server-Timing', f'app;dur={elapsed * 1000:.1f}')
+    return response
+
+
+def _teardown_request(exc):
+    # Worker threads are reused: nothing recorded after this belongs to the request
+    _current.set(None)
+
+
+def init_app(app):
+    """
+    Time every request of `app`.
+
+    Args:
+        app (Flask): The application being created
+    """
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_teardown_request)
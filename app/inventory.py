@@ -0,0 +1,200 @@
+# By Frances Belleza
+# Function: pre-generated practice inventory
+#              `flask inventory warm` fills it ahead of the morning/night peaks,
+#              generation jobs take from it before calling OpenAI live
+
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from app import db
+from app.models import PracticeInventory
+from app.audio_store import release_audio
+from app.ai_service import (generate_practice_and_prompt, generate_audio,
+                            MOODS, TIMES_OF_DAY, PRACTICE_TYPES)
+
+logger = logging.getLogger(__name__)
+
+
+def take_from_inventory(mood, time_of_day, exclude_titles=()):
+    """
+    Claim one ready practice for a check-in.
+
+    Each bucket lookup is a single index seek on (mood, time_of_day,
+    practice_type, created_at). The row is deleted in the caller's transaction,
+    so it's only gone once the Practice that replaces it is committed.
+
+    Args:
+        mood (str): Check-in mood
+        time_of_day (str): Morning or Night
+        exclude_titles (iterable): Practice titles this user has had recently
+
+    Returns:
+        dict: Practice payload (same shape as generate_practice_and_prompt,
+            plus 'audio_file'), or None if every bucket is empty
+    """
+    exclude_titles = list(exclude_titles)
+    practice_types = random.sample(PRACTICE_TYPES, len(PRACTICE_TYPES))
+
+    for practice_type in practice_types:
+        # Another worker can claim the same row first, so retry a couple of times
+        for _ in range(3):
+            query = PracticeInventory.query.filter_by(
+                mood=mood, time_of_day=time_of_day, practice_type=practice_type
+            )
+            if exclude_titles:
+                query = query.filter(PracticeInventory.title.notin_(exclude_titles))
+            item = query.order_by(PracticeInventory.created_at).first()
+            if item is None:
+                break
+
+            claimed = db.session.execute(
+                db.delete(PracticeInventory).where(PracticeInventory.id == item.id)
+            ).rowcount
+            db.session.expunge(item)
+            if claimed == 1:
+                # The Practice created from this item takes over the audio reference
+                release_audio(db.session.connection(), item.audio_file)
+                return {
+                    'practice': {
+                        'title': item.title,
+                        'description': item.description,
+                        'type': item.practice_type,
+                    },
+                    'journal_prompt': item.journal_prompt,
+                    'audio_file': item.audio_file,
+                }
+
+    return None
+
+
+def fill_levels():
+    """
+    Returns:
+        dict: (mood, time_of_day, practice_type) -> number of ready practices
+    """
+    rows = (db.session.query(PracticeInventory.mood,
+                             PracticeInventory.time_of_day,
+                             PracticeInventory.practice_type,
+                             db.func.count(PracticeInventory.id))
+            .group_by(PracticeInventory.mood,
+                      PracticeInventory.time_of_day,
+                      PracticeInventory.practice_type)
+            .all())
+    return {(mood, time_of_day, practice_type): count
+            for mood, time_of_day, practice_type, count in rows}
+
+
+def _warm_one(app, mood, time_of_day, practice_type, text_only):
+    """Generate one practice (text + audio) and store it. Runs on a warmer thread."""
+    result = generate_practice_and_prompt(mood=mood, time_of_day=time_of_day,
+                                          practice_type=practice_type)
+    if not result:
+        return False
+
+    audio_file = generate_audio(result['practice']['description'], mood=mood)
+    if not audio_file and not text_only:
+        return False
+
+    # Committed one at a time so an interrupted warm run keeps what it made
+    with app.app_context():
+        try:
+            db.session.add(PracticeInventory(
+                mood=mood,
+                time_of_day=time_of_day,
+                practice_type=result['practice']['type'],  # the AI may not honour the request
+                title=result['practice']['title'],
+                description=result['practice']['description'],
+                journal_prompt=result['journal_prompt'],
+                audio_file=audio_file
+            ))
+            db.session.commit()
+        finally:
+            db.session.remove()
+    return True
+
+
+def warm_inventory(target, parallelism, moods=MOODS, times_of_day=TIMES_OF_DAY, text_only=False):
+    """
+    Top up every bucket to `target` ready practices.
+
+    Only the missing amount is generated, so re-running after an interruption
+    resumes where the last run stopped.
+
+    Args:
+        target (int): Ready practices wanted per (mood, time_of_day, practice_type)
+        parallelism (int): Maximum generations running at once
+        moods (list): Moods to warm
+        times_of_day (list): Times of day to warm
+        text_only (bool): Keep practices even if the audio render failed
+
+    Returns:
+        tuple: (generated, failed) counts
+    """
+    levels = fill_levels()
+    tasks = []
+    for mood in moods:
+        for time_of_day in times_of_day:
+            for practice_type in PRACTICE_TYPES:
+                missing = target - levels.get((mood, time_of_day, practice_type), 0)
+                tasks.extend([(mood, time_of_day, practice_type)] * max(missing, 0))
+
+    app = current_app._get_current_object()
+    generated = failed = 0
+    with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='inventory-warmer') as executor:
+        futures = [executor.submit(_warm_one, app, *task, text_only) for task in tasks]
+        for future in as_completed(futures):
+            try:
+                ok = future.result()
+            except Exception as e:
+                logger.error('Inventory generation failed: %s', e, exc_info=e)
+                ok = False
+            if ok:
+                generated += 1
+            else:
+                failed += 1
+
+    return generated, failed
+
+
+def _print_levels(target):
+    levels = fill_levels()
+    click.echo(f"{'mood':<10}{'time':<10}" + ''.join(f"{t:>12}" for t in PRACTICE_TYPES))
+    for mood in MOODS:
+        for time_of_day in TIMES_OF_DAY:
+            counts = ''.join(f"{levels.get((mood, time_of_day, t), 0):>9}/{target:<2}"
+                             for t in PRACTICE_TYPES)
+            click.echo(f"{mood:<10}{time_of_day:<10}{counts}")
+
+
+inventory_cli = AppGroup('inventory', help='Pre-generated practice inventory.')
+
+
+@inventory_cli.command('warm')
+@click.option('--target', type=int, default=None,
+              help='Ready practices per bucket (default: PRACTICE_INVENTORY_TARGET).')
+@click.option('--parallelism', type=int, default=None,
+              help='Concurrent generations (default: PRACTICE_INVENTORY_PARALLELISM).')
+@click.option('--mood', 'moods', multiple=True, type=click.Choice(MOODS), help='Only warm these moods.')
+@click.option('--time-of-day', 'times_of_day', multiple=True, type=click.Choice(TIMES_OF_DAY),
+              help='Only warm these times of day (e.g. Morning before the morning peak).')
+@click.option('--text-only', is_flag=True, help='Keep practices whose audio failed to render.')
+def warm_command(target, parallelism, moods, times_of_day, text_only):
+    """Fill the inventory up to the target level."""
+    target = target if target is not None else current_app.config['PRACTICE_INVENTORY_TARGET']
+    parallelism = parallelism or current_app.config['PRACTICE_INVENTORY_PARALLELISM']
+
+    generated, failed = warm_inventory(target, parallelism,
+                                       moods=list(moods) or MOODS,
+                                       times_of_day=list(times_of_day) or TIMES_OF_DAY,
+                                       text_only=text_only)
+    click.echo(f"Generated {generated} practice(s), {failed} failed")
+    _print_levels(target)
+
+
+@inventory_cli.command('status')
+def status_command():
+    """Show how many ready practices each bucket holds."""
+    _print_levels(current_app.config['PRACTICE_INVENTORY_TARGET'])
@@ -0,0 +1,547 @@
+# By Frances Belleza
+# Function: background job queue for practice generation
+#              keeps the OpenAI + ElevenLabs calls off the request thread
+
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+from app import db
+from flask import current_app
+from app.models import CheckIn, Practice, GenerationJob
+from app.ai_service import (generate_practice_with_audio, get_fallback_content, generate_audio,
+                            practice_cache)
+from app.inventory import take_from_inventory
+from app.transcode import enqueue_transcode
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+deadline_fallbacks = metrics.counter(
+    'practice_deadline_fallbacks_total', 'Check-ins given fallback content because OpenAI missed the latency budget')
+practice_upgrades = metrics.counter(
+    'practice_upgrades_total', 'Fallback practices replaced by a late OpenAI answer', labels=('result',))
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_TEXT_READY = 'text_ready'  # practice saved, audio still rendering
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+# Jobs whose OpenAI call missed the budget while run_job is still saving the
+# fallback: job id -> the late result once it lands (_WAITING until then)
+_WAITING = object()
+_late_results = {}
+_late_results_lock = threading.Lock()
+
+
+class JobHeartbeat:
+    """
+    Bumps updated_at on the jobs this process holds (waiting in its pool or
+    running) every `interval` seconds, from one background thread. A job
+    whose updated_at stops moving belongs to a process that is gone; a slow
+    render that's still going keeps beating.
+    """
+
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self._jobs = Counter()  # job id -> holders (queued + running)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def hold(self, job_id):
+        with self._lock:
+            self._jobs[job_id] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='job-heartbeat', daemon=True)
+                self._thread.start()
+
+    def release(self, job_id):
+        with self._lock:
+            self._jobs[job_id] -= 1
+            if self._jobs[job_id] <= 0:
+                del self._jobs[job_id]
+
+    def beat(self):
+        """
+        Returns:
+            int: Number of jobs bumped
+        """
+        with self._lock:
+            job_ids = list(self._jobs)
+        if not job_ids:
+            return 0
+        result = db.session.execute(
+            db.update(GenerationJob)
+            .where(GenerationJob.id.in_(job_ids),
+                   GenerationJob.status.in_((JOB_QUEUED, JOB_RUNNING, JOB_TEXT_READY)))
+            .values(updated_at=datetime.now())
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.app.app_context():
+                try:
+                    self.beat()
+                except Exception:
+                    logger.exception('Job heartbeat failed')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+
+class ThreadQueue:
+    """
+    Runs generation jobs on a small thread pool inside the web process.
+
+    Jobs are persisted in the generation_jobs table before they are submitted,
+    and the heartbeat keeps them fresh while this process holds them. Jobs
+    lost on a restart stop beating and are resubmitted by resubmit_if_lost()
+    when their practice page or status is next polled.
+    """
+
+    def __init__(self, app, max_workers):
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='practice-generation')
+
+    def submit(self, job_id):
+        heartbeat = self.app.extensions['job_heartbeat']
+        heartbeat.hold(job_id)
+        try:
+            self.executor.submit(self._run, job_id)
+        except Exception:
+            heartbeat.release(job_id)
+            raise
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            try:
+                run_job(job_id)
+            finally:
+                self.app.extensions['job_heartbeat'].release(job_id)
+                db.session.remove()
+
+
+class SyncQueue:
+    """Runs generation jobs inline on the calling thread (handy for local debugging)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def submit(self, job_id):
+        run_job(job_id)
+
+
+class DatabaseQueue:
+    """
+    Only persists jobs; a separate `flask jobs work` process polls the
+    generation_jobs table and runs them. Works on SQLite or Postgres, no Redis needed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def submit(self, job_id):
+        pass
+
+
+def init_app(app):
+    """
+    Create the job queue selected by JOB_QUEUE_BACKEND and register the `jobs` CLI.
+
+    Args:
+        app (Flask): The application being created
+    """
+    backend = app.config.get('JOB_QUEUE_BACKEND', 'thread')
+    if backend == 'sync':
+        queue = SyncQueue(app)
+    elif backend == 'database':
+        queue = DatabaseQueue(app)
+    else:
+        queue = ThreadQueue(app, app.config.get('JOB_WORKERS', 2))
+
+    app.extensions['job_queue'] = queue
+    app.extensions['job_heartbeat'] = JobHeartbeat(app, app.config.get('JOB_HEARTBEAT_SECONDS', 30))
+    # OpenAI calls run here so a job can stop waiting at the latency budget
+    # while the call carries on
+    app.extensions['llm_executor'] = ThreadPoolExecutor(max_workers=app.config.get('JOB_WORKERS', 2) * 2,
+                                                        thread_name_prefix='practice-llm')
+    app.cli.add_command(jobs_cli)
+
+
+def _queue():
+    return current_app.extensions['job_queue']
+
+
+def _recent_titles(user_id):
+    """Titles of practices the user received recently, so the cache can vary them."""
+    since = datetime.now() - timedelta(days=current_app.config.get('PRACTICE_REPEAT_DAYS', 14))
+    rows = (db.session.query(Practice.title)
+            .join(CheckIn, Practice.checkin_id == CheckIn.id)
+            .filter(CheckIn.user_id == user_id, CheckIn.created_at >= since)
+            .all())
+    return {title for (title,) in rows}
+
+
+def enqueue_generation(checkin):
+    """
+    Create (or re-queue) the generation job for a check-in and hand it to the queue.
+
+    Args:
+        checkin (CheckIn): The check-in that needs a practice
+
+    Returns:
+        GenerationJob: The job tracking this check-in's practice
+    """
+    job = GenerationJob.query.filter_by(checkin_id=checkin.id).first()
+    if job is None:
+        job = GenerationJob(checkin_id=checkin.id, status=JOB_QUEUED)
+        db.session.add(job)
+    elif job.status == JOB_FAILED:
+        job.status = JOB_QUEUED
+        job.error = None
+    else:
+        return job
+
+    db.session.commit()
+    _queue().submit(job.id)
+    return job
+
+
+def generate_within_budget(job_id, checkin):
+    """
+    Ask OpenAI for a practice, but only wait PRACTICE_LATENCY_BUDGET seconds.
+    Its audio starts rendering while the text streams in.
+
+    If the answer is late the call keeps running; when it arrives,
+    upgrade_practice() swaps it in for the fallback the user was given:
+    right away if run_job has finished, otherwise when it does.
+
+    Args:
+        job_id (int): The job waiting on this practice
+        checkin (CheckIn): The check-in to generate for
+
+    Returns:
+        dict: The AI result, or None if it failed or missed the deadline
+    """
+    budget = current_app.config.get('PRACTICE_LATENCY_BUDGET', 0)
+    kwargs = dict(mood=checkin.mood, body_feeling=checkin.body_feeling, time_of_day=checkin.time_of_day)
+    if not budget or budget <= 0:
+        return generate_practice_with_audio(**kwargs)
+
+    future = current_app.extensions['llm_executor'].submit(generate_practice_with_audio, **kwargs)
+    try:
+        return future.result(timeout=budget)
+    except FutureTimeout:
+        logger.warning('OpenAI missed the latency budget, serving fallback',
+                       extra={'job_id': job_id, 'budget_seconds': budget})
+        deadline_fallbacks.inc()
+        app = current_app._get_current_object()
+        with _late_results_lock:
+            _late_results[job_id] = _WAITING
+        future.add_done_callback(lambda f: _upgrade_when_done(app, job_id, f))
+        return None
+
+
+def _upgrade_when_done(app, job_id, future):
+    try:
+        ai_result = future.result()
+    except Exception:
+        logger.exception('Late OpenAI call failed, keeping the fallback', extra={'job_id': job_id})
+        ai_result = None
+    if not ai_result:
+        practice_upgrades.inc(result='failed')
+        return
+    with _late_results_lock:
+        if job_id in _late_results:
+            # run_job is still saving the fallback (and its audio); it applies this when done
+            _late_results[job_id] = ai_result
+            return
+    with app.app_context():
+        try:
+            _apply_upgrade(job_id, ai_result)
+        finally:
+            db.session.remove()
+
+
+def _apply_late_result(job_id):
+    """Called by run_job once the job is saved: apply a late result that arrived meanwhile."""
+    with _late_results_lock:
+        ai_result = _late_results.pop(job_id, None)
+    if ai_result is not None and ai_result is not _WAITING:
+        _apply_upgrade(job_id, ai_result)
+
+
+def _apply_upgrade(job_id, ai_result):
+    try:
+        upgrade_practice(job_id, ai_result)
+    except Exception:
+        logger.exception('Upgrading practice failed', extra={'job_id': job_id})
+        db.session.rollback()
+
+
+def upgrade_practice(job_id, ai_result):
+    """
+    Replace the fallback practice a job served with the late AI result.
+
+    Skipped once the user has journaled or left feedback, so the prompt they
+    answered never changes under them. The new audio is rendered before
+    the row is updated, so the next view gets matching text and audio.
+
+    Returns:
+        bool: True if the practice was upgraded
+    """
+    job = db.session.get(GenerationJob, job_id)
+    practice = job.checkin.practice if job else None
+    if practice is None or not job.used_fallback or job.checkin.journal_entry or practice.feedback:
+        practice_upgrades.inc(result='skipped')
+        return False
+
+    audio_filename = generate_audio(ai_result['practice']['description'], practice.id, job.checkin.mood)
+    if not audio_filename:
+        practice_upgrades.inc(result='failed')
+        return False
+
+    practice.title = ai_result['practice']['title']
+    practice.description = ai_result['practice']['description']
+    practice.practice_type = ai_result['practice']['type']
+    practice.journal_prompt = ai_result['journal_prompt']
+    practice.audio_file = audio_filename
+    practice.audio_duration = practice.audio_size = practice.audio_codec = None
+    job.used_fallback = False
+    db.session.commit()
+    enqueue_transcode(practice.id)
+
+    practice_cache.put(job.checkin.mood, job.checkin.body_feeling, job.checkin.time_of_day,
+                       ai_result, audio_file=audio_filename)
+    practice_upgrades.inc(result='upgraded')
+    logger.info('Practice upgraded from fallback', extra={'practice_id': practice.id, 'job_id': job_id})
+    return True
+
+
+def claim_job(job_id):
+    """
+    Atomically move a job from queued to running so only one worker processes it.
+
+    Returns:
+        bool: True if this worker owns the job now
+    """
+    result = db.session.execute(
+        db.update(GenerationJob)
+        .where(GenerationJob.id == job_id, GenerationJob.status == JOB_QUEUED)
+        .values(status=JOB_RUNNING,
+                attempts=GenerationJob.attempts + 1,
+                updated_at=datetime.now())
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def run_job(job_id):
+    """
+    Generate the practice text, save it, then render its audio.
+
+    The job moves queued -> running -> text_ready -> done, so /practice can show
+    the text as soon as it exists while the audio is still being rendered.
+
+    Args:
+        job_id (int): ID of the GenerationJob to run
+    """
+    if not claim_job(job_id):
+        return
+
+    heartbeat = current_app.extensions['job_heartbeat']
+    heartbeat.hold(job_id)
+    try:
+        job = db.session.get(GenerationJob, job_id)
+        checkin = job.checkin
+
+        practice = Practice.query.filter_by(checkin_id=checkin.id).first()
+        cache_miss = False
+        if not practice:
+            # Serve a previously generated practice for the same inputs if we can,
+            # then a pre-generated one from the inventory, and only then go live
+            recent_titles = _recent_titles(checkin.user_id)
+            ai_result = practice_cache.get(
+                checkin.mood, checkin.body_feeling, checkin.time_of_day,
+                exclude_titles=recent_titles
+            )
+
+            if not ai_result:
+                ai_result = take_from_inventory(checkin.mood, checkin.time_of_day,
+                                                exclude_titles=recent_titles)
+
+            if not ai_result:
+                cache_miss = True
+                ai_result = generate_within_budget(job_id, checkin)
+
+            # If AI fails or is too slow, use fallback content
+            if not ai_result:
+                cache_miss = False
+                job.used_fallback = True
+                ai_result = get_fallback_content(checkin.mood)
+
+            practice = Practice(
+                checkin_id=checkin.id,
+                title=ai_result['practice']['title'],
+                description=ai_result['practice']['description'],
+                practice_type=ai_result['practice']['type'],
+                journal_prompt=ai_result['journal_prompt'],
+                audio_file=ai_result.get('audio_file')
+            )
+            db.session.add(practice)
+
+        job.status = JOB_TEXT_READY
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # practices.checkin_id is unique: another run of this job saved one first
+            db.session.rollback()
+            logger.warning('Practice already saved by another run of this job', extra={'job_id': job_id})
+            return
+
+        if not practice.audio_file:
+            audio_filename = generate_audio(practice.description, practice.id, checkin.mood)
+            if audio_filename:
+                practice.audio_file = audio_filename
+
+        # Newly generated AI content becomes a cache variant for these inputs
+        if cache_miss:
+            practice_cache.put(checkin.mood, checkin.body_feeling, checkin.time_of_day,
+                               ai_result, audio_file=practice.audio_file)
+
+        job.status = JOB_DONE
+        db.session.commit()
+
+        if practice.audio_file and practice.audio_codec is None:
+            enqueue_transcode(practice.id)
+
+    except Exception as e:
+        logger.exception('Generation job failed', extra={'job_id': job_id})
+        db.session.rollback()
+        job = db.session.get(GenerationJob, job_id)
+        if job:
+            job.status = JOB_FAILED
+            job.error = str(e)
+            db.session.commit()
+    finally:
+        heartbeat.release(job_id)
+        _apply_late_result(job_id)
+
+
+def requeue_stale_jobs(max_age):
+    """
+    Put jobs that have been 'running' for too long (worker died) back in the queue.
+
+    Args:
+        max_age (timedelta): How long a job may run before it is considered lost
+
+    Returns:
+        int: Number of jobs re-queued
+    """
+    result = db.session.execute(
+        db.update(GenerationJob)
+        .where(GenerationJob.status == JOB_RUNNING,
+               GenerationJob.updated_at < datetime.now() - max_age)
+        .values(status=JOB_QUEUED, updated_at=datetime.now())
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def resubmit_if_lost(job):
+    """
+    With the thread (or sync) backend a job lives only in the web process's
+    queue; if that process restarted, nothing picks the job up again. The
+    process holding a job keeps its updated_at moving (JobHeartbeat), so one
+    that hasn't moved for JOB_STALE_SECONDS has lost its process: put it back
+    in the queue. A text_ready job is re-run too: run_job() keeps the saved
+    practice and only renders the missing audio.
+
+    Args:
+        job (GenerationJob): The check-in's job, or None
+
+    Returns:
+        bool: True if the job was resubmitted
+    """
+    if job is None or job.status not in (JOB_QUEUED, JOB_RUNNING, JOB_TEXT_READY):
+        return False
+    if isinstance(_queue(), DatabaseQueue):
+        # `flask jobs work` re-queues its own stale jobs
+        return False
+
+    stale_before = datetime.now() - timedelta(seconds=current_app.config.get('JOB_STALE_SECONDS', 120))
+    if job.updated_at is None or job.updated_at >= stale_before:
+        return False
+    # Only one request gets to resubmit it
+    result = db.session.execute(
+        db.update(GenerationJob)
+        .where(GenerationJob.id == job.id,
+               GenerationJob.status == job.status,
+               GenerationJob.updated_at < stale_before)
+        .values(status=JOB_QUEUED, updated_at=datetime.now())
+    )
+    db.session.commit()
+    if result.rowcount != 1:
+        return False
+    logger.warning('Resubmitting lost generation job', extra={'job_id': job.id})
+    db.session.refresh(job)
+    _queue().submit(job.id)
+    return True
+
+
+def job_status(job, practice):
+    """
+    Build the JSON payload for the /practice/status endpoint.
+
+    Args:
+        job (GenerationJob): The check-in's job (may be None for older check-ins)
+        practice (Practice): The saved practice, or None if not generated yet
+
+    Returns:
+        dict: status, practice_ready, audio_ready and used_fallback flags
+    """
+    return {
+        'status': job.status if job else (JOB_DONE if practice else JOB_QUEUED),
+        'practice_ready': practice is not None,
+        'audio_ready': bool(practice and practice.audio_file),
+        'used_fallback': bool(job and job.used_fallback),
+    }
+
+
+jobs_cli = AppGroup('jobs', help='Background practice generation jobs.')
+
+
+@jobs_cli.command('work')
+@click.option('--once', is_flag=True, help='Drain the queue and exit instead of polling.')
+@click.option('--interval', default=1.0, show_default=True, help='Seconds between polls.')
+@click.option('--stale-after', default=300, show_default=True,
+              help='Re-queue jobs stuck in running for this many seconds.')
+def work_command(once, interval, stale_after):
+    """Run queued generation jobs from the generation_jobs table."""
+    while True:
+        requeued = requeue_stale_jobs(timedelta(seconds=stale_after))
+        if requeued:
+            click.echo(f"Re-queued {requeued} stale job(s)")
+
+        job_ids = [job_id for (job_id,) in db.session.query(GenerationJob.id)
+                   .filter(GenerationJob.status == JOB_QUEUED)
+                   .order_by(GenerationJob.created_at).all()]
+        for job_id in job_ids:
+            run_job(job_id)
+            click.echo(f"Ran job {job_id}")
+
+        if once:
+            break
+        if not job_ids:
+            time.sleep(interval)
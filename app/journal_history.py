@@ -0,0 +1,140 @@
+# By Frances Belleza
+# Function: journal history queries for /journal-history
+#              keyset pagination on (created_at, id) and full-text search
+#              (Postgres tsvector + GIN, SQLite FTS5 for local development)
+
+import re
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.orm import load_only
+from app import db
+from app.models import CheckIn, JournalEntry
+
+PAGE_SIZE = 20
+SNIPPET_LENGTH = 200
+
+_fts_available = {}
+
+
+def _sqlite_has_fts():
+    """The FTS5 table is created by the migration; databases made with create_all() don't have it."""
+    engine = db.engine
+    if engine not in _fts_available:
+        found = db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'journal_entries_fts'"
+        )).first()
+        _fts_available[engine] = found is not None
+    return _fts_available[engine]
+
+
+def _fts5_query(search):
+    """Quote each word so user input can't break FTS5 syntax; words are ANDed, the last is a prefix."""
+    words = re.findall(r'\w+', search)
+    if not words:
+        return None
+    terms = ['"' + word.replace('"', '""') + '"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search_condition(search):
+    """
+    Build the WHERE clause for a full-text search over the journal text fields.
+
+    Args:
+        search (str): What the user typed
+
+    Returns:
+        ClauseElement: Condition on journal_entries, or None if there's nothing to search for
+    """
+    search = (search or '').strip()
+    if not search:
+        return None
+
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return text(
+            "journal_entries.search_vector @@ websearch_to_tsquery('english', :search)"
+        ).bindparams(search=search)
+
+    if dialect == 'sqlite' and _sqlite_has_fts():
+        match = _fts5_query(search)
+        if match is None:
+            return None
+        return JournalEntry.id.in_(
+            text("SELECT rowid FROM journal_entries_fts WHERE journal_entries_fts MATCH :match")
+            .bindparams(match=match)
+            .columns(rowid=db.Integer)
+        )
+
+    # No full-text index available: plain substring match
+    pattern = f"%{search}%"
+    return db.or_(JournalEntry.entry_text.ilike(pattern),
+                  JournalEntry.intention_for_day.ilike(pattern),
+                  JournalEntry.self_care_today.ilike(pattern),
+                  JournalEntry.goal_for_tomorrow.ilike(pattern))
+
+
+def encode_cursor(entry):
+    return f"{entry.created_at.isoformat()}_{entry.id}"
+
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        tuple: (created_at, id) of the last entry on the previous page, or None if invalid
+    """
+    try:
+        created_at, entry_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(entry_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def journal_page(user_id, search=None, mood=None, time_of_day=None, cursor=None, page_size=PAGE_SIZE):
+    """
+    One page of a user's journal history, newest first.
+
+    Pages continue from the (created_at, id) of the previous page's last
+    entry instead of using OFFSET, so every page is a single index range scan
+    on (user_id, created_at, id) no matter how deep the user scrolls. The long
+    text columns are deferred; the list shows a snippet computed in SQL.
+
+    Args:
+        user_id (int): Whose journal
+        search (str, optional): Full-text search over entry, intention, self-care and goal
+        mood (str, optional): Only entries whose check-in had this mood
+        time_of_day (str, optional): Only Morning or Night entries
+        cursor (str, optional): Value of next_cursor from the previous page
+
+    Returns:
+        tuple: (list of (JournalEntry, CheckIn, snippet), next_cursor or None)
+    """
+    query = (db.session.query(
+                JournalEntry,
+                CheckIn,
+                db.func.substr(JournalEntry.entry_text, 1, SNIPPET_LENGTH).label('snippet'))
+             .join(CheckIn, JournalEntry.checkin_id == CheckIn.id)
+             .options(load_only(JournalEntry.id, JournalEntry.checkin_id, JournalEntry.created_at),
+                      load_only(CheckIn.id, CheckIn.mood, CheckIn.time_of_day, CheckIn.body_feeling))
+             .filter(JournalEntry.user_id == user_id))
+
+    if mood:
+        query = query.filter(CheckIn.mood == mood)
+    if time_of_day:
+        query = query.filter(CheckIn.time_of_day == time_of_day)
+
+    condition = search_condition(search)
+    if condition is not None:
+        query = query.filter(condition)
+
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        query = query.filter(db.tuple_(JournalEntry.created_at, JournalEntry.id) < position)
+
+    rows = (query.order_by(JournalEntry.created_at.desc(), JournalEntry.id.desc())
+            .limit(page_size + 1)
+            .all())
+
+    next_cursor = encode_cursor(rows[page_size - 1][0]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
@@ -0,0 +1,96 @@
+# By Frances Belleza
+# Function: structured, non-blocking logging
+#              request threads and workers only put records on a queue; one
+#              listener thread formats them (JSON lines or plain text) and
+#              writes them out, so a slow stderr/log pipe never stalls a request
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else was passed with extra={...}
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any extra={...} fields."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Readable lines for local development, extra fields appended as key=value."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        extra = ' '.join(f'{key}={value}' for key, value in record.__dict__.items()
+                         if key not in _RECORD_FIELDS and not key.startswith('_'))
+        return f'{line} {extra}' if extra else line
+
+
+class _StructuredQueueHandler(QueueHandler):
+    """
+    Like QueueHandler, but keeps extra fields and the traceback separate
+    instead of baking everything into one message string.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def configure_logging(settings):
+    """
+    Route the app's loggers through a queue to one writer thread. Called once
+    by create_app(); later calls only adjust the level.
+
+    Settings (app.config or os.environ):
+        LOG_LEVEL: DEBUG, INFO (default), WARNING...
+        LOG_FORMAT: json (default) or text
+    """
+    global _listener
+    logger = logging.getLogger('app')
+    logger.setLevel(str(settings.get('LOG_LEVEL') or 'INFO').upper())
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(TextFormatter() if settings.get('LOG_FORMAT') == 'text' else JsonFormatter())
+
+    records = queue.SimpleQueue()
+    logger.addHandler(_StructuredQueueHandler(records))
+    logger.propagate = False
+
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    # Flush what's queued when the process exits
+    atexit.register(_listener.stop)
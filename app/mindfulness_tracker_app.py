@@ -2,12 +2,66 @@
 # Function: This file is like main()
 #              it defines my routes & logic
 
-from flask import render_template, redirect, url_for, flash, request
+import os
+from flask import (render_template, redirect, url_for, flash, request, jsonify, abort, Response,
+                   send_from_directory, current_app, g, stream_with_context)
+from sqlalchemy.orm import joinedload
+from werkzeug.security import safe_join
 from flask_login import login_user, logout_user, current_user, login_required
-from datetime import datetime, date
+from datetime import datetime, date, time, timedelta
 from app.models import User, CheckIn, Practice, JournalEntry, PracticeFeedback
 from app import db
-from app.ai_service import generate_practice_and_prompt, get_fallback_content, generate_audio
+from app.jobs import enqueue_generation, job_status, resubmit_if_lost, JOB_FAILED
+from app.ai_service import stream_practice_audio
+from app.audio_store import audio_etag, audio_mimetype, audio_url
+from app.storage import audio_storage
+from app.metrics import render_metrics
+from app.daily_stats import record_checkin, record_journal, record_feedback
+from app.journal_history import journal_page
+from app.export import EXPORT_FORMATS, export_chunks, export_filename
+from app.ai_service import MOODS, TIMES_OF_DAY
+from app.profiling import is_admin, list_profiles, profile_file
+from app.asset_pipeline import DIST_DIR, MIMETYPES, asset_path
+from app.page_cache import render_practice
+from app.passwords import HashingBusy, verify_password
+from app.throttle import login_throttle
+
+def today_range():
+    """
+    Start and end of today as datetimes, for half-open created_at ranges.
+
+    Filtering with `start <= created_at < end` (instead of wrapping the
+    column in date()) lets the database use the (user_id, created_at) indexes.
+
+    Returns:
+        tuple: (start of today, start of tomorrow)
+    """
+    start = datetime.combine(date.today(), time.min)
+    return start, start + timedelta(days=1)
+
+
+def current_checkin():
+    """
+    Today's latest check-in for the current user, with its practice, the
+    practice's feedback, the journal entry and the generation job eagerly
+    joined in one query. Memoized on flask.g for the rest of the request.
+
+    Returns:
+        CheckIn: The check-in, or None if the user hasn't checked in today
+    """
+    if 'current_checkin' not in g:
+        today_start, today_end = today_range()
+        g.current_checkin = CheckIn.query.options(
+            joinedload(CheckIn.practice).joinedload(Practice.feedback),
+            joinedload(CheckIn.journal_entry),
+            joinedload(CheckIn.generation_job)
+        ).filter(
+            CheckIn.user_id == current_user.id,
+            CheckIn.created_at >= today_start,
+            CheckIn.created_at < today_end
+        ).order_by(CheckIn.created_at.desc()).first()
+    return g.current_checkin
+
 
 def initial_routes(app):
     @app.route('/signup', methods=['GET', 'POST'])
@@ -15,12 +69,23 @@ def initial_routes(app):
         if current_user.is_authenticated:
             return redirect(url_for('index'))
         if request.method == 'POST':
+            # Turn floods away before paying for a password hash
+            wait = login_throttle.check(request.remote_addr)
+            if wait:
+                flash('Too many attempts. Please wait a moment and try again.', 'danger')
+                return render_template('signup.html'), 429, {'Retry-After': str(wait)}
+            login_throttle.attempted(request.remote_addr)
+
             username = request.form['username']
             email = request.form['email']
             password = request.form['password']
                 # ----- TODO: add validation (unique, email format, length) ----
             user = User(username=username, email=email)
-            user.set_password(password)
+            try:
+                user.set_password(password)
+            except HashingBusy:
+                flash('We\'re very busy right now. Please try again in a few seconds.', 'warning')
+                return render_template('signup.html'), 503, {'Retry-After': '2'}
             db.session.add(user)
             db.session.commit()
             flash('Account created successfully! Please log in.', 'success')
@@ -34,11 +99,29 @@ def initial_routes(app):
         if request.method == 'POST':
             email = request.form['email']
             password = request.form['password']
+
+            # Per-IP and per-account limits, checked before any hashing
+            wait = login_throttle.check(request.remote_addr, email)
+            if wait:
+                flash('Too many sign-in attempts. Please wait a moment and try again.', 'danger')
+                return render_template('login.html'), 429, {'Retry-After': str(wait)}
+            login_throttle.attempted(request.remote_addr)
+
             user = User.query.filter_by(email=email).first()
-            if user and user.check_password(password):
+            try:
+                # Unknown emails cost the same hash, so timing doesn't reveal accounts
+                valid = user.check_password(password) if user else verify_password(None, password)[0]
+            except HashingBusy:
+                flash('We\'re very busy right now. Please try again in a few seconds.', 'warning')
+                return render_template('login.html'), 503, {'Retry-After': '2'}
+            if user and valid:
+                login_throttle.succeeded(email)
+                # Saves the upgraded hash if check_password() rehashed it
+                db.session.commit()
                 login_user(user)
                 next_page = request.args.get('next')
                 return redirect(next_page) if next_page else redirect(url_for('index'))
+            login_throttle.failed(email)
             flash('Login failed. Check your email and password.', 'danger')
         return render_template('login.html')
 
@@ -52,20 +135,16 @@ def initial_routes(app):
     @app.route('/check-in', methods=['GET', 'POST'])
     @login_required
     def check_in():
-        today = date.today()
-
-        # Check for existing morning and night check-ins
-        morning_checkin = CheckIn.query.filter(
-            CheckIn.user_id == current_user.id,
-            db.func.date(CheckIn.created_at) == today,
-            CheckIn.time_of_day == 'Morning'
-        ).first()
+        today_start, today_end = today_range()
 
-        night_checkin = CheckIn.query.filter(
+        # Check for existing morning and night check-ins (one query for both)
+        todays_times = {time_of_day for (time_of_day,) in db.session.query(CheckIn.time_of_day).filter(
             CheckIn.user_id == current_user.id,
-            db.func.date(CheckIn.created_at) == today,
-            CheckIn.time_of_day == 'Night'
-        ).first()
+            CheckIn.created_at >= today_start,
+            CheckIn.created_at < today_end
+        )}
+        morning_checkin = 'Morning' in todays_times
+        night_checkin = 'Night' in todays_times
 
         if request.method == 'POST':
             time_of_day = request.form.get('time_of_day')
@@ -88,8 +167,12 @@ def initial_routes(app):
                 time_of_day=time_of_day
             )
             db.session.add(checkin)
+            record_checkin(checkin)
             db.session.commit()
 
+            # Start generating the practice in the background right away
+            enqueue_generation(checkin)
+
             flash(f'{time_of_day} check-in saved! You\'re feeling {mood.lower()}.', 'success')
             return redirect(url_for('practice'))
 
@@ -103,12 +186,8 @@ def initial_routes(app):
     @app.route('/practice')
     @login_required
     def practice():
-        # Get user's most recent check-in from today
-        today = date.today()
-        latest_checkin = CheckIn.query.filter(
-            CheckIn.user_id == current_user.id,
-            db.func.date(CheckIn.created_at) == today
-        ).order_by(CheckIn.created_at.desc()).first()
+        # Get user's most recent check-in from today (with practice, journal and feedback)
+        latest_checkin = current_checkin()
 
         # If no check-in today, redirect to check-in page
         if not latest_checkin:
@@ -116,58 +195,123 @@ def initial_routes(app):
             return redirect(url_for('check_in'))
 
         # Check if practice already exists for this check-in
-        existing_practice = Practice.query.filter_by(checkin_id=latest_checkin.id).first()
+        existing_practice = latest_checkin.practice
+        job = latest_checkin.generation_job
+        # A job lost in a restart (text or audio never finished) gets run again
+        resubmit_if_lost(job)
 
-        # If practice already exists, display it
+        # If practice already exists, display it (audio may still be rendering);
+        # 304 if the browser already has this version of the page
         if existing_practice:
-            return render_template('practice.html',
-                                   practice=existing_practice)
-
-        # Generate new AI content with time_of_day context
-        ai_result = generate_practice_and_prompt(
-            mood=latest_checkin.mood,
-            body_feeling=latest_checkin.body_feeling,
-            time_of_day=latest_checkin.time_of_day
-        )
-
-        # If AI fails, use fallback content
-        if not ai_result:
-            flash('Using fallback practice (AI service unavailable)', 'warning')
-            ai_result = get_fallback_content(latest_checkin.mood)
-
-        # Save practice (including journal prompt) to database
-        practice_obj = Practice(
-            checkin_id=latest_checkin.id,
-            title=ai_result['practice']['title'],
-            description=ai_result['practice']['description'],
-            practice_type=ai_result['practice']['type'],
-            journal_prompt=ai_result['journal_prompt']
-        )
-        db.session.add(practice_obj)
-        db.session.commit()
-
-        # Generate natural AI audio for the practice (mood-specific voice)
-        audio_filename = generate_audio(
-            ai_result['practice']['description'],
-            practice_obj.id,
-            latest_checkin.mood  # Pass mood to select appropriate voice
-        )
-        if audio_filename:
-            practice_obj.audio_file = audio_filename
-            db.session.commit()
+            return render_practice(existing_practice, job)
 
+        # Generation runs in the background; make sure a job is queued
+        # (older check-ins have none, failed jobs get retried)
+        if job is None or job.status == JOB_FAILED:
+            job = enqueue_generation(latest_checkin)
+
+        # Show the "preparing" state, the page polls practice_status
         return render_template('practice.html',
-                               practice=practice_obj)
+                               practice=None,
+                               job=job)
+
+    @app.route('/practice/status')
+    @login_required
+    def practice_status():
+        # Get user's most recent check-in from today (with practice, journal and feedback)
+        latest_checkin = current_checkin()
+
+        if not latest_checkin:
+            return jsonify({'error': 'no check-in today'}), 404
+
+        job = latest_checkin.generation_job
+        resubmit_if_lost(job)
+        return jsonify(job_status(job, latest_checkin.practice))
+
+    @app.route('/practice/<int:practice_id>/audio')
+    @login_required
+    def practice_audio_stream(practice_id):
+        practice = db.session.get(Practice, practice_id)
+        if not practice or practice.checkin.user_id != current_user.id:
+            abort(404)
+
+        # Already rendered: serve the stored file
+        if practice.audio_file:
+            return redirect(audio_url(practice.audio_file))
+
+        # Still rendering: relay ElevenLabs chunks as they arrive
+        chunks = stream_practice_audio(practice.description)
+        if chunks is None:
+            abort(404)
+        return Response(chunks, mimetype='audio/mpeg',
+                        headers={'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'})
+
+    @app.route('/audio/<path:key>')
+    def practice_audio(key):
+        # Audio never changes once written (content-addressed keys are the
+        # sha256 of the narration), so it can be cached forever. The hash is
+        # a natural strong ETag; legacy practice_{id}.mp3 files get one from
+        # werkzeug. Keys are unguessable, so like /static this needs no login.
+        storage = audio_storage()
+        remote_url = storage.url(key)
+        if remote_url:
+            # Bucket / CDN storage: the browser fetches the bytes from there
+            return redirect(remote_url)
+
+        max_age = current_app.config['AUDIO_CACHE_MAX_AGE']
+        etag = audio_etag(key) or True
+        mimetype = audio_mimetype(key)
+
+        accel_prefix = current_app.config.get('AUDIO_ACCEL_REDIRECT_PREFIX')
+        if accel_prefix:
+            # nginx serves the bytes (including Range requests) from its internal location
+            path = safe_join(str(storage.root), key)
+            if path is None or not os.path.isfile(path):
+                abort(404)
+            if etag is not True and request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = Response(mimetype=mimetype)
+                response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + key
+            if etag is not True:
+                response.set_etag(etag)
+        else:
+            # conditional=True answers If-None-Match with 304 and Range with 206;
+            # USE_X_SENDFILE hands the file to Apache/lighttpd instead
+            response = send_from_directory(storage.root, key, mimetype=mimetype,
+                                           conditional=True, etag=etag, max_age=max_age)
+
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.cache_control.immutable = True
+        response.headers['Accept-Ranges'] = 'bytes'
+        return response
+
+    @app.route('/assets/<filename>')
+    def asset(filename):
+        # Fingerprinted CSS/JS bundles (app/asset_pipeline.py): the name changes
+        # whenever the content does, so they're cacheable forever. Sent
+        # precompressed (brotli, then gzip) when the browser accepts it.
+        found = asset_path(filename, request.accept_encodings)
+        if found is None:
+            abort(404)
+        path, encoding = found
+        max_age = current_app.config['ASSETS_CACHE_MAX_AGE']
+        response = send_from_directory(DIST_DIR, path, mimetype=MIMETYPES[os.path.splitext(filename)[1]],
+                                       conditional=True, max_age=max_age)
+        if encoding:
+            response.content_encoding = encoding
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.cache_control.immutable = True
+        return response
 
     @app.route('/reflect', methods=['GET', 'POST'])
     @login_required
     def reflect():
-        # Get user's most recent check-in from today
-        today = date.today()
-        latest_checkin = CheckIn.query.filter(
-            CheckIn.user_id == current_user.id,
-            db.func.date(CheckIn.created_at) == today
-        ).order_by(CheckIn.created_at.desc()).first()
+        # Get user's most recent check-in from today (with practice, journal and feedback)
+        latest_checkin = current_checkin()
 
         # If no check-in today, redirect to check-in page
         if not latest_checkin:
@@ -175,7 +319,7 @@ def initial_routes(app):
             return redirect(url_for('check_in'))
 
         # Get the practice (which contains the journal prompt)
-        practice = Practice.query.filter_by(checkin_id=latest_checkin.id).first()
+        practice = latest_checkin.practice
         if not practice:
             flash('Practice not found. Please complete your practice first.', 'warning')
             return redirect(url_for('practice'))
@@ -193,7 +337,7 @@ def initial_routes(app):
             goal_for_tomorrow = request.form.get('goal_for_tomorrow', '').strip() if latest_checkin.time_of_day == 'Night' else None
 
             # Check if journal entry already exists for this check-in
-            existing_entry = JournalEntry.query.filter_by(checkin_id=latest_checkin.id).first()
+            existing_entry = latest_checkin.journal_entry
 
             if existing_entry:
                 # Update existing entry
@@ -215,11 +359,12 @@ def initial_routes(app):
                 db.session.add(journal_entry)
                 flash('Journal entry saved successfully!', 'success')
 
+            record_journal(latest_checkin)
             db.session.commit()
             return redirect(url_for('feedback'))
 
         # Check if there's already an entry to display
-        existing_entry = JournalEntry.query.filter_by(checkin_id=latest_checkin.id).first()
+        existing_entry = latest_checkin.journal_entry
 
         return render_template('reflect.html',
                                practice=practice,
@@ -228,12 +373,8 @@ def initial_routes(app):
     @app.route('/feedback', methods=['GET', 'POST'])
     @login_required
     def feedback():
-        # Get user's most recent check-in from today
-        today = date.today()
-        latest_checkin = CheckIn.query.filter(
-            CheckIn.user_id == current_user.id,
-            db.func.date(CheckIn.created_at) == today
-        ).order_by(CheckIn.created_at.desc()).first()
+        # Get user's most recent check-in from today (with practice, journal and feedback)
+        latest_checkin = current_checkin()
 
         # If no check-in today, redirect to check-in page
         if not latest_checkin:
@@ -241,7 +382,7 @@ def initial_routes(app):
             return redirect(url_for('check_in'))
 
         # Get the practice for this check-in
-        practice = Practice.query.filter_by(checkin_id=latest_checkin.id).first()
+        practice = latest_checkin.practice
         if not practice:
             flash('Practice not found. Please complete your practice first.', 'warning')
             return redirect(url_for('practice'))
@@ -259,7 +400,7 @@ def initial_routes(app):
             helped_bool = helped == 'yes' if helped else None
 
             # Check if feedback already exists for this practice
-            existing_feedback = PracticeFeedback.query.filter_by(practice_id=practice.id).first()
+            existing_feedback = practice.feedback
 
             if existing_feedback:
                 # Update existing feedback
@@ -279,11 +420,12 @@ def initial_routes(app):
                 db.session.add(practice_feedback)
                 flash('Thank you for your feedback!', 'success')
 
+            record_feedback(latest_checkin, int(rating))
             db.session.commit()
             return redirect(url_for('thank'))
 
         # Check if there's already feedback to display
-        existing_feedback = PracticeFeedback.query.filter_by(practice_id=practice.id).first()
+        existing_feedback = practice.feedback
 
         return render_template('feedback.html',
                                practice=practice,
@@ -293,16 +435,77 @@ def initial_routes(app):
     @login_required
     def thank():
         # Get user's most recent check-in to determine time of day
-        today = date.today()
-        latest_checkin = CheckIn.query.filter(
-            CheckIn.user_id == current_user.id,
-            db.func.date(CheckIn.created_at) == today
-        ).order_by(CheckIn.created_at.desc()).first()
+        latest_checkin = current_checkin()
 
         time_of_day = latest_checkin.time_of_day if latest_checkin else None
 
         return render_template('thank.html', time_of_day=time_of_day)
 
+    @app.route('/journal-history')
+    @login_required
+    def journal_history():
+        # Past journal entries, newest first, with search and mood / time of day filters
+        search = request.args.get('q', '').strip()
+        mood = request.args.get('mood') if request.args.get('mood') in MOODS else None
+        time_of_day = request.args.get('time_of_day') if request.args.get('time_of_day') in TIMES_OF_DAY else None
+
+        entries, next_cursor = journal_page(current_user.id,
+                                            search=search,
+                                            mood=mood,
+                                            time_of_day=time_of_day,
+                                            cursor=request.args.get('cursor'))
+
+        return render_template('journal_history.html',
+                               entries=entries,
+                               next_cursor=next_cursor,
+                               search=search,
+                               mood=mood,
+                               time_of_day=time_of_day,
+                               moods=MOODS,
+                               times_of_day=TIMES_OF_DAY)
+
+    @app.route('/export/<fmt>')
+    @login_required
+    def export_history(fmt):
+        # Download everything the user has recorded, streamed as it's read
+        if fmt not in EXPORT_FORMATS:
+            abort(404)
+
+        response = Response(stream_with_context(export_chunks(current_user.id, fmt)),
+                            mimetype=EXPORT_FORMATS[fmt])
+        response.headers['Content-Disposition'] = \
+            f'attachment; filename="{export_filename(current_user.id, fmt)}"'
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        # Prometheus scrape endpoint (per process); hidden unless a token is configured
+        token = current_app.config.get('METRICS_TOKEN')
+        if not token or request.headers.get('Authorization') != f'Bearer {token}':
+            abort(404)
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+    @app.route('/admin/profiles')
+    @login_required
+    def admin_profiles():
+        # Recent request profiles (see app/profiling.py); admins only
+        if not is_admin():
+            abort(404)
+        return render_template('admin_profiles.html', profiles=list_profiles(limit=100),
+                               sample_rate=current_app.config.get('PROFILE_SAMPLE_RATE', 0))
+
+    @app.route('/admin/profiles/<name>.<fmt>')
+    @login_required
+    def admin_profile_download(name, fmt):
+        if not is_admin():
+            abort(404)
+        path = profile_file(name, fmt)
+        if path is None:
+            abort(404)
+        return send_from_directory(path.parent, path.name, as_attachment=True,
+                                   mimetype='application/json' if fmt == 'speedscope' else 'text/plain')
+
     @app.route('/')
     def index():
         return render_template('index.html')
\ No newline at end of file
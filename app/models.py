@@ -1,7 +1,7 @@
 from datetime import datetime
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
+from app.passwords import hash_password, verify_password
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -15,15 +15,25 @@ class User(UserMixin, db.Model):
     journal_entries = db.relationship('JournalEntry', backref='user', lazy=True)
     practice_feedbacks = db.relationship('PracticeFeedback', backref='user', lazy=True)
 
+    # Both hash in the app's process pool and raise app.passwords.HashingBusy when it's saturated
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """True if `password` matches; a hash made with older parameters is replaced (the caller commits)."""
+        matches, new_hash = verify_password(self.password_hash, password)
+        if new_hash:
+            self.password_hash = new_hash
+        return matches
 
 
 class CheckIn(db.Model):
     __tablename__ = 'user_checkins'
+    __table_args__ = (
+        # "today's check-ins for this user" lookups on every authenticated page
+        db.Index('ix_user_checkins_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_user_checkins_user_id_time_of_day_created_at', 'user_id', 'time_of_day', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -35,6 +45,7 @@ class CheckIn(db.Model):
     # Relationships to AI-generated content and user responses
     practice = db.relationship('Practice', backref='checkin', lazy=True, uselist=False)
     journal_entry = db.relationship('JournalEntry', backref='checkin', lazy=True, uselist=False)
+    generation_job = db.relationship('GenerationJob', backref='checkin', lazy=True, uselist=False)
 
     def __repr__(self):
         return f'<CheckIn {self.mood} by User {self.user_id} at {self.created_at}>'
@@ -45,13 +56,20 @@ class Practice(db.Model):
     __tablename__ = 'practices'
 
     id = db.Column(db.Integer, primary_key=True)
-    checkin_id = db.Column(db.Integer, db.ForeignKey('user_checkins.id'), nullable=False)
+    checkin_id = db.Column(db.Integer, db.ForeignKey('user_checkins.id'), nullable=False, unique=True, index=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
     practice_type = db.Column(db.String(50), nullable=False)  # breathing, meditation, movement, grounding
     journal_prompt = db.Column(db.Text, nullable=False)  # AI-generated journal prompt
-    audio_file = db.Column(db.String(255), nullable=True)  # ElevenLabs TTS audio filename
+    audio_file = db.Column(db.String(255), nullable=True)  # storage key, ab/cd/<sha256>.mp3 (see app.audio_store)
+    # Filled in by app.transcode once the audio is rendered
+    audio_duration = db.Column(db.Float, nullable=True)  # seconds, so the player needn't preload to show it
+    audio_size = db.Column(db.Integer, nullable=True)  # bytes of the variant browsers get first
+    audio_codec = db.Column(db.String(20), nullable=True)  # opus (+ aac variant) or mp3 (not transcoded)
     created_at = db.Column(db.DateTime, default=datetime.now)
+    # Bumped whenever audio lands or a fallback is upgraded; versions the
+    # practice page (ETag / Last-Modified) and its cached fragment
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
 
     # Relationship to feedback
     feedback = db.relationship('PracticeFeedback', backref='practice', lazy=True, uselist=False)
@@ -63,9 +81,16 @@ class Practice(db.Model):
 class JournalEntry(db.Model):
     """User's journal reflection entry"""
     __tablename__ = 'journal_entries'
+    __table_args__ = (
+        # keyset pagination for /journal-history
+        db.Index('ix_journal_entries_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+    )
+    # Full-text search: Postgres has a generated `search_vector` tsvector column
+    # (GIN indexed), SQLite a `journal_entries_fts` FTS5 table; both are created by
+    # the migration and used through app.journal_history
 
     id = db.Column(db.Integer, primary_key=True)
-    checkin_id = db.Column(db.Integer, db.ForeignKey('user_checkins.id'), nullable=False)
+    checkin_id = db.Column(db.Integer, db.ForeignKey('user_checkins.id'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     entry_text = db.Column(db.Text, nullable=False)  # Response to AI-generated prompt
 
@@ -85,7 +110,7 @@ class PracticeFeedback(db.Model):
     __tablename__ = 'practice_feedbacks'
 
     id = db.Column(db.Integer, primary_key=True)
-    practice_id = db.Column(db.Integer, db.ForeignKey('practices.id'), nullable=False)
+    practice_id = db.Column(db.Integer, db.ForeignKey('practices.id'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     rating = db.Column(db.Integer, nullable=False)  # 1-5 (emoji scale: 😞 😐 🙂 😊 🤩)
     helped = db.Column(db.Boolean, nullable=True)  # Did this help?
@@ -96,6 +121,88 @@ class PracticeFeedback(db.Model):
         return f'<PracticeFeedback rating={self.rating} for Practice {self.practice_id}>'
 
 
+class GenerationJob(db.Model):
+    """Background job that generates the practice (text + audio) for a check-in"""
+    __tablename__ = 'generation_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    checkin_id = db.Column(db.Integer, db.ForeignKey('user_checkins.id'), unique=True, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, text_ready, done, failed
+    used_fallback = db.Column(db.Boolean, nullable=False, default=False)  # AI unavailable, fallback content used
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f'<GenerationJob {self.status} for CheckIn {self.checkin_id}>'
+
+
+class PracticeInventory(db.Model):
+    """Pre-generated practice (text + audio) waiting to be handed to a check-in"""
+    __tablename__ = 'practice_inventory'
+    __table_args__ = (
+        db.Index('ix_practice_inventory_bucket', 'mood', 'time_of_day', 'practice_type', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    mood = db.Column(db.String(20), nullable=False)
+    time_of_day = db.Column(db.String(10), nullable=False)
+    practice_type = db.Column(db.String(50), nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    journal_prompt = db.Column(db.Text, nullable=False)
+    audio_file = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    def __repr__(self):
+        return f'<PracticeInventory {self.mood}/{self.time_of_day}/{self.practice_type}: {self.title}>'
+
+
+class AudioBlob(db.Model):
+    """Content-addressed audio file and how many practices reference it"""
+    __tablename__ = 'audio_blobs'
+
+    key = db.Column(db.String(255), primary_key=True)  # ab/cd/<sha256>.mp3, same value as Practice.audio_file
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    size_bytes = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    released_at = db.Column(db.DateTime, nullable=True)  # when ref_count last dropped to 0; GC grace runs from here
+
+    def __repr__(self):
+        return f'<AudioBlob {self.key} refs={self.ref_count}>'
+
+
+class UserDailyStats(db.Model):
+    """Per-user, per-day rollup kept up to date on every check-in, journal and feedback write"""
+    __tablename__ = 'user_daily_stats'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', name='uq_user_daily_stats_user_id_day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+
+    morning_mood = db.Column(db.String(20), nullable=True)
+    night_mood = db.Column(db.String(20), nullable=True)
+    morning_practice_done = db.Column(db.Boolean, nullable=False, default=False)
+    night_practice_done = db.Column(db.Boolean, nullable=False, default=False)
+    morning_journal_done = db.Column(db.Boolean, nullable=False, default=False)
+    night_journal_done = db.Column(db.Boolean, nullable=False, default=False)
+    morning_feedback_done = db.Column(db.Boolean, nullable=False, default=False)
+    night_feedback_done = db.Column(db.Boolean, nullable=False, default=False)
+    morning_rating = db.Column(db.Integer, nullable=True)  # 1-5
+    night_rating = db.Column(db.Integer, nullable=True)  # 1-5
+
+    # Consecutive days with at least one check-in, ending on this day
+    streak = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f'<UserDailyStats User {self.user_id} on {self.day} streak={self.streak}>'
+
+
 '''--------| TEST SPRINT 0 | DATABASE CONFIGS | ---------
 class TestModel(db.Model):
     id = db.Column(db.Integer, primary_key=True)
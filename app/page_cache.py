@@ -0,0 +1,208 @@
+# By Frances Belleza
+# Function: conditional GET and fragment caching for the practice page
+#              a practice only changes when its audio lands, gets transcoded or
+#              a fallback is upgraded (all bump Practice.updated_at), so the
+#              page is versioned by it: browsers revalidate with ETag /
+#              Last-Modified and get a 304, and the rendered practice card is
+#              kept in a size-bounded LRU per process. Templates are compiled
+#              once per deploy through Jinja's bytecode cache.
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+from pathlib import Path
+from flask import current_app, render_template, request, session
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from werkzeug.http import is_resource_modified
+from app import metrics
+from app.asset_pipeline import asset_version
+from app.storage import audio_storage
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / 'templates'
+
+fragment_lookups = metrics.counter(
+    'fragment_cache_requests_total', 'Practice fragment cache lookups, by result (hit, miss)', labels=('result',))
+practice_page_responses = metrics.counter(
+    'practice_page_responses_total', 'Practice page responses, by result (not_modified, rendered)',
+    labels=('result',))
+
+_templates_hash = None
+
+
+class FragmentCache:
+    """
+    LRU of rendered HTML fragments, bounded by their total size in bytes.
+
+    Keys carry the version of what was rendered, so nothing is ever
+    invalidated: a changed practice gets a new key and its old entry ages out.
+    """
+
+    def __init__(self, max_bytes=4 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> html
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_bytes = app.config.get('FRAGMENT_CACHE_MAX_BYTES', self.max_bytes)
+
+    def get_or_render(self, key, render):
+        """
+        Args:
+            key (tuple): What was rendered and its version
+            render (callable): Renders the fragment on a miss
+
+        Returns:
+            Markup: The fragment's HTML
+        """
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if html is not None:
+            fragment_lookups.inc(result='hit')
+            return Markup(html)
+
+        fragment_lookups.inc(result='miss')
+        html = str(render())
+        size = len(html.encode('utf-8'))
+        if size > self.max_bytes:
+            return Markup(html)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous.encode('utf-8'))
+            self._entries[key] = html
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.encode('utf-8'))
+        return Markup(html)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'fragments': len(self._entries), 'bytes': self.size}
+
+
+fragment_cache = FragmentCache()
+
+metrics.gauge('fragment_cache_bytes', 'Bytes of rendered fragments held in this process',
+              lambda: {(): fragment_cache.size})
+
+
+def templates_version():
+    """Hash of the template sources, so a deploy that changes the markup changes every ETag."""
+    global _templates_hash
+    if _templates_hash is None or current_app.debug:
+        digest = hashlib.sha256()
+        for path in sorted(TEMPLATES_DIR.glob('*.html')):
+            digest.update(path.name.encode())
+            digest.update(path.read_bytes())
+        _templates_hash = digest.hexdigest()
+    return _templates_hash
+
+
+def practice_version(practice, job):
+    """
+    Everything besides the practice's id that the rendered page depends on.
+
+    Args:
+        practice (Practice): The practice shown
+        job (GenerationJob): Its generation job, or None
+
+    Returns:
+        str: Changes whenever the rendered page would
+    """
+    updated = practice.updated_at or practice.created_at
+    parts = [
+        updated.isoformat(),
+        job.status if job else '',
+        'fallback' if job and job.used_fallback else '',
+        templates_version(),
+        asset_version(),
+    ]
+    # Pre-signed audio URLs expire; roll the version before the ones in a cached page do
+    lifetime = audio_storage().url_lifetime
+    if lifetime and practice.audio_file:
+        parts.append(str(int(time.time() // lifetime)))
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()[:16]
+
+
+def practice_last_modified(practice, job):
+    """
+    Returns:
+        datetime: When the practice or its job last changed (UTC, whole seconds)
+    """
+    changed = [stamp for stamp in (practice.updated_at or practice.created_at, job.updated_at if job else None)
+               if stamp is not None]
+    # Columns hold naive local times (datetime.now)
+    return max(changed).astimezone(timezone.utc).replace(microsecond=0)
+
+
+def render_practice(practice, job):
+    """
+    The practice page, or an empty 304 Not Modified if the browser's copy is current.
+
+    Pages carrying flashed messages get no validators: the message is shown
+    once, and a later 304 would bring it back from the browser's copy.
+
+    Args:
+        practice (Practice): The practice to show
+        job (GenerationJob): Its generation job, or None
+
+    Returns:
+        Response: 200 with the page, or 304
+    """
+    version = practice_version(practice, job)
+    etag = f'practice-{practice.id}-{version}'
+    last_modified = practice_last_modified(practice, job)
+    conditional = '_flashes' not in session
+
+    if conditional and not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        practice_page_responses.inc(result='not_modified')
+        response = current_app.response_class(status=304)
+    else:
+        practice_page_responses.inc(result='rendered')
+        card = fragment_cache.get_or_render(
+            (practice.id, version),
+            lambda: render_template('practice_card.html', practice=practice, job=job))
+        response = current_app.make_response(
+            render_template('practice.html', practice=practice, job=job, practice_card=card))
+
+    if conditional:
+        response.set_etag(etag)
+        response.last_modified = last_modified
+    # Per-user page: the browser may keep it, but has to ask before reusing it
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+
+def init_app(app):
+    """
+    Size the fragment cache and compile templates through a bytecode cache
+    shared by this host's workers, so a cold worker loads them instead of
+    recompiling.
+
+    Args:
+        app (Flask): The application being created
+    """
+    fragment_cache.init_app(app)
+    if app.config.get('JINJA_BYTECODE_CACHE', True):
+        directory = app.config.get('JINJA_BYTECODE_CACHE_DIR') or os.path.join(app.instance_path, 'jinja_cache')
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
@@ -0,0 +1,238 @@
+# By Frances Belleza
+# Function: password hashing off the request threads
+#              scrypt/PBKDF2 run in a few worker processes with a bounded queue;
+#              when it's full, logins and signups are turned away at once
+#              (503) instead of piling up and starving every other route.
+#              Hashes made with older parameters are upgraded on login.
+#
+# The workers are plain subprocesses running app/hash_worker.py, not
+# multiprocessing children: those re-import the parent's __main__, so any
+# script, WSGI file or test harness that builds the app at module level
+# would build it again in every worker. If a worker can't be started, the
+# hashing runs on the (equally bounded) pool threads instead.
+
+import json
+import logging
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from pathlib import Path
+from flask import current_app, has_app_context
+from app import metrics
+from app.hash_worker import hash_password as _hash, verify_password as _verify
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = str(Path(__file__).resolve().parent / 'hash_worker.py')
+
+hash_seconds = metrics.histogram(
+    'password_hash_seconds', 'Time to hash or verify a password, queueing included, by operation',
+    labels=('operation',))
+hash_rejected = metrics.counter(
+    'password_hash_rejected_total', 'Hash requests turned away, by reason (busy, timeout, broken)',
+    labels=('reason',))
+rehashes = metrics.counter(
+    'password_rehash_total', 'Password hashes upgraded to the current parameters on login')
+
+
+class HashingBusy(Exception):
+    """The hashing pool is saturated (or a worker died); retry shortly."""
+
+
+class WorkerDied(Exception):
+    """A hashing process exited (or never came up)."""
+
+
+class _WorkerProcess:
+    """One hashing subprocess, used by one pool thread at a time."""
+
+    def __init__(self):
+        self.process = subprocess.Popen([sys.executable, WORKER_SCRIPT], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, text=True, bufsize=1)
+        if self.process.stdout.readline().strip() != 'ready':
+            self.close()
+            raise WorkerDied('password hashing process failed to start')
+
+    def call(self, operation, args):
+        try:
+            self.process.stdin.write(json.dumps({'operation': operation, 'args': args}) + '\n')
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        except (OSError, ValueError):
+            line = ''
+        if not line:
+            self.close()
+            raise WorkerDied(f'password hashing process exited ({self.process.returncode})')
+        reply = json.loads(line)
+        if 'error' in reply:
+            raise RuntimeError(reply['error'])
+        return reply['result']
+
+    def close(self):
+        self.process.kill()
+        self.process.wait()
+
+
+# ---------- request side ----------
+
+class PasswordHasher:
+    """
+    Hashes passwords in `workers` processes, with at most `queue_size`
+    requests waiting for one. workers=0 hashes inline on the calling thread
+    (scripts, the CLI), still limited to queue_size at a time.
+    """
+
+    def __init__(self, method='scrypt', workers=2, queue_size=16, timeout=10):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue_size)
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._local = threading.local()  # each pool thread's worker process
+        self._use_processes = True
+        self._reference = None  # hash of a random password with the current parameters
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+            return self._executor
+
+    def _call(self, operation, function, args):
+        """Runs on a pool thread: hand the work to this thread's process, starting it if needed."""
+        worker = getattr(self._local, 'worker', None)
+        if worker is None and self._use_processes:
+            try:
+                worker = self._local.worker = _WorkerProcess()
+            except (OSError, WorkerDied) as e:
+                logger.error('Could not start a password hashing process (%s); hashing on the pool threads', e)
+                self._use_processes = False
+        if worker is None:
+            return function(*args)
+        try:
+            return worker.call(operation, args)
+        except WorkerDied:
+            # The next call on this thread starts a new one
+            self._local.worker = None
+            raise
+
+    def _release(self, _future=None):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _run(self, operation, function, *args):
+        if not self._slots.acquire(blocking=False):
+            hash_rejected.inc(reason='busy')
+            raise HashingBusy('password hashing queue is full')
+        with self._in_flight_lock:
+            self._in_flight += 1
+        start = time.perf_counter()
+        try:
+            if self.workers <= 0:
+                try:
+                    return function(*args)
+                finally:
+                    self._release()
+
+            future = self._pool().submit(self._call, operation, function, args)
+            # The slot is held until the work is really done, even if we stop waiting
+            future.add_done_callback(self._release)
+            try:
+                return future.result(timeout=self.timeout)
+            except FuturesTimeout:
+                hash_rejected.inc(reason='timeout')
+                raise HashingBusy('password hashing timed out')
+            except WorkerDied as e:
+                logger.error('%s; starting a new one', e)
+                hash_rejected.inc(reason='broken')
+                raise HashingBusy('password hashing process restarted')
+        finally:
+            hash_seconds.observe(time.perf_counter() - start, operation=operation)
+
+    def _reference_hash(self):
+        if self._reference is None:
+            self._reference = self._run('hash', _hash, secrets.token_urlsafe(16), self.method)
+        return self._reference
+
+    def hash(self, password):
+        """
+        Returns:
+            str: werkzeug-format hash of `password` with the current parameters
+
+        Raises:
+            HashingBusy: If the pool is saturated
+        """
+        return self._run('hash', _hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """
+        Check a password. Pass pwhash=None for an unknown account: the same
+        work is done against a dummy hash, so timing doesn't reveal which
+        emails have accounts.
+
+        Returns:
+            tuple: (matches, new hash to store if the stored one is outdated, else None)
+
+        Raises:
+            HashingBusy: If the pool is saturated
+        """
+        reference = self._reference_hash()
+        current_method = reference.split('$', 1)[0]
+        if pwhash is None:
+            self._run('verify', _verify, reference, password, self.method, current_method)
+            return False, None
+        matches, new_hash = self._run('verify', _verify, pwhash, password, self.method, current_method)
+        if new_hash:
+            rehashes.inc()
+        return matches, new_hash
+
+
+# Outside an app (scripts, `flask shell` before init) hash inline
+_inline_hasher = PasswordHasher(workers=0)
+
+
+def password_hasher():
+    if has_app_context():
+        return current_app.extensions.get('password_hasher', _inline_hasher)
+    return _inline_hasher
+
+
+metrics.gauge('password_hash_in_flight', 'Password hashes running or queued in this process',
+              lambda: {(): password_hasher().in_flight})
+
+
+def hash_password(password):
+    """Hash with the app's hasher; see PasswordHasher.hash()."""
+    return password_hasher().hash(password)
+
+
+def verify_password(pwhash, password):
+    """Verify with the app's hasher; see PasswordHasher.verify()."""
+    return password_hasher().verify(pwhash, password)
+
+
+def init_app(app):
+    """
+    Create the app's hasher. Its processes start on first use, one per pool thread.
+
+    Args:
+        app (Flask): The application being created
+    """
+    hasher = PasswordHasher(
+        method=app.config.get('PASSWORD_HASH_METHOD', 'scrypt'),
+        workers=app.config.get('PASSWORD_HASH_WORKERS', 2),
+        queue_size=app.config.get('PASSWORD_HASH_QUEUE', 16),
+        timeout=app.config.get('PASSWORD_HASH_TIMEOUT', 10),
+    )
+    app.extensions['password_hasher'] = hasher
@@ -0,0 +1,280 @@
+# By Frances Belleza
+# Function: on-demand sampling profiler for single requests
+#              a background thread snapshots the request thread's stack every
+#              few milliseconds (no tracing, so the request runs at almost full
+#              speed) and the result is saved as collapsed stacks (flamegraph.pl,
+#              speedscope) and speedscope JSON, listed on /admin/profiles
+
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from flask import current_app, g, request
+from flask_login import current_user
+
+logger = logging.getLogger(__name__)
+
+# Frames from here down are the profiler's own, not the request's
+_PROJECT_ROOT = str(Path(__file__).resolve().parent.parent) + os.sep
+_PROFILE_NAME = re.compile(r'^[0-9]{8}T[0-9]{6}_[A-Za-z0-9_.-]+_[0-9a-f]{8}$')
+
+
+def is_admin(user=None):
+    """True if the (current) user's email is in ADMIN_EMAILS."""
+    user = user or current_user
+    if not getattr(user, 'is_authenticated', False):
+        return False
+    admins = current_app.config.get('ADMIN_EMAILS') or ()
+    return user.email.lower() in admins
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack at a fixed interval from a helper thread.
+
+    It's wall-clock sampling: time blocked on the database, a socket or a
+    lock shows up too, which is what we want for "where did this request go".
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()  # tuple of frames (root first) -> sample count
+        self.samples = []  # (stack, seconds since previous sample) in order, for speedscope
+        self.started = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, _short_path(code.co_filename), frame.f_lineno))
+                frame = frame.f_back
+            stack = tuple(reversed(stack))
+            self.stacks[stack] += 1
+            self.samples.append((stack, now - last))
+            last = now
+
+
+def _short_path(filename):
+    if filename.startswith(_PROJECT_ROOT):
+        return filename[len(_PROJECT_ROOT):]
+    # site-packages/sqlalchemy/orm/query.py -> sqlalchemy/orm/query.py
+    marker = filename.rfind('site-packages' + os.sep)
+    if marker >= 0:
+        return filename[marker + len('site-packages') + 1:]
+    return filename
+
+
+def collapsed_stacks(sampler):
+    """Brendan Gregg's folded format: 'root;child;leaf count' per line."""
+    lines = []
+    for stack, count in sampler.stacks.most_common():
+        frames = ';'.join(f"{name} ({path}:{line})" for name, path, line in stack)
+        lines.append(f"{frames} {count}")
+    return '\n'.join(lines) + '\n'
+
+
+def speedscope_profile(sampler, name):
+    """Sampled profile in speedscope's file format (https://www.speedscope.app)."""
+    frames = []
+    index = {}
+    samples = []
+    weights = []
+    for stack, weight in sampler.samples:
+        ids = []
+        for name_, path, line in stack:
+            key = (name_, path, line)
+            if key not in index:
+                index[key] = len(frames)
+                frames.append({'name': name_, 'file': path, 'line': line})
+            ids.append(index[key])
+        samples.append(ids)
+        weights.append(round(weight * 1000, 3))
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'mindfulness-tracker',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': round(sum(weights), 3),
+            'samples': samples,
+            'weights': weights,
+        }],
+    }
+
+
+def profile_dir():
+    path = current_app.config.get('PROFILE_DIR') or os.path.join(current_app.instance_path, 'profiles')
+    return Path(path)
+
+
+_pruning = threading.Lock()
+
+
+def _prune_profiles(directory, keep):
+    """Delete all but the newest `keep` profiles (names start with their timestamp)."""
+    try:
+        names = sorted((path.name[:-len('.json')] for path in directory.glob('*.json')
+                        if not path.name.endswith('.speedscope.json')), reverse=True)
+        for name in names[keep:]:
+            for suffix in ('.collapsed', '.speedscope.json', '.json'):
+                (directory / f"{name}{suffix}").unlink(missing_ok=True)
+    except OSError as e:
+        logger.error('Pruning request profiles failed: %s', e)
+    finally:
+        _pruning.release()
+
+
+def save_profile(sampler, meta):
+    """
+    Write a finished profile (.collapsed, .speedscope.json and .json metadata)
+    and drop the oldest beyond PROFILE_KEEP on a background thread, so the
+    profiled request doesn't wait on a directory listing.
+
+    Returns:
+        str: The profile's name
+    """
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    endpoint = re.sub(r'[^A-Za-z0-9_.-]', '-', meta['endpoint'])[:40]
+    name = f"{datetime.now():%Y%m%dT%H%M%S}_{endpoint}_{uuid.uuid4().hex[:8]}"
+
+    (directory / f"{name}.collapsed").write_text(collapsed_stacks(sampler))
+    (directory / f"{name}.speedscope.json").write_text(
+        json.dumps(speedscope_profile(sampler, f"{meta['method']} {meta['path']}")))
+    (directory / f"{name}.json").write_text(json.dumps(dict(meta, name=name, samples=sum(sampler.stacks.values()))))
+
+    # One prune at a time; if one is running, the next save catches up
+    if _pruning.acquire(blocking=False):
+        keep = current_app.config.get('PROFILE_KEEP', 200)
+        threading.Thread(target=_prune_profiles, args=(directory, keep),
+                         name='profile-prune', daemon=True).start()
+    return name
+
+
+def list_profiles(limit=None):
+    """
+    Returns:
+        list: Metadata dicts of saved profiles, newest first
+    """
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for path in directory.glob('*.json'):
+        if path.name.endswith('.speedscope.json'):
+            continue
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    profiles.sort(key=lambda meta: meta['name'], reverse=True)
+    return profiles[:limit] if limit else profiles
+
+
+def profile_file(name, fmt):
+    """
+    Returns:
+        Path: The saved file for a profile name and format (collapsed or speedscope), or None
+    """
+    if not _PROFILE_NAME.match(name) or fmt not in ('collapsed', 'speedscope'):
+        return None
+    path = profile_dir() / (f"{name}.collapsed" if fmt == 'collapsed' else f"{name}.speedscope.json")
+    return path if path.is_file() else None
+
+
+def _profile_requested():
+    """Why this request should be profiled ('token', 'admin', 'sampled'), or None."""
+    config = current_app.config
+    token = config.get('PROFILE_TOKEN')
+    if token and request.headers.get('X-Profile') == token:
+        return 'token'
+    if request.args.get('profile') == '1' and is_admin():
+        return 'admin'
+    rate = config.get('PROFILE_SAMPLE_RATE', 0)
+    if rate and random.random() < rate:
+        return 'sampled'
+    return None
+
+
+def _start_profiling():
+    # Static files and the profile pages themselves aren't worth profiling
+    if request.endpoint in (None, 'static') or (request.endpoint or '').startswith('admin_profile'):
+        return
+    reason = _profile_requested()
+    if reason is None:
+        return
+    g.profiler = StackSampler(threading.get_ident(), current_app.config.get('PROFILE_INTERVAL', 0.005))
+    g.profile_reason = reason
+    g.profiler.start()
+
+
+def _finish_profiling(response):
+    sampler = g.pop('profiler', None)
+    if sampler is None:
+        return response
+    sampler.stop()
+    try:
+        name = save_profile(sampler, {
+            'endpoint': request.endpoint or 'unmatched',
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(sampler.elapsed * 1000, 1),
+            'reason': g.pop('profile_reason', None),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+        })
+        response.headers['X-Profile-Id'] = name
+    except OSError as e:
+        logger.error('Saving request profile failed: %s', e)
+    return response
+
+
+def _stop_on_error(exc):
+    # after_request doesn't run if the request blew up; don't leave the sampler running
+    sampler = g.pop('profiler', None)
+    if sampler is not None:
+        sampler.stop()
+
+
+def init_app(app):
+    """
+    Profile requests that ask for it: an `X-Profile: <PROFILE_TOKEN>` header,
+    `?profile=1` from an admin, or a random PROFILE_SAMPLE_RATE fraction.
+
+    Args:
+        app (Flask): The application being created
+    """
+    app.before_request(_start_profiling)
+    app.after_request(_finish_profiling)
+    app.teardown_request(_stop_on_error)
@@ -0,0 +1,284 @@
+# By Frances Belleza
+# Function: where practice audio lives
+#              a local directory (one node, or a shared mount) or an
+#              S3-compatible bucket (AWS S3, MinIO...) that every app node can
+#              read, with pre-signed / CDN URLs so browsers fetch the bytes
+#              from the bucket instead of through a Flask worker
+
+import os
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+# The package's static/audio, wherever the app is started from
+DEFAULT_AUDIO_ROOT = Path(__file__).resolve().parent / 'static' / 'audio'
+
+
+class StorageError(Exception):
+    """Raised when the configured storage backend can't be used."""
+
+
+class LocalStorage:
+    """
+    Audio files in a directory: app/static/audio by default, or a mount
+    shared by all app nodes (AUDIO_STORAGE_PATH).
+
+    Files are served by the /audio route (or nginx / X-Sendfile), so url()
+    returns None.
+    """
+
+    def __init__(self, root=None):
+        self.root = Path(root or DEFAULT_AUDIO_ROOT).resolve()
+
+    def path(self, key):
+        return self.root / key
+
+    def exists(self, key):
+        return self.path(key).is_file()
+
+    def size(self, key):
+        """Returns: int: Size in bytes, or None if the key isn't stored"""
+        try:
+            return self.path(key).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def write(self, key, chunks, content_type=None):
+        """
+        Store chunks under `key`.
+
+        Writes to a temporary file and renames it into place, so a reader never
+        sees a half-written file and two workers rendering the same key don't clash.
+        """
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.part")
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    if chunk:
+                        f.write(chunk)
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def read(self, key, chunk_size=64 * 1024):
+        with open(self.path(key), 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def delete(self, key):
+        self.path(key).unlink(missing_ok=True)
+
+    def url(self, key):
+        return None
+
+    @property
+    def url_lifetime(self):
+        """Seconds a URL from url() stays usable; None for URLs that never expire."""
+        return None
+
+
+class S3Storage:
+    """
+    Audio objects in an S3-compatible bucket, shared by every app node.
+
+    url() hands out a CDN URL (AUDIO_PUBLIC_BASE_URL) or a pre-signed GET,
+    so the bytes go from the bucket straight to the browser. Objects never
+    change once written, so they are uploaded with an immutable Cache-Control.
+    """
+
+    # Pre-signed URLs are reused for half their lifetime so browsers can cache the audio
+    URL_CACHE_SIZE = 4096
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None, url_expiry=3600,
+                 public_base_url=None, cache_max_age=365 * 24 * 3600, pool_size=10,
+                 connect_timeout=5, read_timeout=30, client=None):
+        if not bucket:
+            raise StorageError("AUDIO_S3_BUCKET is required for the s3 audio storage backend")
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.url_expiry = url_expiry
+        self.public_base_url = public_base_url.rstrip('/') if public_base_url else None
+        self.cache_control = f'public, max-age={cache_max_age}, immutable'
+        self._urls = {}
+        self._urls_lock = threading.Lock()
+
+        if client is None:
+            try:
+                import boto3
+                from botocore.config import Config as BotoConfig
+            except ImportError as e:
+                raise StorageError("The s3 audio storage backend needs boto3 (pip install boto3)") from e
+            client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region, config=BotoConfig(
+                signature_version='s3v4',
+                # MinIO and most other S3-compatible servers want path-style URLs
+                s3={'addressing_style': 'path' if endpoint_url else 'auto'},
+                max_pool_connections=pool_size,
+                connect_timeout=connect_timeout,
+                read_timeout=read_timeout,
+                retries={'mode': 'standard'},
+            ))
+        self.client = client
+
+    def object_key(self, key):
+        return self.prefix + key
+
+    def _head(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def exists(self, key):
+        return self._head(key) is not None
+
+    def size(self, key):
+        head = self._head(key)
+        return head['ContentLength'] if head else None
+
+    def write(self, key, chunks, content_type=None):
+        """
+        Store chunks under `key`. They are spooled locally first (narration is a
+        few MB at most) and uploaded in one go; S3 puts are atomic, so readers
+        never see a partial object.
+        """
+        extra = {'CacheControl': self.cache_control}
+        if content_type:
+            extra['ContentType'] = content_type
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as f:
+            for chunk in chunks:
+                if chunk:
+                    f.write(chunk)
+            f.seek(0)
+            self.client.upload_fileobj(f, self.bucket, self.object_key(key), ExtraArgs=extra)
+
+    def read(self, key, chunk_size=64 * 1024):
+        body = self.client.get_object(Bucket=self.bucket, Key=self.object_key(key))['Body']
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+        with self._urls_lock:
+            self._urls.pop(key, None)
+
+    @property
+    def url_lifetime(self):
+        """
+        Seconds a URL from url() stays usable; None for CDN URLs. A cached
+        pre-signed URL has at least half of url_expiry left.
+        """
+        return None if self.public_base_url else self.url_expiry / 2
+
+    def url(self, key):
+        """
+        Returns:
+            str: CDN URL, or a pre-signed GET valid for url_expiry seconds
+        """
+        if self.public_base_url:
+            return f"{self.public_base_url}/{self.object_key(key)}"
+
+        now = time.monotonic()
+        with self._urls_lock:
+            cached = self._urls.get(key)
+            if cached and cached[1] > now:
+                return cached[0]
+
+        url = self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self.object_key(key)}, ExpiresIn=self.url_expiry)
+        with self._urls_lock:
+            if len(self._urls) >= self.URL_CACHE_SIZE:
+                self._urls.clear()
+            self._urls[key] = (url, now + self.url_expiry / 2)
+        return url
+
+
+def copy_to_file(storage, key, path):
+    """Download a stored object to a local file (e.g. for ffmpeg)."""
+    with open(path, 'wb') as f:
+        for chunk in storage.read(key):
+            f.write(chunk)
+
+
+def read_file(path, chunk_size=64 * 1024):
+    """Yield a local file in chunks, for storage.write()."""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+_storage = {}
+_storage_lock = threading.Lock()
+
+
+def configure_storage(settings):
+    """
+    Create the process-wide audio storage. Called once by create_app();
+    scripts that never create the app get it from the environment on first use.
+
+    Settings (app.config or os.environ):
+        AUDIO_STORAGE_BACKEND: local (default) or s3
+        AUDIO_STORAGE_PATH: local directory (default app/static/audio in the package)
+        AUDIO_S3_BUCKET, AUDIO_S3_PREFIX: where objects go
+        AUDIO_S3_ENDPOINT_URL: for MinIO and other S3-compatible servers
+        AUDIO_S3_REGION: bucket region
+        AUDIO_URL_EXPIRY: seconds a pre-signed URL is valid
+        AUDIO_PUBLIC_BASE_URL: CDN in front of the bucket; used instead of pre-signing
+
+    S3 credentials come from the usual AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY
+    environment variables (or instance role).
+    """
+    backend = settings.get('AUDIO_STORAGE_BACKEND') or 'local'
+    if backend == 's3':
+        storage = S3Storage(
+            settings.get('AUDIO_S3_BUCKET'),
+            prefix=settings.get('AUDIO_S3_PREFIX', 'audio') or '',
+            endpoint_url=settings.get('AUDIO_S3_ENDPOINT_URL') or None,
+            region=settings.get('AUDIO_S3_REGION') or None,
+            url_expiry=int(settings.get('AUDIO_URL_EXPIRY', 3600)),
+            public_base_url=settings.get('AUDIO_PUBLIC_BASE_URL') or None,
+            cache_max_age=int(settings.get('AUDIO_CACHE_MAX_AGE', 365 * 24 * 3600)),
+        )
+    elif backend == 'local':
+        storage = LocalStorage(settings.get('AUDIO_STORAGE_PATH') or None)
+    else:
+        raise StorageError(f"Unknown AUDIO_STORAGE_BACKEND: {backend}")
+
+    with _storage_lock:
+        _storage['audio'] = storage
+
+
+def audio_storage():
+    with _storage_lock:
+        if 'audio' in _storage:
+            return _storage['audio']
+    configure_storage(os.environ)
+    return _storage['audio']
+
+
+def copy_between(source, target, key, content_type=None):
+    """
+    Copy one object to another storage unless it's already there.
+
+    Returns:
+        bool: True if it was copied
+    """
+    if target.exists(key):
+        return False
+    target.write(key, source.read(key), content_type=content_type)
+    return True
@@ -0,0 +1,117 @@
+# By Frances Belleza
+# Function: sign-in / sign-up attempt throttling
+#              checked before any password is hashed, so a credential-stuffing
+#              run or a script hammering /login is turned away cheaply (429)
+#              instead of costing a hash per guess
+
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from app import metrics
+
+throttled = metrics.counter(
+    'login_throttled_total', 'Sign-in / sign-up attempts refused before hashing, by scope (ip, account)',
+    labels=('scope',))
+
+
+class AttemptThrottle:
+    """
+    At most `limit` attempts per key in any `window` seconds (sliding window).
+
+    Counts are per process, like the user cache: with several workers a
+    client gets up to `limit` attempts per worker. The least recently seen
+    keys are dropped beyond max_keys, so memory stays bounded under a flood
+    of distinct IPs or emails.
+    """
+
+    def __init__(self, limit, window, max_keys=100_000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._attempts = OrderedDict()  # key -> deque of attempt times (monotonic)
+        self._lock = threading.Lock()
+
+    def retry_after(self, key):
+        """
+        Returns:
+            float: Seconds until `key` may try again, 0 if it may now
+        """
+        if self.limit <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if not attempts:
+                return 0
+            while attempts and attempts[0] <= now - self.window:
+                attempts.popleft()
+            if len(attempts) < self.limit:
+                return 0
+            return attempts[0] + self.window - now
+
+    def record(self, key):
+        if self.limit <= 0:
+            return
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if attempts is None:
+                attempts = self._attempts[key] = deque(maxlen=self.limit)
+                while len(self._attempts) > self.max_keys:
+                    self._attempts.popitem(last=False)
+            else:
+                self._attempts.move_to_end(key)
+            attempts.append(time.monotonic())
+
+    def reset(self, key):
+        with self._lock:
+            self._attempts.pop(key, None)
+
+
+class LoginThrottle:
+    """
+    Per client IP: every attempt that would hash a password (sign-in or
+    sign-up). Per account: failed sign-ins only, cleared on success, so
+    guessing one user's password is slow even from many IPs.
+    """
+
+    def __init__(self):
+        self.by_ip = AttemptThrottle(30, 60)
+        self.by_account = AttemptThrottle(5, 15 * 60)
+
+    def init_app(self, app):
+        self.by_ip = AttemptThrottle(app.config.get('LOGIN_IP_LIMIT', 30), app.config.get('LOGIN_IP_WINDOW', 60))
+        self.by_account = AttemptThrottle(app.config.get('LOGIN_ACCOUNT_LIMIT', 5),
+                                          app.config.get('LOGIN_ACCOUNT_WINDOW', 15 * 60))
+
+    def check(self, ip, account=None):
+        """
+        Args:
+            ip (str): Client address
+            account (str, optional): Email signing in
+
+        Returns:
+            int: Seconds to wait (for Retry-After), 0 if the attempt may go ahead
+        """
+        wait = self.by_ip.retry_after(ip)
+        if wait:
+            throttled.inc(scope='ip')
+            return math.ceil(wait)
+        if account:
+            wait = self.by_account.retry_after(account.lower())
+            if wait:
+                throttled.inc(scope='account')
+                return math.ceil(wait)
+        return 0
+
+    def attempted(self, ip):
+        self.by_ip.record(ip)
+
+    def failed(self, account):
+        self.by_account.record(account.lower())
+
+    def succeeded(self, account):
+        self.by_account.reset(account.lower())
+
+
+login_throttle = LoginThrottle()
@@ -0,0 +1,209 @@
+# By Frances Belleza
+# Function: post-render audio pipeline
+#              transcodes each practice's ElevenLabs MP3 to compact speech
+#              variants (Opus, with AAC for Safari) and records duration,
+#              size and codec on the practice so the player needn't preload
+
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import click
+from flask import current_app
+from app import db
+from app.models import Practice
+from app.audio_store import audio_cli, audio_mimetype, variant_key
+from app.storage import audio_storage, copy_to_file, read_file
+
+logger = logging.getLogger(__name__)
+
+FFMPEG = os.getenv('FFMPEG_PATH') or shutil.which('ffmpeg')
+
+# Compact variants in the order browsers should try them; the original MP3 is the last resort.
+# Mono, low bitrate: it's one calm voice, not music
+VARIANTS = [
+    ('opus', '.opus', ['-c:a', 'libopus', '-b:a', '32k', '-application', 'voip', '-f', 'ogg']),
+    ('aac', '.m4a', ['-c:a', 'aac', '-b:a', '48k', '-movflags', '+faststart', '-f', 'mp4']),
+]
+
+# MPEG audio frame header tables (Layer III only; that's what ElevenLabs returns)
+_BITRATES = {
+    3: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0],  # MPEG-1
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0],  # MPEG-2
+}
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+def mp3_duration(path):
+    """
+    Duration of an MP3 by walking its frame headers (no ffprobe needed).
+
+    Returns:
+        float: Seconds, or None if no MP3 frames were found
+    """
+    data = path.read_bytes()
+    i = 0
+    if data[:3] == b'ID3' and len(data) >= 10:
+        i = 10 + ((data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F))
+
+    seconds = 0.0
+    frames = 0
+    while i + 4 <= len(data):
+        b1, b2 = data[i + 1], data[i + 2]
+        version = (b1 >> 3) & 0x03
+        if data[i] == 0xFF and (b1 & 0xE0) == 0xE0 and version != 1 and (b1 >> 1) & 0x03 == 1:
+            bitrate = _BITRATES[3 if version == 3 else 2][b2 >> 4]
+            rate_index = (b2 >> 2) & 0x03
+            if bitrate and rate_index < 3:
+                sample_rate = _SAMPLE_RATES[version][rate_index]
+                samples = 1152 if version == 3 else 576
+                length = (samples // 8) * bitrate * 1000 // sample_rate + ((b2 >> 1) & 0x01)
+                seconds += samples / sample_rate
+                frames += 1
+                i += length
+                continue
+        i += 1
+    return seconds if frames else None
+
+
+def _transcode(storage, source, workdir, key, extension, args):
+    """
+    Make one variant with ffmpeg and store it next to the original.
+
+    Returns:
+        int: Size of the variant in bytes
+    """
+    target = variant_key(key, extension)
+    size = storage.size(target)
+    if size is not None:
+        return size
+    output = workdir / f"variant{extension}"
+    subprocess.run([FFMPEG, '-nostdin', '-v', 'error', '-y', '-i', str(source), '-vn', '-ac', '1']
+                   + args + [str(output)],
+                   check=True, capture_output=True, timeout=120)
+    storage.write(target, read_file(output), content_type=audio_mimetype(target))
+    return output.stat().st_size
+
+
+def transcode_audio(key):
+    """
+    Make the compact variants of a stored MP3 and measure it.
+
+    Args:
+        key (str): Practice.audio_file
+
+    Returns:
+        dict: audio_duration, audio_size and audio_codec for the practice,
+            or None if the file isn't there
+    """
+    storage = audio_storage()
+    if not storage.exists(key):
+        return None
+
+    # ffmpeg works on local files, so bucket-stored audio is fetched first
+    with tempfile.TemporaryDirectory(prefix='transcode-') as workdir:
+        workdir = Path(workdir)
+        source = workdir / 'source.mp3'
+        copy_to_file(storage, key, source)
+
+        metadata = {
+            'audio_duration': mp3_duration(source),
+            'audio_size': source.stat().st_size,
+            'audio_codec': 'mp3',
+        }
+        if not FFMPEG:
+            return metadata
+
+        try:
+            sizes = [_transcode(storage, source, workdir, key, extension, args)
+                     for _, extension, args in VARIANTS]
+        except (OSError, subprocess.SubprocessError) as e:
+            stderr = getattr(e, 'stderr', b'') or b''
+            logger.error('Transcoding failed: %s', e,
+                         extra={'audio_key': key, 'stderr': stderr.decode(errors='replace')[-200:]})
+            return metadata
+
+    metadata['audio_codec'] = VARIANTS[0][0]
+    metadata['audio_size'] = sizes[0]
+    return metadata
+
+
+def transcode_practice(practice_id):
+    """
+    Transcode a practice's audio and store the metadata on it.
+
+    Returns:
+        bool: True if the practice was updated
+    """
+    practice = db.session.get(Practice, practice_id)
+    if practice is None or not practice.audio_file:
+        return False
+
+    key = practice.audio_file
+    metadata = transcode_audio(key)
+    if metadata is None:
+        return False
+
+    # Only if the audio wasn't replaced meanwhile (e.g. a fallback upgrade)
+    db.session.execute(
+        db.update(Practice)
+        .where(Practice.id == practice_id, Practice.audio_file == key)
+        .values(**metadata)
+    )
+    db.session.commit()
+    return True
+
+
+def init_app(app):
+    """
+    Create the transcode worker pool and the template filter for variant URLs.
+
+    Args:
+        app (Flask): The application being created
+    """
+    app.add_template_filter(variant_key, 'audio_variant')
+    app.extensions['transcode_pool'] = ThreadPoolExecutor(
+        max_workers=app.config.get('AUDIO_TRANSCODE_WORKERS', 2), thread_name_prefix='audio-transcode')
+
+
+def _run(app, practice_id):
+    with app.app_context():
+        try:
+            transcode_practice(practice_id)
+        except Exception:
+            logger.exception('Transcoding practice failed', extra={'practice_id': practice_id})
+            db.session.rollback()
+        finally:
+            db.session.remove()
+
+
+def enqueue_transcode(practice_id):
+    """Transcode a practice's audio on the worker pool once it has been rendered."""
+    app = current_app._get_current_object()
+    app.extensions['transcode_pool'].submit(_run, app, practice_id)
+
+
+@audio_cli.command('transcode')
+@click.option('--all', 'redo', is_flag=True, help='Also practices that already have metadata.')
+@click.option('--limit', type=int, default=None, help='Stop after this many practices.')
+@click.option('--workers', type=int, default=None, help='Parallel ffmpeg processes (default AUDIO_TRANSCODE_WORKERS).')
+def transcode_command(redo, limit, workers):
+    """Backfill Opus/AAC variants and duration for existing practices."""
+    if not FFMPEG:
+        click.echo("ffmpeg not found (set FFMPEG_PATH); only recording MP3 duration and size")
+
+    query = db.session.query(Practice.id).filter(Practice.audio_file.isnot(None))
+    if not redo:
+        query = query.filter(db.or_(Practice.audio_duration.is_(None), Practice.audio_codec == 'mp3'))
+    practice_ids = [practice_id for (practice_id,) in query.order_by(Practice.id).limit(limit)]
+
+    app = current_app._get_current_object()
+    workers = workers or app.config.get('AUDIO_TRANSCODE_WORKERS', 2)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='audio-transcode') as pool:
+        for done, _ in enumerate(pool.map(lambda pid: _run(app, pid), practice_ids), 1):
+            if done % 50 == 0:
+                click.echo(f"{done}/{len(practice_ids)}")
+    click.echo(f"Transcoded {len(practice_ids)} practice(s)")
@@ -0,0 +1,192 @@
+# By Frances Belleza
+# Function: helpers for pipelined practice generation
+#              pull the practice description out of the streaming JSON,
+#              cut it into speakable segments at the pause markers, render the
+#              segments concurrently and stitch them back into one MP3 in order
+
+import json
+import re
+import threading
+
+# Where a segment may end: a pause marker ("...", possibly repeated) or a sentence end
+_BOUNDARY = re.compile(r'(?:\.\.\.|[.!?])["\')]?\s+')
+
+
+class JsonStringExtractor:
+    """
+    Incrementally decode one string field from a JSON document that is still
+    arriving (e.g. "description" from a streamed completion).
+
+    feed() returns the newly decoded text of the field each time, so work can
+    start on the beginning of the field before the model has finished it.
+    """
+
+    def __init__(self, field):
+        self._start = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self.buffer = ''
+        self.pos = None  # index in buffer of the first undecoded character of the value
+        self.done = False
+
+    def _safe_end(self):
+        """Index up to which the value can be decoded without splitting an escape, and whether it ended."""
+        buf = self.buffer
+        i = self.pos
+        while i < len(buf):
+            c = buf[i]
+            if c == '"':
+                return i, True
+            if c == '\\':
+                if i + 1 >= len(buf):
+                    return i, False
+                if buf[i + 1] == 'u':
+                    if i + 6 > len(buf):
+                        return i, False
+                    # A high surrogate needs its low half before it can be decoded
+                    if 0xD800 <= int(buf[i + 2:i + 6], 16) <= 0xDBFF:
+                        if i + 12 > len(buf):
+                            return i, False
+                        i += 12
+                    else:
+                        i += 6
+                else:
+                    i += 2
+            else:
+                i += 1
+        return i, False
+
+    def feed(self, delta):
+        """
+        Args:
+            delta (str): Next piece of the JSON text
+
+        Returns:
+            str: Newly available text of the field ('' if none yet)
+        """
+        self.buffer += delta
+        if self.done:
+            return ''
+        if self.pos is None:
+            match = self._start.search(self.buffer)
+            if not match:
+                return ''
+            self.pos = match.end()
+
+        end, finished = self._safe_end()
+        text = json.loads('"' + self.buffer[self.pos:end] + '"', strict=False)
+        self.pos = end + 1 if finished else end
+        self.done = finished
+        return text
+
+
+class Segmenter:
+    """
+    Cut streaming narration into TTS segments at pause / sentence boundaries.
+
+    The first segment is kept short so audio can start early; later ones are
+    longer so there are fewer TTS calls and fewer joins.
+    """
+
+    def __init__(self, first_min_chars=80, min_chars=300):
+        self.first_min_chars = first_min_chars
+        self.min_chars = min_chars
+        self.buffer = ''
+        self.count = 0
+
+    def feed(self, text):
+        """
+        Returns:
+            list: Segments completed by this text, in order
+        """
+        self.buffer += text
+        segments = []
+        while True:
+            threshold = self.first_min_chars if self.count == 0 else self.min_chars
+            cut = None
+            for match in _BOUNDARY.finditer(self.buffer):
+                if match.end() >= threshold:
+                    cut = match.end()
+                    break
+            if cut is None:
+                return segments
+            segment = self.buffer[:cut].strip()
+            self.buffer = self.buffer[cut:]
+            if segment:
+                segments.append(segment)
+                self.count += 1
+
+    def flush(self):
+        """Returns: list: Whatever is left, as a final segment."""
+        segment = self.buffer.strip()
+        self.buffer = ''
+        if segment:
+            self.count += 1
+            return [segment]
+        return []
+
+
+def strip_id3(data):
+    """Drop a leading ID3v2 tag so MP3 segments can be concatenated into one stream."""
+    if len(data) >= 10 and data[:3] == b'ID3':
+        size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F)
+        return data[10 + size:]
+    return data
+
+
+class SegmentedRender:
+    """
+    Segments rendered concurrently on `executor`, read back in order.
+
+    chunks() can be handed to audio_store.stream_audio() as the render: it
+    yields each segment's audio as soon as that segment (and every one before
+    it) has finished, while later segments are still rendering.
+    """
+
+    def __init__(self, executor, render_segment):
+        self.executor = executor
+        self.render_segment = render_segment  # (text, previous_text) -> bytes
+        self.texts = []
+        self.futures = []
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def add(self, text):
+        with self._cond:
+            previous_text = self.texts[-1] if self.texts else None
+            self.texts.append(text)
+            self.futures.append(self.executor.submit(self.render_segment, text, previous_text))
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def cancel(self):
+        with self._cond:
+            for future in self.futures:
+                future.cancel()
+            self.closed = True
+            self._cond.notify_all()
+
+    def failed(self):
+        """True if a segment that has finished rendering raised."""
+        with self._cond:
+            futures = list(self.futures)
+        return any(future.done() and not future.cancelled() and future.exception() is not None
+                   for future in futures)
+
+    def text(self):
+        return ' '.join(self.texts)
+
+    def chunks(self):
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self.futures) and not self.closed:
+                    self._cond.wait()
+                if index >= len(self.futures):
+                    return
+                future = self.futures[index]
+            data = future.result()
+            yield data if index == 0 else strip_id3(data)
+            index += 1
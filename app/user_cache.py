@@ -0,0 +1,103 @@
+# By Frances Belleza
+# Function: per-process cache of the logged-in user
+#              so load_user() doesn't query the user table on every request
+
+import threading
+import time
+from collections import OrderedDict
+from flask_login import UserMixin
+from sqlalchemy import event
+from app import db
+from app.models import User
+
+
+class CachedUser(UserMixin):
+    """
+    Read-only snapshot of the User fields requests and templates need.
+
+    current_user is only used for its id and username, so a plain object is
+    enough and can be shared safely between requests and threads.
+    """
+
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+        self.created_at = user.created_at
+
+    def __repr__(self):
+        return f'<CachedUser {self.id} {self.username}>'
+
+
+class UserCache:
+    """
+    LRU of CachedUser snapshots with a TTL.
+
+    Entries are dropped as soon as the User row is updated or deleted in this
+    process; other processes see the change once the TTL runs out.
+    """
+
+    def __init__(self, max_users=1024, ttl=60):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # user_id -> (expires_at, CachedUser)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_users = app.config.get('USER_CACHE_SIZE', self.max_users)
+        self.ttl = app.config.get('USER_CACHE_TTL', self.ttl)
+
+    def get(self, user_id):
+        """
+        Args:
+            user_id (int): ID from the session cookie
+
+        Returns:
+            CachedUser: Snapshot of the user, or None if the user doesn't exist
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+
+        snapshot = CachedUser(user)
+        if self.ttl > 0:
+            with self._lock:
+                self._entries[user_id] = (time.monotonic() + self.ttl, snapshot)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_users:
+                    self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'users': len(self._entries)}
+
+
+user_cache = UserCache()
+
+
+# Password or profile changes (and deletes) drop the cached snapshot
+def _invalidate_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+
+
+event.listen(User, 'after_update', _invalidate_user)
+event.listen(User, 'after_delete', _invalidate_user)
@@ -0,0 +1,225 @@
+# By Frances Belleza
+# Function: local stand-ins for the OpenAI chat-completions and ElevenLabs
+#              text-to-speech APIs, with configurable latency and error rates,
+#              so the app can be load-tested without calling the real services
+#
+# Usage:
+#   python benchmarks/fake_providers.py --port 8900 --llm-latency 1.5 --tts-latency 0.4 --error-rate 0.02
+#
+#   then start the app against it:
+#   OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8900/v1 \
+#   ELEVENLABS_API_KEY=fake ELEVENLABS_BASE_URL=http://127.0.0.1:8900 \
+#   gunicorn -w 4 run:app
+
+import argparse
+import itertools
+import json
+import random
+import re
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PRACTICE_TYPES = ['breathing', 'meditation', 'movement', 'grounding']
+WORDS = ['gently', 'notice', 'breath', 'shoulders', 'soften', 'present', 'settle', 'warmth',
+         'ground', 'release', 'stillness', 'awareness', 'exhale', 'inhale', 'calm', 'feet']
+
+_counter = itertools.count(1)
+
+
+def _sleep(mean, jitter):
+    """Sleep for `mean` seconds give or take `jitter` (uniform), never negative."""
+    time.sleep(max(mean + random.uniform(-jitter, jitter), 0))
+
+
+def fake_practice(description_words):
+    """A practice in the shape the app's prompt asks for; every call is unique so caches miss."""
+    n = next(_counter)
+    # Phrases separated by pause markers, like the real prompt asks for
+    words = [random.choice(WORDS) for _ in range(description_words)]
+    description = ' '.join(word + random.choice(['', '', '', '', '...', '... ... ...'])
+                           for word in words)
+    return {
+        'practice': {
+            'title': f'Load Test Practice {n}',
+            'description': f'{description.capitalize()}... ({n})',
+            'type': random.choice(PRACTICE_TYPES),
+        },
+        'journal_prompt': f'What did you notice during practice {n}?',
+    }
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    settings = None  # argparse.Namespace, set in main()
+
+    def log_message(self, format, *args):
+        if self.settings.verbose:
+            super().log_message(format, *args)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _maybe_fail(self):
+        if random.random() < self.settings.error_rate:
+            self._send_json(503, {'error': {'message': 'fake upstream error', 'type': 'server_error'}})
+            return True
+        return False
+
+    def do_POST(self):
+        request_body = self._read_body()
+        path = self.path.split('?', 1)[0]
+
+        if path.endswith('/chat/completions'):
+            self._chat_completion(request_body)
+        elif re.match(r'^/v1/text-to-speech/[^/]+(/stream)?$', path):
+            self._text_to_speech(request_body)
+        else:
+            self._send_json(404, {'error': {'message': f'unknown path {path}'}})
+
+    def _chat_completion(self, request_body):
+        s = self.settings
+        _sleep(s.llm_latency, s.llm_jitter)
+        if self._maybe_fail():
+            return
+
+        try:
+            request_json = json.loads(request_body or b'{}')
+        except ValueError:
+            request_json = {}
+        model = request_json.get('model', 'gpt-4o-mini')
+        # Rough token count (~4 characters per token) so prompt size shows up in the metrics
+        prompt_chars = sum(len(m.get('content') or '') for m in request_json.get('messages', []))
+        prompt_tokens = max(prompt_chars // 4, 1)
+
+        content = json.dumps(fake_practice(s.description_words))
+        completion_tokens = max(len(content) // 4, 1)
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                 'total_tokens': prompt_tokens + completion_tokens,
+                 'prompt_tokens_details': {'cached_tokens': 0}}
+        if request_json.get('stream'):
+            self._stream_chat_completion(model, content, usage)
+            return
+
+        time.sleep(completion_tokens / s.tokens_per_second)  # same generation speed as streaming
+        self._send_json(200, {
+            'id': f'chatcmpl-fake-{next(_counter)}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': usage,
+        })
+
+    def _stream_chat_completion(self, model, content, usage):
+        """Server-sent events like the real API: --llm-latency is time to first token,
+        then the text trickles out at --tokens-per-second."""
+        s = self.settings
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        base = {'id': f'chatcmpl-fake-{next(_counter)}', 'object': 'chat.completion.chunk',
+                'created': int(time.time()), 'model': model}
+
+        def send(event):
+            data = f'data: {json.dumps(event)}\n\n'.encode()
+            self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+            self.wfile.flush()
+
+        piece = 4 * s.tokens_per_event  # ~4 characters per token
+        for i in range(0, len(content), piece):
+            send(dict(base, choices=[{'index': 0, 'delta': {'content': content[i:i + piece]}, 'finish_reason': None}]))
+            time.sleep(s.tokens_per_event / s.tokens_per_second)
+        send(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))
+        send(dict(base, choices=[], usage=usage))
+        data = b'data: [DONE]\n\n'
+        self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n0\r\n\r\n')
+
+    def _text_to_speech(self, request_body):
+        s = self.settings
+        try:
+            text = json.loads(request_body or b'{}').get('text') or ''
+        except ValueError:
+            text = ''
+        _sleep(s.tts_latency, s.tts_jitter)  # time to first byte
+        if self._maybe_fail():
+            return
+
+        # Chunked like the real API: first bytes quickly, the rest as it "renders"
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        chunk = b'\xff\xfb\x90\x00' + bytes(s.chunk_bytes - 4)  # MPEG frame header + silence
+        # Longer text, longer audio, longer render
+        chunks = max(len(text) * s.audio_bytes_per_char // s.chunk_bytes, 1)
+        for _ in range(chunks):
+            self.wfile.write(f'{len(chunk):x}\r\n'.encode() + chunk + b'\r\n')
+            self.wfile.flush()
+            if s.chunk_interval:
+                time.sleep(s.chunk_interval)
+        self.wfile.write(b'0\r\n\r\n')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Fake OpenAI + ElevenLabs servers for load tests.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--llm-latency', type=float, default=1.5,
+                        help='Seconds per chat completion (to the first token when streaming)')
+    parser.add_argument('--tokens-per-second', type=float, default=80, help='Streaming output speed')
+    parser.add_argument('--tokens-per-event', type=int, default=3)
+    parser.add_argument('--llm-jitter', type=float, default=0.5)
+    parser.add_argument('--tts-latency', type=float, default=0.4, help='Seconds to the first audio byte')
+    parser.add_argument('--tts-jitter', type=float, default=0.1)
+    parser.add_argument('--audio-bytes-per-char', type=int, default=1000,
+                        help='Narration size per character of text (~15 characters a second at 128 kbps)')
+    parser.add_argument('--chunk-bytes', type=int, default=16_384)
+    parser.add_argument('--chunk-interval', type=float, default=0.02, help='Seconds between audio chunks')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of calls answered with 503')
+    parser.add_argument('--description-words', type=int, default=180)
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    return parser.parse_args(argv)
+
+
+def make_server(settings):
+    """Build (but don't start) the server; used by load_test.py --start-fakes."""
+    handler = type('ConfiguredHandler', (FakeProviderHandler,), {'settings': settings})
+    server = ThreadingHTTPServer((settings.host, settings.port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    settings = parse_args(argv)
+    server = make_server(settings)
+    base = f'http://{settings.host}:{server.server_address[1]}'
+    print(f'Fake providers listening on {base}')
+    print(f'  OPENAI_BASE_URL={base}/v1')
+    print(f'  ELEVENLABS_BASE_URL={base}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+# By Frances Belleza
+# Function: end-to-end load test
+#              virtual users run the whole signup -> check-in -> practice ->
+#              reflect -> feedback -> thank flow against a running app and we
+#              report p50/p95/p99 per route and completed sessions per second
+#
+# Usage (three terminals, or background the first two):
+#   python benchmarks/fake_providers.py --llm-latency 1.5 --tts-latency 0.4
+#   OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8900/v1 \
+#     ELEVENLABS_API_KEY=fake ELEVENLABS_BASE_URL=http://127.0.0.1:8900 \
+#     DATABASE_URL=postgresql://.../scratch gunicorn -w 4 --threads 8 -b 127.0.0.1:8000 run:app
+#   python benchmarks/load_test.py --base-url http://127.0.0.1:8000 --users 50 --duration 120
+#
+#   --start-fakes runs the fake providers inside this process instead of the first step.
+#   Every session signs up a new user: point the app at a scratch database.
+
+import argparse
+import html
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urljoin
+
+import requests
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+MOODS = ['Happy', 'Calm', 'Anxious', 'Sad']
+BODY_FEELINGS = ['Tight shoulders', 'Heavy eyes', 'Restless legs', 'Relaxed', 'Headache', 'Butterflies', '']
+
+
+class SessionFailed(Exception):
+    pass
+
+
+class Recorder:
+    """Latency samples per route plus session / error counts, shared by all virtual users."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.sessions = 0
+        self.failed_sessions = 0
+        self._lock = threading.Lock()
+
+    def record(self, route, seconds, ok=True):
+        with self._lock:
+            self.samples[route].append(seconds)
+            if not ok:
+                self.errors[route] += 1
+
+    def session_done(self, ok):
+        with self._lock:
+            if ok:
+                self.sessions += 1
+            else:
+                self.failed_sessions += 1
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class VirtualUser:
+    def __init__(self, base_url, recorder, think_time, poll_interval, practice_timeout, fetch_audio):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.think_time = think_time
+        self.poll_interval = poll_interval
+        self.practice_timeout = practice_timeout
+        self.fetch_audio = fetch_audio
+        self.http = requests.Session()
+
+    def _call(self, route, method, path, expect=(200, 302), **kwargs):
+        kwargs.setdefault('allow_redirects', False)
+        kwargs.setdefault('timeout', 60)
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, urljoin(self.base_url + '/', path), **kwargs)
+            if kwargs.get('stream'):
+                for _ in response.iter_content(64 * 1024):
+                    pass
+        except requests.RequestException as e:
+            self.recorder.record(route, time.perf_counter() - start, ok=False)
+            raise SessionFailed(f'{route}: {e}')
+        elapsed = time.perf_counter() - start
+        ok = response.status_code in expect
+        self.recorder.record(route, elapsed, ok=ok)
+        if not ok:
+            raise SessionFailed(f'{route}: HTTP {response.status_code}')
+        return response
+
+    def _think(self):
+        if self.think_time:
+            time.sleep(random.uniform(0, 2 * self.think_time))
+
+    def run_session(self):
+        self.http.cookies.clear()
+        name = 'lt' + uuid.uuid4().hex[:16]
+        password = 'load-test-password'
+
+        self._call('GET /signup', 'GET', '/signup')
+        self._call('POST /signup', 'POST', '/signup',
+                   data={'username': name, 'email': f'{name}@loadtest.invalid', 'password': password})
+        self._call('POST /login', 'POST', '/login', data={'email': f'{name}@loadtest.invalid', 'password': password})
+        self._think()
+
+        self._call('GET /check-in', 'GET', '/check-in')
+        self._call('POST /check-in', 'POST', '/check-in',
+                   data={'time_of_day': random.choice(['Morning', 'Night']),
+                         'mood': random.choice(MOODS),
+                         'body_feeling': random.choice(BODY_FEELINGS)})
+
+        # The practice is generated in the background; poll like the page does
+        start = time.perf_counter()
+        self._call('GET /practice', 'GET', '/practice')
+        while True:
+            status = self._call('GET /practice/status', 'GET', '/practice/status').json()
+            if status.get('status') == 'done':
+                break
+            if status.get('status') == 'failed':
+                self.recorder.record('practice ready', time.perf_counter() - start, ok=False)
+                raise SessionFailed('practice generation failed')
+            if time.perf_counter() - start > self.practice_timeout:
+                self.recorder.record('practice ready', time.perf_counter() - start, ok=False)
+                raise SessionFailed('practice not ready in time')
+            time.sleep(self.poll_interval)
+        self.recorder.record('practice ready', time.perf_counter() - start)
+
+        page = self._call('GET /practice', 'GET', '/practice')
+        if self.fetch_audio:
+            match = re.search(r'<source src="([^"]+)"', page.text)
+            if match:
+                # Relative for local storage, a pre-signed bucket / CDN URL otherwise
+                src = urljoin(self.base_url + '/', html.unescape(match.group(1)))
+                self._call('GET audio', 'GET', src, expect=(200, 206), stream=True)
+        self._think()
+
+        self._call('GET /reflect', 'GET', '/reflect')
+        self._call('POST /reflect', 'POST', '/reflect',
+                   data={'entry_text': 'I noticed my breath slowing down and my shoulders dropping.',
+                         'intention_for_day': 'Stay present', 'self_care_today': 'A walk',
+                         'goal_for_tomorrow': 'Sleep earlier'})
+        self._think()
+
+        self._call('GET /feedback', 'GET', '/feedback')
+        self._call('POST /feedback', 'POST', '/feedback',
+                   data={'rating': str(random.randint(1, 5)), 'helped': random.choice(['yes', 'no']),
+                         'pacing': random.choice(['Too fast', 'Just right', 'Too slow'])})
+        self._call('GET /thank', 'GET', '/thank')
+        self._call('GET /logout', 'GET', '/logout')
+
+
+def worker(user, deadline, max_sessions, counter, counter_lock, recorder, verbose):
+    while time.monotonic() < deadline:
+        with counter_lock:
+            if max_sessions and counter[0] >= max_sessions:
+                return
+            counter[0] += 1
+        try:
+            user.run_session()
+            recorder.session_done(True)
+        except SessionFailed as e:
+            recorder.session_done(False)
+            if verbose:
+                print(f'session failed: {e}')
+
+
+def report(recorder, elapsed):
+    print()
+    print(f"{'route':<22}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    all_samples = []
+    for route in sorted(recorder.samples):
+        values = sorted(recorder.samples[route])
+        if route != 'practice ready':
+            all_samples.extend(values)
+        print(f'{route:<22}{len(values):>8}{recorder.errors[route]:>8}'
+              f'{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}'
+              f'{percentile(values, 99) * 1000:>10.1f}{values[-1] * 1000:>10.1f}')
+    all_samples.sort()
+    print(f"{'all requests':<22}{len(all_samples):>8}{sum(recorder.errors.values()):>8}"
+          f'{percentile(all_samples, 50) * 1000:>10.1f}{percentile(all_samples, 95) * 1000:>10.1f}'
+          f'{percentile(all_samples, 99) * 1000:>10.1f}')
+    print()
+    print(f'sessions completed: {recorder.sessions}  failed: {recorder.failed_sessions}  '
+          f'in {elapsed:.1f}s  ->  {recorder.sessions / elapsed:.2f} sessions/s')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Virtual-user load test for the full check-in flow.')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--users', type=int, default=10, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds to run')
+    parser.add_argument('--sessions', type=int, default=0, help='Stop after this many sessions (0 = no limit)')
+    parser.add_argument('--ramp-up', type=float, default=5, help='Seconds over which users start')
+    parser.add_argument('--think-time', type=float, default=0.0, help='Mean pause between steps (seconds)')
+    parser.add_argument('--poll-interval', type=float, default=0.5)
+    parser.add_argument('--practice-timeout', type=float, default=60)
+    parser.add_argument('--no-audio', action='store_true', help="Don't download the practice audio")
+    parser.add_argument('--start-fakes', action='store_true',
+                        help='Also run benchmarks/fake_providers.py (default settings) in this process')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.start_fakes:
+        import fake_providers
+        server = fake_providers.make_server(fake_providers.parse_args([]))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f'Fake providers on http://127.0.0.1:{server.server_address[1]}')
+
+    recorder = Recorder()
+    counter, counter_lock = [0], threading.Lock()
+    start = time.monotonic()
+    deadline = start + args.duration
+    threads = []
+    for i in range(args.users):
+        user = VirtualUser(args.base_url, recorder, args.think_time, args.poll_interval,
+                           args.practice_timeout, not args.no_audio)
+        thread = threading.Thread(target=worker, daemon=True,
+                                  args=(user, deadline, args.sessions, counter, counter_lock, recorder, args.verbose))
+        thread.start()
+        threads.append(thread)
+        if args.ramp_up and i < args.users - 1:
+            time.sleep(args.ramp_up / args.users)
+
+    for thread in threads:
+        thread.join()
+    report(recorder, time.monotonic() - start)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+# By Frances Belleza
+# Function: benchmark for sign-in throughput under a login burst
+#              concurrent clients sign in as seeded users while a bystander
+#              keeps loading a cheap page; compares hashing inline on the
+#              request threads (the old behaviour, no limit) with the bounded
+#              process pool, reporting sign-ins/s, latency, fast 503s and how
+#              slow the bystander's page got
+#
+# Usage:
+#   python benchmarks/login_throughput.py                          # 64 clients, 10 s per mode
+#   python benchmarks/login_throughput.py --clients 128 --workers 4 --queue 32
+#   python benchmarks/login_throughput.py --method pbkdf2:sha256:600000
+#
+# Runs the app in-process (threaded, like gunicorn --threads) against a temp
+# SQLite database. Throttling is off: every client would share one account limit.
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+os.environ['LOGIN_IP_LIMIT'] = '0'
+os.environ['LOGIN_ACCOUNT_LIMIT'] = '0'
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import User  # noqa: E402
+from app.passwords import PasswordHasher  # noqa: E402
+
+PASSWORD = 'correct horse battery staple'
+
+
+def seed(app, users, method):
+    """Create `users` accounts sharing one password (hashed once, so seeding is quick)."""
+    with app.app_context():
+        db.create_all()
+        db.session.query(User).delete()
+        pwhash = generate_password_hash(PASSWORD, method)
+        db.session.execute(User.__table__.insert(), [
+            {'username': f'bench{i}', 'email': f'bench{i}@example.test', 'password_hash': pwhash}
+            for i in range(users)])
+        db.session.commit()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run(app, hasher, clients, duration, users):
+    """
+    Returns:
+        dict: statuses (Counter), login latencies and bystander latencies (seconds), elapsed
+    """
+    app.extensions['password_hasher'] = hasher
+    # Start the pool's processes before the clock does
+    with ThreadPoolExecutor(max(hasher.workers, 1)) as warmup:
+        list(warmup.map(hasher.hash, ['warmup'] * max(hasher.workers, 1)))
+
+    statuses = Counter()
+    login_seconds = []
+    bystander_seconds = []
+    lock = threading.Lock()
+    start = time.monotonic()
+    deadline = start + duration
+
+    def sign_in_loop():
+        client = app.test_client()
+        while time.monotonic() < deadline:
+            email = f'bench{random.randrange(users)}@example.test'
+            began = time.perf_counter()
+            response = client.post('/login', data={'email': email, 'password': PASSWORD})
+            elapsed = time.perf_counter() - began
+            with lock:
+                statuses[response.status_code] += 1
+                if response.status_code == 302:
+                    login_seconds.append(elapsed)
+            if response.status_code == 302:
+                client.get('/logout')
+            elif response.status_code == 503:
+                # Someone trying again once told to
+                time.sleep(float(response.headers.get('Retry-After', 1)))
+
+    def bystander_loop():
+        client = app.test_client()
+        while time.monotonic() < deadline:
+            began = time.perf_counter()
+            client.get('/login')
+            bystander_seconds.append(time.perf_counter() - began)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=sign_in_loop) for _ in range(clients)]
+    threads.append(threading.Thread(target=bystander_loop))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {'statuses': statuses, 'logins': login_seconds, 'bystander': bystander_seconds,
+            'elapsed': time.monotonic() - start}
+
+
+def report(name, result):
+    statuses = result['statuses']
+    logins = result['logins']
+    bystander = result['bystander']
+    print(f"{name:<28}{statuses[302] / result['elapsed']:8.1f} sign-ins/s   "
+          f"p50 {percentile(logins, 0.5) * 1000:7.0f} ms   p95 {percentile(logins, 0.95) * 1000:7.0f} ms   "
+          f"503s {statuses[503]:5d}")
+    print(f"{'':<28}bystander GET /login   p50 {percentile(bystander, 0.5) * 1000:7.1f} ms   "
+          f"p95 {percentile(bystander, 0.95) * 1000:7.1f} ms   max {max(bystander, default=0) * 1000:7.1f} ms"
+          f"   (mean {statistics.fmean(bystander) * 1000 if bystander else 0:.1f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sign-in throughput, inline vs pooled hashing')
+    parser.add_argument('--clients', type=int, default=64, help='Concurrent signing-in clients')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per mode')
+    parser.add_argument('--users', type=int, default=1000, help='Seeded accounts')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Hashing processes')
+    parser.add_argument('--queue', type=int, default=16, help='Hashes allowed to wait for a process')
+    parser.add_argument('--method', default='scrypt', help='werkzeug hash method, e.g. pbkdf2:sha256:600000')
+    args = parser.parse_args()
+
+    app = create_app()
+    print(f"Seeding {args.users:,} users ({args.method})...")
+    seed(app, args.users, args.method)
+    print(f"{args.clients} clients, {args.duration:.0f} s per mode, {os.cpu_count()} CPU(s)\n")
+
+    modes = [
+        ('inline, unbounded', PasswordHasher(args.method, workers=0, queue_size=args.clients * 2)),
+        (f'pool {args.workers} + queue {args.queue}', PasswordHasher(args.method, workers=args.workers,
+                                                                    queue_size=args.queue)),
+    ]
+    for name, hasher in modes:
+        report(name, run(app, hasher, args.clients, args.duration, args.users))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+# By Frances Belleza
+# Function: benchmark for the "today's check-ins" lookup every page runs
+#              compares date(created_at) == today against the half-open
+#              range on a seeded user_checkins table, with and without indexes
+#
+# Usage:
+#   python benchmarks/today_checkin_query.py                       # 1,000,000 rows in a temp SQLite file
+#   python benchmarks/today_checkin_query.py --rows 200000
+#   python benchmarks/today_checkin_query.py --database-url postgresql://...   (uses a scratch DB!)
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from app import db  # noqa: E402
+from app.models import CheckIn  # noqa: E402
+
+INDEX_NAMES = ['ix_user_checkins_user_id_created_at', 'ix_user_checkins_user_id_time_of_day_created_at']
+
+
+def seed(engine, rows, users):
+    """Insert `rows` check-ins spread over `users` users, oldest first like production."""
+    db.metadata.drop_all(engine, tables=[CheckIn.__table__])
+    db.metadata.create_all(engine, tables=[CheckIn.__table__])
+
+    days = max(rows // users // 2, 1)  # two check-ins (morning + night) per user per day
+    now = datetime.now()
+    batch = []
+    with engine.begin() as conn:
+        for i in range(rows):
+            user_id = i % users + 1
+            day = (i // users) // 2
+            time_of_day = 'Morning' if (i // users) % 2 == 0 else 'Night'
+            hour = random.randint(6, 11) if time_of_day == 'Morning' else random.randint(19, 23)
+            created_at = (now - timedelta(days=days - 1 - day % days)).replace(hour=hour, minute=random.randint(0, 59))
+            batch.append({'user_id': user_id, 'mood': 'Calm', 'time_of_day': time_of_day,
+                          'created_at': created_at})
+            if len(batch) == 10000:
+                conn.execute(CheckIn.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(CheckIn.__table__.insert(), batch)
+        if engine.dialect.name == 'postgresql':
+            conn.execute(text('ANALYZE user_checkins'))
+        else:
+            conn.execute(text('ANALYZE'))
+
+
+def date_function_query(user_id, today, today_start, today_end):
+    return (db.select(CheckIn.id)
+            .where(CheckIn.user_id == user_id, db.func.date(CheckIn.created_at) == today)
+            .order_by(CheckIn.created_at.desc()).limit(1))
+
+
+def range_query(user_id, today, today_start, today_end):
+    return (db.select(CheckIn.id)
+            .where(CheckIn.user_id == user_id,
+                   CheckIn.created_at >= today_start,
+                   CheckIn.created_at < today_end)
+            .order_by(CheckIn.created_at.desc()).limit(1))
+
+
+def morning_date_function_query(user_id, today, today_start, today_end):
+    return (db.select(CheckIn.id)
+            .where(CheckIn.user_id == user_id,
+                   db.func.date(CheckIn.created_at) == today,
+                   CheckIn.time_of_day == 'Morning')
+            .limit(1))
+
+
+def morning_range_query(user_id, today, today_start, today_end):
+    return (db.select(CheckIn.id)
+            .where(CheckIn.user_id == user_id,
+                   CheckIn.created_at >= today_start,
+                   CheckIn.created_at < today_end,
+                   CheckIn.time_of_day == 'Morning')
+            .limit(1))
+
+
+QUERIES = [
+    # /practice, /reflect, /feedback, /thank: latest check-in today
+    ('latest today, date(created_at) = today', date_function_query),
+    ('latest today, created_at in [today, tomorrow)', range_query),
+    # /check-in: is there a morning check-in today?
+    ('morning today, date(created_at) = today', morning_date_function_query),
+    ('morning today, created_at in [today, tomorrow)', morning_range_query),
+]
+
+
+def run(engine, build_query, users, iterations):
+    today = datetime.now().date()
+    today_start = datetime.combine(today, datetime.min.time())
+    today_end = today_start + timedelta(days=1)
+    if engine.dialect.name == 'sqlite':
+        today = today.isoformat()  # date() returns text in SQLite
+
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(iterations):
+            query = build_query(random.randint(1, users), today, today_start, today_end)
+            start = time.perf_counter()
+            conn.execute(query).all()
+            timings.append(time.perf_counter() - start)
+
+        plan_prefix = 'EXPLAIN QUERY PLAN ' if engine.dialect.name == 'sqlite' else 'EXPLAIN '
+        compiled = build_query(1, today, today_start, today_end).compile(
+            engine, compile_kwargs={'literal_binds': True})
+        plan = [' '.join(str(col) for col in row) for row in conn.execute(text(plan_prefix + str(compiled)))]
+
+    timings.sort()
+    return {
+        'p50_ms': timings[len(timings) // 2] * 1000,
+        'p95_ms': timings[int(len(timings) * 0.95)] * 1000,
+        'plan': plan,
+    }
+
+
+def set_indexes(engine, enabled):
+    table = CheckIn.__table__
+    with engine.begin() as conn:
+        for index in table.indexes:
+            if index.name in INDEX_NAMES:
+                if enabled:
+                    index.create(conn, checkfirst=True)
+                else:
+                    index.drop(conn, checkfirst=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark today's check-in lookups")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--database-url', default=None,
+                        help='Scratch database to use (its user_checkins table is dropped!)')
+    args = parser.parse_args()
+
+    url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    engine = create_engine(url)
+
+    print(f"Seeding {args.rows:,} check-ins for {args.users:,} users...")
+    start = time.perf_counter()
+    seed(engine, args.rows, args.users)
+    print(f"  done in {time.perf_counter() - start:.1f}s\n")
+
+    for indexed in (False, True):
+        set_indexes(engine, indexed)
+        # full scans are slow, a few samples are enough to see it
+        iterations = args.iterations if indexed else min(args.iterations, 20)
+        for name, build_query in QUERIES:
+            result = run(engine, build_query, args.users, iterations)
+            label = f"{name:<50}{'indexed' if indexed else 'no index':<10}"
+            print(f"{label} p50 {result['p50_ms']:8.3f} ms   p95 {result['p95_ms']:8.3f} ms")
+            for line in result['plan']:
+                print(f"    {line}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# By Frances Belleza
+# Function: tests for generating a practice while its narration renders
+
+import json
+from concurrent.futures import Future
+import pytest
+from app import ai_service
+
+DESCRIPTION = ' '.join(
+    f"Step {i}: breathe in slowly through your nose and let your shoulders soften as you exhale... "
+    "Notice the air moving, the weight of your body, and the quiet around you." for i in range(8))
+
+
+class InlineExecutor:
+    """Runs submitted work at once, so segment results are known before registration."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Pipeline enabled with fake text/speech backends; returns what was registered."""
+    registered = []
+    result = {'practice': {'title': 'Soften', 'description': DESCRIPTION, 'type': 'breathing'},
+              'journal_prompt': 'What softened today?'}
+
+    def fake_generate(mood, body_feeling=None, time_of_day=None, practice_type=None, on_delta=None):
+        text = json.dumps(result)
+        for start in range(0, len(text), 40):
+            on_delta(text[start:start + 40])
+        return result
+
+    monkeypatch.setattr(ai_service, 'speech_provider', lambda: object())
+    monkeypatch.setitem(ai_service._providers, 'pipeline', True)
+    monkeypatch.setattr(ai_service, '_segment_executor', InlineExecutor())
+    monkeypatch.setattr(ai_service, 'generate_practice_and_prompt', fake_generate)
+    monkeypatch.setattr(ai_service, 'audio_exists', lambda key: False)
+    monkeypatch.setattr(ai_service, 'stream_audio', lambda key, render: registered.append(key))
+    return registered
+
+
+def test_segments_are_registered_when_all_render(pipeline, monkeypatch):
+    monkeypatch.setattr(ai_service, '_render_segment', lambda provider, text, previous: b'audio')
+
+    result = ai_service.generate_practice_with_audio('Anxious')
+
+    assert result['practice']['description'] == DESCRIPTION
+    assert len(pipeline) == 1
+
+
+def test_failed_segment_leaves_audio_to_single_render(pipeline, monkeypatch):
+    rendered = []
+
+    def render_segment(provider, text, previous):
+        rendered.append(text)
+        if len(rendered) == 2:
+            raise ai_service.ProviderError('TTS segment failed')
+        return b'audio'
+    monkeypatch.setattr(ai_service, '_render_segment', render_segment)
+
+    result = ai_service.generate_practice_with_audio('Anxious')
+
+    assert len(rendered) > 2
+    assert result['practice']['description'] == DESCRIPTION
+    # Nothing stitched was registered, so generate_audio() renders it in one piece
+    assert pipeline == []
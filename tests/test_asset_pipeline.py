@@ -0,0 +1,38 @@
+# By Frances Belleza
+# Function: tests for the CSS/JS minifiers of the asset pipeline
+
+from app.asset_pipeline import minify_css, minify_js
+
+
+def test_css_declarations_are_tightened():
+    assert minify_css('a {\n  color: red;\n  margin: 0 auto;\n}\n') == 'a{color:red;margin:0 auto}'
+
+
+def test_css_media_features_are_tightened():
+    assert minify_css('@media (max-width: 576px) {\n  a { color: red; }\n}') == \
+        '@media (max-width:576px){a{color:red}}'
+
+
+def test_css_descendant_pseudo_class_keeps_its_space():
+    assert minify_css('div :first-child { margin: 0; }') == 'div :first-child{margin:0}'
+    assert minify_css('a:hover  b { color: red; }') == 'a:hover b{color:red}'
+
+
+def test_css_quoted_strings_are_kept_verbatim():
+    css = '.note::before { content: "a ;  b: {c} > d, e"; }\n[title=\'x:  y\'] { color: red; }'
+    assert minify_css(css) == '.note::before{content:"a ;  b: {c} > d, e"}[title=\'x:  y\']{color:red}'
+
+
+def test_css_comments_dropped_but_not_inside_strings():
+    css = '/* drop */ a { content: "/* keep */"; color: red; } /*! license */'
+    assert minify_css(css) == 'a{content:"/* keep */";color:red}/*! license */'
+
+
+def test_js_keeps_code_after_a_block_comment():
+    js = 'var a = 1;\n  /* x */ foo();\n/* spans\n   lines */ bar();\n// gone\nbaz();\n'
+    assert minify_js(js) == 'var a = 1;\nfoo();\nbar();\nbaz();'
+
+
+def test_js_keeps_license_comments_and_line_breaks():
+    js = '/*! keep */\nlet x = 1\n\n  let y = 2\n'
+    assert minify_js(js) == '/*! keep */\nlet x = 1\nlet y = 2'
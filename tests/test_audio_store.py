@@ -0,0 +1,89 @@
+# By Frances Belleza
+# Function: tests for audio_blobs reference counting and garbage collection
+
+from datetime import datetime, timedelta
+import pytest
+from flask import Flask
+from app import audio_store, db
+from app.models import AudioBlob
+
+KEY = 'ab/cd/' + 'abcd' * 16 + '.mp3'
+
+
+class FakeStorage:
+    """Records writes and deletes; fails on size() so flushes can't make storage calls."""
+
+    def __init__(self):
+        self.objects = {}
+        self.deleted = []
+
+    def write(self, key, chunks, content_type=None):
+        self.objects[key] = b''.join(chunks)
+
+    def delete(self, key):
+        self.deleted.append(key)
+
+    def size(self, key):
+        raise AssertionError('storage size() called')
+
+
+@pytest.fixture
+def app(monkeypatch):
+    storage = FakeStorage()
+    monkeypatch.setattr(audio_store, 'audio_storage', lambda: storage)
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    db.init_app(app)
+    app.cli.add_command(audio_store.audio_cli)
+    app.storage = storage
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def adjust(key, delta):
+    with db.engine.begin() as connection:
+        audio_store._adjust_refs(connection, key, delta)
+    return db.session.get(AudioBlob, key)
+
+
+def test_first_reference_uses_size_from_write(app):
+    audio_store.write_audio(KEY, [b'abc', b'', b'defg'])
+
+    blob = adjust(KEY, 1)
+
+    assert app.storage.objects[KEY] == b'abcdefg'
+    assert blob.size_bytes == 7
+    assert blob.released_at is None
+
+
+def test_released_at_tracks_the_drop_to_zero(app):
+    adjust(KEY, 1)
+    blob = adjust(KEY, -1)
+    released = blob.released_at
+    assert released is not None
+
+    # A bulk release past 0 keeps the first stamp
+    db.session.expire_all()
+    assert adjust(KEY, -1).released_at == released
+
+    db.session.expire_all()
+    assert adjust(KEY, 2).released_at is None
+
+
+def test_gc_grace_runs_from_release_not_creation(app):
+    long_ago = datetime.now() - timedelta(days=30)
+    db.session.add_all([
+        AudioBlob(key=KEY, ref_count=0, created_at=long_ago, released_at=datetime.now()),
+        AudioBlob(key=KEY.replace('abcd', 'ef01'), ref_count=0, created_at=long_ago,
+                  released_at=long_ago),
+    ])
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(audio_store.audio_cli, ['gc', '--grace', '24'])
+
+    assert result.exit_code == 0, result.output
+    assert KEY not in app.storage.deleted
+    assert KEY.replace('abcd', 'ef01') in app.storage.deleted
+    assert db.session.get(AudioBlob, KEY) is not None
@@ -0,0 +1,70 @@
+# By Frances Belleza
+# Function: tests for the per-user daily rollup
+
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from flask import Flask
+from app import daily_stats, db
+from app.models import UserDailyStats
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    # A file, so a second connection can play the other request
+    app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'stats.db'}",
+                      SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def checkin(time_of_day='Morning', mood='Calm', created_at=None):
+    return SimpleNamespace(user_id=1, time_of_day=time_of_day, mood=mood,
+                           created_at=created_at or datetime(2026, 10, 16, 8, 30))
+
+
+def test_first_checkin_of_the_day_continues_the_streak(app):
+    daily_stats.record_checkin(checkin(created_at=datetime(2026, 10, 15, 21, 0), time_of_day='Night'))
+    db.session.commit()
+
+    daily_stats.record_checkin(checkin())
+    db.session.commit()
+
+    today = UserDailyStats.query.filter_by(user_id=1, day=datetime(2026, 10, 16).date()).one()
+    assert today.streak == 2
+    assert today.morning_mood == 'Calm'
+
+
+def test_row_created_by_a_concurrent_request_is_reused(app, monkeypatch):
+    # The other request inserts and commits between our lookup and our insert
+    insert = daily_stats._insert_unless_exists
+
+    def racing_insert(values):
+        with db.engine.begin() as other:
+            other.execute(db.insert(UserDailyStats).values(
+                **daily_stats._new_stats_values(1, values['day'], 1), night_mood='Tired'))
+        insert(values)
+
+    monkeypatch.setattr(daily_stats, '_insert_unless_exists', racing_insert)
+
+    daily_stats.record_checkin(checkin())
+    db.session.commit()
+
+    rows = UserDailyStats.query.filter_by(user_id=1).all()
+    assert len(rows) == 1
+    assert (rows[0].morning_mood, rows[0].night_mood) == ('Calm', 'Tired')
+
+
+def test_savepoint_path_for_databases_without_on_conflict(app, monkeypatch):
+    values = daily_stats._new_stats_values(1, datetime(2026, 10, 16).date(), 1)
+    daily_stats._insert_unless_exists(values)
+    monkeypatch.setattr(db.engine.dialect, 'name', 'other')
+
+    daily_stats._insert_unless_exists(values)
+    db.session.commit()
+
+    assert UserDailyStats.query.count() == 1
@@ -0,0 +1,111 @@
+# By Frances Belleza
+# Function: tests for generation jobs: resubmitting lost ones, applying late OpenAI results
+
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+import pytest
+from flask import Flask
+from app import db, jobs
+from app.models import GenerationJob
+
+
+class RecordingQueue:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, job_id):
+        self.submitted.append(job_id)
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_TRACK_MODIFICATIONS=False,
+                      JOB_STALE_SECONDS=120)
+    db.init_app(app)
+    app.extensions['job_queue'] = RecordingQueue()
+    # Beats only when a test calls beat()
+    app.extensions['job_heartbeat'] = jobs.JobHeartbeat(app, interval=3600)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def stale_job(status, checkin_id=1):
+    job = GenerationJob(checkin_id=checkin_id, status=status)
+    db.session.add(job)
+    db.session.commit()
+    db.session.execute(db.update(GenerationJob).where(GenerationJob.id == job.id)
+                       .values(updated_at=datetime.now() - timedelta(minutes=10)))
+    db.session.commit()
+    db.session.refresh(job)
+    return job
+
+
+@pytest.mark.parametrize('status', [jobs.JOB_QUEUED, jobs.JOB_RUNNING, jobs.JOB_TEXT_READY])
+def test_job_without_a_heartbeat_is_resubmitted(app, status):
+    job = stale_job(status)
+
+    assert jobs.resubmit_if_lost(job)
+    assert app.extensions['job_queue'].submitted == [job.id]
+    assert job.status == jobs.JOB_QUEUED
+    # The resubmit counts as movement: the next poll leaves it alone
+    assert not jobs.resubmit_if_lost(job)
+
+
+def test_job_held_by_a_live_process_is_left_alone(app):
+    # e.g. a slow audio render: nothing else touches the row for minutes
+    job = stale_job(jobs.JOB_TEXT_READY)
+    heartbeat = app.extensions['job_heartbeat']
+    heartbeat.hold(job.id)
+
+    assert heartbeat.beat() == 1
+    db.session.refresh(job)
+    assert not jobs.resubmit_if_lost(job)
+    assert app.extensions['job_queue'].submitted == []
+
+    heartbeat.release(job.id)
+    assert heartbeat.beat() == 0
+
+
+def test_finished_jobs_are_not_resubmitted(app):
+    for checkin_id, status in enumerate((jobs.JOB_DONE, jobs.JOB_FAILED), start=1):
+        assert not jobs.resubmit_if_lost(stale_job(status, checkin_id))
+    assert app.extensions['job_queue'].submitted == []
+
+
+def done_future(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+@pytest.fixture
+def upgrades(monkeypatch):
+    applied = []
+    monkeypatch.setattr(jobs, 'upgrade_practice', lambda job_id, ai_result: applied.append((job_id, ai_result)))
+    return applied
+
+
+def test_late_result_waits_for_run_job_to_finish(app, upgrades):
+    with jobs._late_results_lock:
+        jobs._late_results[7] = jobs._WAITING
+
+    jobs._upgrade_when_done(app, 7, done_future({'practice': 'late'}))
+    assert upgrades == []
+
+    # run_job's last step, once the fallback and its audio are saved
+    jobs._apply_late_result(7)
+    assert upgrades == [(7, {'practice': 'late'})]
+    assert 7 not in jobs._late_results
+
+
+def test_late_result_after_run_job_finished_is_applied_at_once(app, upgrades):
+    with jobs._late_results_lock:
+        jobs._late_results[8] = jobs._WAITING
+    jobs._apply_late_result(8)
+
+    jobs._upgrade_when_done(app, 8, done_future({'practice': 'late'}))
+
+    assert upgrades == [(8, {'practice': 'late'})]
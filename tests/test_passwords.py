@@ -0,0 +1,42 @@
+# By Frances Belleza
+# Function: tests for password hashing in worker processes
+
+import pytest
+from app import passwords
+
+FAST = 'pbkdf2:sha256:1000'
+
+
+@pytest.fixture
+def hasher():
+    hasher = passwords.PasswordHasher(FAST, workers=1, queue_size=2)
+    yield hasher
+    if hasher._executor is not None:
+        hasher._executor.shutdown()
+
+
+def test_hash_and_verify_in_a_worker_process(hasher):
+    pwhash = hasher.hash('correct horse')
+
+    assert pwhash.startswith('pbkdf2:sha256:1000$')
+    assert hasher.verify(pwhash, 'correct horse') == (True, None)
+    assert hasher.verify(pwhash, 'wrong') == (False, None)
+    assert hasher._use_processes
+
+
+def test_outdated_hash_is_upgraded(hasher):
+    old = passwords._hash('correct horse', 'pbkdf2:sha256:500')
+
+    matches, new_hash = hasher.verify(old, 'correct horse')
+
+    assert matches
+    assert new_hash.startswith('pbkdf2:sha256:1000$')
+
+
+def test_falls_back_to_threads_when_no_process_starts(hasher, monkeypatch):
+    monkeypatch.setattr(passwords, 'WORKER_SCRIPT', '/nonexistent/hash_worker.py')
+
+    pwhash = hasher.hash('correct horse')
+
+    assert not hasher._use_processes
+    assert hasher.verify(pwhash, 'correct horse') == (True, None)
@@ -0,0 +1,103 @@
+# By Frances Belleza
+# Function: tests for the S3 audio storage backend against moto's in-memory S3
+
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+import pytest
+from app import storage as storage_module
+from app.storage import LocalStorage, S3Storage, copy_between
+
+moto = pytest.importorskip('moto')
+boto3 = pytest.importorskip('boto3')
+botocore_config = pytest.importorskip('botocore.config')
+
+BUCKET = 'audio-test'
+KEY = 'ab/cd/' + 'abcd' * 16 + '.mp3'
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    with moto.mock_aws():
+        # Signed like S3Storage's own client
+        client = boto3.client('s3', region_name='us-east-1',
+                              config=botocore_config.Config(signature_version='s3v4'))
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def bucket(s3):
+    return S3Storage(BUCKET, prefix='audio', url_expiry=600, client=s3)
+
+
+def test_write_exists_size_read_delete(bucket, s3):
+    assert not bucket.exists(KEY)
+    assert bucket.size(KEY) is None
+
+    bucket.write(KEY, [b'ID3', b'', b'audio' * 1000], content_type='audio/mpeg')
+
+    assert bucket.exists(KEY)
+    assert bucket.size(KEY) == 3 + 5000
+    assert b''.join(bucket.read(KEY, chunk_size=1024)) == b'ID3' + b'audio' * 1000
+    head = s3.head_object(Bucket=BUCKET, Key='audio/' + KEY)
+    assert head['ContentType'] == 'audio/mpeg'
+    assert 'immutable' in head['CacheControl']
+
+    bucket.delete(KEY)
+    assert not bucket.exists(KEY)
+
+
+def test_presigned_url_is_reused_for_half_its_lifetime(bucket, monkeypatch):
+    bucket.write(KEY, [b'audio'])
+    clock = [1000.0]
+    monkeypatch.setattr(storage_module, 'time', SimpleNamespace(monotonic=lambda: clock[0]))
+
+    url = bucket.url(KEY)
+    query = parse_qs(urlparse(url).query)
+    assert urlparse(url).path.endswith('/audio/' + KEY)
+    assert query['X-Amz-Expires'] == ['600']
+    assert bucket.url_lifetime == 300
+
+    clock[0] += 299
+    assert bucket.url(KEY) is url
+
+    clock[0] += 2
+    assert bucket.url(KEY) is not url
+
+
+def test_presigned_url_serves_the_object(bucket):
+    requests = pytest.importorskip('requests')
+    bucket.write(KEY, [b'narration'])
+
+    response = requests.get(bucket.url(KEY))
+
+    assert response.status_code == 200
+    assert response.content == b'narration'
+
+
+def test_delete_drops_cached_url(bucket):
+    bucket.write(KEY, [b'audio'])
+    url = bucket.url(KEY)
+
+    bucket.delete(KEY)
+
+    assert bucket.url(KEY) is not url
+
+
+def test_public_base_url_skips_signing(s3):
+    cdn = S3Storage(BUCKET, prefix='audio', public_base_url='https://cdn.example.test/', client=s3)
+
+    assert cdn.url(KEY) == f'https://cdn.example.test/audio/{KEY}'
+    assert cdn.url_lifetime is None
+
+
+def test_copy_between_local_and_bucket(bucket, tmp_path):
+    local = LocalStorage(tmp_path)
+    local.write(KEY, [b'narration'])
+
+    assert copy_between(local, bucket, KEY, 'audio/mpeg')
+    assert b''.join(bucket.read(KEY)) == b'narration'
+    # Already there: not copied again
+    assert not copy_between(local, bucket, KEY, 'audio/mpeg')